@@ -0,0 +1,132 @@
+# benchmarks/bench_clock_model.py
+#
+# Anchor óra modell (ClockTable) a 40 bites időbélyeg átfordulásán át:
+# 5 anchor DW1000 tickkel (15.65 ps, ~17.2 s-onként átfordul), véletlen
+# offsettel és skew-val; 10 Hz sync beacon a master anchortól, egy mozgó
+# TAG blinkjei. Az anchorok számlálói az átfordulás közeléből indulnak,
+# a szimuláció 40 s, így mindegyik legalább kétszer átfordul.
+#
+# Ellenőrzés (assert): a fixek az átfordulások után is folytatódnak, a
+# pozíció hiba és a becsült skew a futás végéig pontos marad.
+# Mérés: ClockTable.observe és corrections / prepare_sync_group ideje.
+#
+# Futtatás a repo gyökeréből:
+#     python -m benchmarks.bench_clock_model
+
+import time
+
+import numpy as np
+
+from zona_controller.tdoa_solver.api import prepare_sync_group, solve_problem
+from zona_controller.tdoa_solver.clock import ClockTable
+from zona_controller.tdoa_solver.geometry import AnchorGeometry
+from zona_controller.tdoa_solver.solver import TS_WRAP
+from zona_controller.uwb_parser import UWBRecord
+
+C = 299_792_458.0
+TS_SCALE = 1.565e-11      # DW1000 tick (s)
+NOISE_TICKS = 3.0         # ~1.4 cm
+ANCHORS = {
+    "0x04000020": (0.0, 0.0, 2.0),
+    "0x04000021": (20.0, 0.0, 2.0),
+    "0x04000022": (20.0, 10.0, 2.0),
+    "0x04000023": (0.0, 10.0, 2.0),
+    "0x04000024": (10.0, 0.0, 2.5),
+}
+MASTER = "0x04000020"
+TAG = 0x02006655
+SOLVER_CFG = {
+    "ts_unit_scale": TS_SCALE,
+    "c_m_per_s": C,
+    "min_anchor_count": 3,
+    "reference_anchor": "closest",
+    "mode": "iterative",
+    "max_iterations": 20,
+    "stop_threshold": 1e-4,
+    "use_lm_solver": True,
+    "robust_enabled": False,
+    "initial_guess": {"x": 0.0, "y": 0.0, "z": 0.0},
+}
+CLOCK_CFG = {"master_anchor": MASTER, "min_rounds": 5, "stale_sec": 30.0}
+
+
+def _record(sync: int, anchor: str, tag: int, ts: int) -> UWBRecord:
+    return UWBRecord(1, sync, sync, 90, int(anchor, 16), anchor,
+                     tag, "0x%08X" % tag, ts, 0x5A31, "0x5A31")
+
+
+def main(duration_sec: float = 40.0, rate_hz: float = 10.0):
+    rng = np.random.default_rng(7)
+    geometry = AnchorGeometry(1, [
+        {"id": aid, "position": {"x": p[0], "y": p[1], "z": p[2]}} for aid, p in ANCHORS.items()
+    ])
+    clocks = ClockTable()
+    clocks.configure(geometry, CLOCK_CFG, SOLVER_CFG)
+
+    # anchoronként: számláló kezdőértéke (az átfordulás előtt 1-8 s-mal), skew
+    start = {aid: TS_WRAP - int(rng.uniform(1.0, 8.0) / TS_SCALE) for aid in ANCHORS}
+    skew = {aid: (0.0 if aid == MASTER else rng.uniform(-20e-6, 20e-6)) for aid in ANCHORS}
+    pos = {aid: np.array(p) for aid, p in ANCHORS.items()}
+
+    def ticks(aid: str, t: float) -> int:
+        local = start[aid] + t * (1.0 + skew[aid]) / TS_SCALE + rng.normal(0.0, NOISE_TICKS)
+        return int(round(local)) % TS_WRAP
+
+    wraps = {aid: 0 for aid in ANCHORS}
+    last = {aid: None for aid in ANCHORS}
+    errors = []
+    observe_s = prepare_s = 0.0
+    observes = prepares = 0
+    t_host0 = 1_700_000_000.0
+    steps = int(duration_sec * rate_hz)
+    for k in range(steps):
+        t = k / rate_hz
+        now = t_host0 + t
+
+        # sync beacon a mastertől: minden anchor hallja (a master a saját adását)
+        sender = geometry.index[MASTER]
+        for aid, p in pos.items():
+            ts = ticks(aid, t + np.linalg.norm(p - pos[MASTER]) / C)
+            if last[aid] is not None and ts < last[aid]:
+                wraps[aid] += 1
+            last[aid] = ts
+            t0 = time.perf_counter()
+            clocks.observe(sender, geometry.index[aid], k, ts, now)
+            observe_s += time.perf_counter() - t0
+            observes += 1
+
+        # TAG blink 20 ms-mal később, körpályán
+        tb = t + 0.02
+        true = np.array([10.0 + 5.0 * np.cos(0.2 * tb), 5.0 + 3.0 * np.sin(0.2 * tb), 0.0])
+        heard = {aid: (now + 0.02, _record(k, aid, TAG, ticks(aid, tb + np.linalg.norm(p - true) / C)))
+                 for aid, p in pos.items()}
+        t0 = time.perf_counter()
+        problem = prepare_sync_group("0x%08X" % TAG, k, heard, geometry, SOLVER_CFG, clocks)
+        prepare_s += time.perf_counter() - t0
+        prepares += 1
+        if problem is None or k < 10:
+            continue
+        out = solve_problem(problem, SOLVER_CFG).out
+        errors.append((t, float(np.linalg.norm(out.position[:2] - true[:2])) if out.converged else np.inf))
+
+    errors = np.array(errors)
+    after_wrap = errors[errors[:, 0] > 10.0, 1]
+    table = clocks.as_dict(t_host0 + duration_sec)
+    skew_err_ppm = max(abs(row["skew_ppm"] - skew[row["id"]] * 1e6) for row in table["anchors"])
+
+    print(f"wraps per anchor       : {sorted(wraps.values())}")
+    print(f"fixes                  : {len(errors)} ({len(after_wrap)} after 10 s)")
+    print(f"position error (rms)   : {np.sqrt(np.mean(np.square(after_wrap))):.3f} m, "
+          f"max {after_wrap.max():.3f} m")
+    print(f"max skew error         : {skew_err_ppm:.4f} ppm")
+    print(f"ClockTable.observe     : {observe_s / observes * 1e6:8.2f} us/call")
+    print(f"prepare_sync_group     : {prepare_s / prepares * 1e6:8.2f} us/call (with corrections)")
+
+    assert min(wraps.values()) >= 2, wraps
+    assert len(after_wrap) == int((duration_sec - 10.0) * rate_hz) - 1
+    assert np.isfinite(after_wrap).all() and after_wrap.max() < 0.15, after_wrap.max()
+    assert skew_err_ppm < 0.05, skew_err_ppm
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_tdoa_solver.py
+#
+# Mikro-benchmark: iteratív TDoA solver (Levenberg-Marquardt és Gauss-Newton)
+# megoldás / másodperc 4, 8 és 16 anchorral, zajos szintetikus mérésekkel,
+# középpontból ill. zárt alakú becslésből indítva, valamint a "fast" mód
+# (csak zárt alakú becslés).
+#
+# Futtatás a repo gyökeréből:
+#     python -m benchmarks.bench_tdoa_solver
+
+import timeit
+
+import numpy as np
+
+from zona_controller.tdoa_solver.solver import (
+    closed_form_position,
+    range_differences,
+    select_reference,
+    solve_tdoa_closed_form,
+    solve_tdoa_position,
+)
+
+C = 299_792_458.0
+TS_SCALE = 1e-12          # ps egységű nyers időbélyeg
+NOISE_M = 0.05            # mérési zaj (méter)
+TRUE_POS = np.array([7.3, 4.1, 1.2])
+
+
+def _anchors(n: int) -> np.ndarray:
+    # a 20 x 10 m-es zóna kerületén egyenletesen, 2 m magasan
+    angles = np.linspace(0.0, 2.0 * np.pi, n, endpoint=False)
+    return np.column_stack((10.0 + 10.0 * np.cos(angles),
+                            5.0 + 5.0 * np.sin(angles),
+                            np.full(n, 2.0)))
+
+
+def _case(n: int, rng: np.random.Generator):
+    anchors = _anchors(n)
+    dist = np.linalg.norm(anchors - TRUE_POS, axis=1) + rng.normal(0.0, NOISE_M, n)
+    ts_raw = np.round(dist / C / TS_SCALE).astype(np.int64) + 908_823_146_933
+    ids = [f"A{i}" for i in range(n)]
+    ref = select_reference(ids, ts_raw, "closest")
+    range_diff = range_differences(ts_raw, ref, TS_SCALE, C)
+    x0 = anchors.mean(axis=0)
+    x0[2] = TRUE_POS[2]
+    return anchors, range_diff, ref, x0
+
+
+def main(number: int = 2000):
+    rng = np.random.default_rng(1)
+    for n in (4, 8, 16):
+        anchors, range_diff, ref, x0 = _case(n, rng)
+        z = float(x0[2])
+        cases = [
+            ("fast (closed form)",
+             lambda: solve_tdoa_closed_form(anchors, range_diff, ref, z)),
+        ]
+        for name, use_lm in (("LM", True), ("GN", False)):
+            def from_centroid(use_lm=use_lm):
+                return solve_tdoa_position(anchors, range_diff, ref, x0,
+                                           max_iterations=20, stop_threshold=1e-4,
+                                           use_lm=use_lm)
+
+            def from_closed_form(use_lm=use_lm):
+                start = closed_form_position(anchors, range_diff, ref, z)
+                return solve_tdoa_position(anchors, range_diff, ref,
+                                           x0 if start is None else start,
+                                           max_iterations=20, stop_threshold=1e-4,
+                                           use_lm=use_lm)
+
+            cases.append((f"{name} from centroid", from_centroid))
+            cases.append((f"{name} from closed form", from_closed_form))
+
+        for name, fn in cases:
+            out = fn()
+            best = min(timeit.repeat(fn, number=number, repeat=5))
+            err = float(np.linalg.norm(out.position[:2] - TRUE_POS[:2]))
+            print(f"{n:2d} anchors {name:22s}: {number / best:9.0f} solves/s "
+                  f"({out.iterations} iter, err={err:.3f} m, rms={out.rms_residual_m:.3f} m)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_uwb_parser.py
+#
+# Mikro-benchmark: régi dict alapú parse_uwb_header() vs. egymenetes
+# parse_uwb_record() / parse_uwb_lines(), valamint egy 20 mérést tartalmazó
+# bináris keret (parse_uwb_frame) egy szöveges sorhoz képest.
+#
+# Futtatás a repo gyökeréből:
+#     python -m benchmarks.bench_uwb_parser
+
+import timeit
+
+from zona_controller.uwb_parser import (
+    encode_uwb_frame,
+    parse_uwb_frame,
+    parse_uwb_header,
+    parse_uwb_lines,
+    parse_uwb_record,
+)
+
+LINE = ("UWB: ver=1 sync=60 tag_seq=12 batt=90% anchor=0x04000020 "
+        "tag=0x02006655 ts=908823146933 zone_id=0x5A31")
+ZONE = "0x5A31"
+FRAME = encode_uwb_frame([
+    parse_uwb_record(LINE)._replace(anchor_id=0x04000020 + i, tag_seq=i)
+    for i in range(20)
+])
+
+
+def _old_path(line: str):
+    # a korábbi útvonal: zóna token keresés + parse_uwb_header + újabb zóna ellenőrzés
+    zone = None
+    for tok in line.split():
+        if tok.startswith("zone_id="):
+            zone = tok.split("=", 1)[1].strip()
+            break
+    if zone != ZONE:
+        return None
+    uwb = parse_uwb_header(line)
+    if uwb is None or uwb.get("zone_id_hex") != ZONE:
+        return None
+    return uwb
+
+
+def main(number: int = 200_000):
+    cases = [
+        ("parse_uwb_header", lambda: parse_uwb_header(LINE)),
+        ("parse_uwb_record", lambda: parse_uwb_record(LINE)),
+        ("old path (zone + header + zone)", lambda: _old_path(LINE)),
+        ("parse_uwb_lines (zone in one pass)", lambda: parse_uwb_lines(LINE, ZONE)),
+        ("parse_uwb_frame (20 measurements)", lambda: parse_uwb_frame(FRAME, ZONE)),
+    ]
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=number, repeat=5))
+        print(f"{name:38s} {best / number * 1e9:8.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
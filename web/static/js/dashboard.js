@@ -76,43 +76,68 @@ function renderNodes(nodes) {
     });
 }
 
+// helyi másolat a szerver állapotáról; a ?since= válaszokat ebbe fésüljük
+let statusSeq = null;
+let tagState = {};
+let nodeState = {};
+let lastMsgState = null;
+
+function mergeStatus(data) {
+    if (data.full) {
+        tagState = {};
+        nodeState = {};
+    }
+    Object.assign(tagState, data.tags || {});
+    (data.nodes || []).forEach(n => { nodeState[n.addr] = n; });
+    const removed = data.removed || {};
+    (removed.tags || []).forEach(id => { delete tagState[id]; });
+    (removed.nodes || []).forEach(addr => { delete nodeState[addr]; });
+    if (data.last_msg) lastMsgState = data.last_msg;
+    statusSeq = data.seq;
+}
+
+function renderTags(tags) {
+    const tbody = document.querySelector('#tag-table tbody');
+    if (!tbody) return;
+    tbody.innerHTML = '';
+    Object.keys(tags).forEach(tagId => {
+        const p = tags[tagId];
+        const tr = document.createElement('tr');
+        tr.innerHTML = `
+            <td>${tagId}${p.stale ? ' (nincs friss adat)' : ''}</td>
+            <td>${p.x?.toFixed?.(3) ?? ''}</td>
+            <td>${p.y?.toFixed?.(3) ?? ''}</td>
+            <td>${p.z?.toFixed?.(3) ?? ''}</td>
+            <td>${new Date(p.time * 1000).toLocaleString()}</td>
+        `;
+        tbody.appendChild(tr);
+    });
+}
+
 async function loadStatus() {
     try {
-        const resp = await fetch('/api/status');
+        const url = statusSeq === null ? '/api/status' : '/api/status?since=' + statusSeq;
+        const resp = await fetch(url);
         if (!resp.ok) {
             const el = document.getElementById('status-json');
             if (el) el.textContent = 'Hiba /api/status híváskor';
             return;
         }
         const data = await resp.json();
+        const changed = data.full || data.seq !== statusSeq;
+        mergeStatus(data);
 
         // Nyers utolsó üzenet debughoz
         const lastMsgEl = document.getElementById('status-json');
-        if (lastMsgEl) {
-            lastMsgEl.textContent = JSON.stringify(data.last_msg, null, 2);
+        if (lastMsgEl && data.last_msg) {
+            lastMsgEl.textContent = JSON.stringify(lastMsgState, null, 2);
         }
 
-        // Fix pont kártyák
-        renderNodes(data.nodes);
-
-        // TAG táblázat (meglevő funkció)
-        const tags = data.tags || {};
-        const tbody = document.querySelector('#tag-table tbody');
-        if (tbody) {
-            tbody.innerHTML = '';
-            Object.keys(tags).forEach(tagId => {
-                const p = tags[tagId];
-                const tr = document.createElement('tr');
-                tr.innerHTML = `
-                    <td>${tagId}</td>
-                    <td>${p.x?.toFixed?.(3) ?? ''}</td>
-                    <td>${p.y?.toFixed?.(3) ?? ''}</td>
-                    <td>${p.z?.toFixed?.(3) ?? ''}</td>
-                    <td>${new Date(p.time * 1000).toLocaleString()}</td>
-                `;
-                tbody.appendChild(tr);
-            });
-        }
+        // Fix pont kártyák (a HB kor kijelzés miatt minden körben újrarajzoljuk)
+        renderNodes(Object.values(nodeState));
+
+        // TAG táblázat (meglevő funkció) – csak ha volt változás
+        if (changed) renderTags(tagState);
     } catch (e) {
         const el = document.getElementById('status-json');
         if (el) el.textContent = 'Hálózati hiba.';
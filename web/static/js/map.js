@@ -9,6 +9,60 @@ async function loadMapConfig() {
     const data = await resp.json();
     mapConfig = data;
     anchors = data.anchors || [];
+
+    // GDOP overlay: "egy anchor kiesése" választó
+    const sel = document.getElementById('gdop-exclude');
+    anchors.forEach(a => {
+        if (!a.id || a.enabled === false) return;
+        const opt = document.createElement('option');
+        opt.value = a.id;
+        opt.textContent = 'nélküle: ' + a.id;
+        sel.appendChild(opt);
+    });
+}
+
+// előre számolt GDOP rács (/api/tdoa/gdop) – ritkán változik, ritkán kérjük le
+const GDOP_REFRESH_MS = 30000;
+const GDOP_COLOR_MAX = 10;
+let gdop = { key: null, data: null, fetchedAt: 0 };
+
+async function refreshGdop() {
+    const exclude = document.getElementById('gdop-exclude').value;
+    const now = Date.now();
+    if (gdop.key === exclude && now - gdop.fetchedAt < GDOP_REFRESH_MS) return;
+    gdop = { key: exclude, data: gdop.key === exclude ? gdop.data : null, fetchedAt: now };
+    let url = '/api/tdoa/gdop';
+    if (exclude) url += '?exclude=' + encodeURIComponent(exclude);
+    try {
+        const resp = await fetch(url);
+        gdop.data = resp.ok ? await resp.json() : null;
+    } catch (e) {
+        // az overlay opcionális, hiba esetén csak kimarad
+    }
+}
+
+function gdopColor(value) {
+    // 1 (jó) → zöld, GDOP_COLOR_MAX felett → piros
+    const t = Math.min(Math.max((value - 1) / (GDOP_COLOR_MAX - 1), 0), 1);
+    const hue = 120 * (1 - t);
+    return `hsla(${hue},80%,45%,0.35)`;
+}
+
+function drawGdop(ctx, canvas) {
+    const data = gdop.data;
+    if (!data) return;
+    const res = data.resolution_m;
+    data.values.forEach((row, j) => {
+        row.forEach((value, i) => {
+            if (value === null) return;
+            const x = data.origin.x + i * res;
+            const y = data.origin.y + j * res;
+            const p0 = worldToCanvas(x, y + res, canvas);
+            const p1 = worldToCanvas(x + res, y, canvas);
+            ctx.fillStyle = gdopColor(value);
+            ctx.fillRect(p0.x, p0.y, p1.x - p0.x + 0.5, p1.y - p0.y + 0.5);
+        });
+    });
 }
 
 async function loadTags() {
@@ -29,10 +83,63 @@ async function loadTags() {
     }
 }
 
+// utoljára kapott pozíció TAG-enként – ?since= esetén csak változáskor jön új
+const positionCache = {};
+
 async function fetchPosition(tagId) {
-    const resp = await fetch('/api/tdoa/position?tag_id=' + encodeURIComponent(tagId));
-    if (!resp.ok) return null;
-    return await resp.json();
+    const cached = positionCache[tagId];
+    let url = '/api/tdoa/position?tag_id=' + encodeURIComponent(tagId);
+    if (cached && cached.seq !== undefined) url += '&since=' + cached.seq;
+    const resp = await fetch(url);
+    if (!resp.ok) {
+        delete positionCache[tagId];
+        return null;
+    }
+    const data = await resp.json();
+    if (data.changed === false) return cached;
+    positionCache[tagId] = data;
+    return data;
+}
+
+// kiválasztott TAG nyomvonala (/api/tdoa/history), ritkábban frissítve
+const TRAIL_WINDOW_SEC = 60;
+const TRAIL_REFRESH_MS = 5000;
+let trail = { tagId: null, points: [], fetchedAt: 0 };
+
+async function refreshTrail(tagId) {
+    const now = Date.now();
+    if (trail.tagId === tagId && now - trail.fetchedAt < TRAIL_REFRESH_MS) return;
+    trail = { tagId: tagId, points: trail.tagId === tagId ? trail.points : [], fetchedAt: now };
+    const to = now / 1000;
+    const url = '/api/tdoa/history?tag_id=' + encodeURIComponent(tagId)
+        + '&from=' + (to - TRAIL_WINDOW_SEC) + '&to=' + to + '&step=1';
+    try {
+        const resp = await fetch(url);
+        if (!resp.ok) {
+            trail.points = [];
+            return;
+        }
+        const data = await resp.json();
+        trail.points = data.points || [];
+    } catch (e) {
+        // a nyomvonal opcionális, hiba esetén csak kimarad
+    }
+}
+
+function drawTrail(ctx, canvas) {
+    if (trail.points.length < 2) return;
+    ctx.beginPath();
+    trail.points.forEach((pt, idx) => {
+        const p = worldToCanvas(pt[1], pt[2], canvas);
+        if (idx === 0) {
+            ctx.moveTo(p.x, p.y);
+        } else {
+            ctx.lineTo(p.x, p.y);
+        }
+    });
+    ctx.strokeStyle = 'rgba(76,175,80,0.6)';
+    ctx.lineWidth = 2;
+    ctx.stroke();
 }
 
 function worldToCanvas(x, y, canvas) {
@@ -66,6 +173,11 @@ async function drawMap() {
         return;
     }
 
+    if (document.getElementById('show-gdop').checked) {
+        await refreshGdop();
+        drawGdop(ctx, canvas);
+    }
+
     const shape = (mapConfig.shape || {});
     const vertices = shape.vertices || [];
 
@@ -105,6 +217,8 @@ async function drawMap() {
     // kiválasztott TAG
     if (selectedTag) {
         const pos = await fetchPosition(selectedTag);
+        await refreshTrail(selectedTag);
+        drawTrail(ctx, canvas);
 
         const infoId = document.getElementById('tag-info-id');
         const infoPos = document.getElementById('tag-info-pos');
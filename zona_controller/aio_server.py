@@ -0,0 +1,232 @@
+# zona_controller/aio_server.py
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import ConfigManager
+from .crypto import CryptoEngine
+from .forward import AsyncPositionForwarder
+from .ingest import Datagram
+from .pipeline import PacketPipeline
+from .runtime_params import TDoARuntimeParams
+from .state import State
+from .tdoa import TDoAProcessor
+
+
+class _IngestProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: "AsyncUDPServer"):
+        self.server = server
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]):
+        self.server._on_datagram(data, addr)
+
+    def error_received(self, exc: Exception):
+        self.server.errors += 1
+
+
+class AsyncUDPServer(threading.Thread):
+    """
+    asyncio alapú futtatókörnyezet (network.runtime = "asyncio").
+
+    Egyetlen event loop birtokolja a fogadó és a forward socketet.
+    A beérkező datagramokat a loop egy iteráción belül batch-be gyűjti,
+    és a teljes batch-et EGY executor hívással adja át a CPU-igényes
+    fokozatoknak (AES dekódolás, parse, solver) – nincs csomagonkénti
+    szálváltás. Az executor egyetlen szálas, így a sorrend megmarad.
+    A kiszámolt pozíciókat a batch végén a loop szálán küldjük tovább.
+    """
+
+    def __init__(self, config_path: str, state: State,
+                 processor: TDoAProcessor, params: TDoARuntimeParams):
+        super().__init__(daemon=True)
+
+        self.cfg_mgr = ConfigManager(config_path)
+        cfg = self.cfg_mgr.get_config()
+
+        net = cfg.get("network", {})
+        self.host = net.get("udp_host", "0.0.0.0")
+        self.port = int(net.get("udp_port", 100))
+        # ennyi datagram várhat feldolgozásra; felette eldobjuk (számlálóval)
+        self.max_pending = int(net.get("asyncio_max_pending", 8192))
+
+        aes_key_hex = cfg.get("crypto", {}).get("aes_key_hex", "")
+        if not aes_key_hex:
+            raise ValueError("Missing crypto.aes_key_hex in config")
+        aes_key = bytes.fromhex(aes_key_hex)
+
+        self.crypto = CryptoEngine(aes_key, cfg)
+        self.state = state
+        self.processor = processor
+        self.params = params
+        self.forwarder = AsyncPositionForwarder(cfg)
+        self.pipeline = PacketPipeline(state, processor, params, self.crypto)
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aio-cpu")
+        self._pending: List[Datagram] = []
+        self._pending_total = 0  # loop-ban várakozó + executorban lévő
+        self._flush_scheduled = False
+        self._busy = False
+        # a feldolgozás alatt keletkező pozíciók (executor szál írja)
+        self._out: List[Tuple[str, float, float, float, float]] = []
+
+        self.packets = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self.processor.on_position = self._collect_position
+        self.state.register_stats_provider("ingest", self.stats)
+
+    # ---- event loop ----
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._open())
+        print(f"[UDP] asyncio runtime listening on {self.host}:{self.port}")
+        self.loop.run_forever()
+
+    async def _open(self):
+        await self.loop.create_datagram_endpoint(
+            lambda: _IngestProtocol(self),
+            local_addr=(self.host, self.port),
+        )
+        await self.forwarder.open(self.loop)
+        if self.processor.batch_tick is not None:
+            self.schedule_periodic(self.processor.batch_tick.interval_sec, self._solve_tick)
+        if self.processor.scheduler_ticker is not None:
+            self.schedule_periodic(self.processor.scheduler_ticker.interval_sec,
+                                   self._scheduler_tick)
+
+    def schedule_periodic(self, interval_sec: float, callback: Callable[[float], None]):
+        """
+        Periodikus időzítő a loop-on (pl. solve deadline, eviction).
+        A callback a loop szálán fut, argumentuma az aktuális time.time().
+        """
+        def _tick():
+            try:
+                callback(time.time())
+            except Exception as e:
+                self.errors += 1
+                print(f"[UDP] periodic callback error: {e}")
+            self.loop.call_later(interval_sec, _tick)
+
+        self.loop.call_soon_threadsafe(self.loop.call_later, interval_sec, _tick)
+
+    def _on_datagram(self, data: bytes, addr: Tuple[str, int]):
+        self.packets += 1
+        if self._pending_total >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append((data, addr, time.time()))
+        self._pending_total += 1
+        if not self._flush_scheduled and not self._busy:
+            self._flush_scheduled = True
+            self.loop.call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        if self._busy or not self._pending:
+            return
+        batch = self._pending
+        self._pending = []
+        self._busy = True
+        self.batches += 1
+        if len(batch) > self.max_batch:
+            self.max_batch = len(batch)
+        fut = self.loop.run_in_executor(self.executor, self._process_batch, batch)
+        fut.add_done_callback(lambda f, n=len(batch): self._on_batch_done(f, n))
+
+    def _on_batch_done(self, fut: "asyncio.Future", n: int):
+        self._busy = False
+        self._pending_total -= n
+        try:
+            positions = fut.result()
+        except Exception as e:
+            self.errors += 1
+            print(f"[UDP] asyncio batch error: {e}")
+            positions = []
+        for tag_id, x, y, z, ts in positions:
+            self.forwarder.forward(tag_id, x, y, z, ts)
+        # ami a feldolgozás alatt érkezett, az mehet a következő batch-be
+        if self._pending:
+            self._flush()
+
+    def _solve_tick(self, _now: float):
+        # a kötegelt solve is a (egyszálas) feldolgozó executoron fut
+        fut = self.loop.run_in_executor(self.executor, self._run_solve_tick)
+        fut.add_done_callback(self._on_solve_tick_done)
+
+    def _scheduler_tick(self, now: float):
+        # a deadline-os megoldások is a feldolgozó executoron futnak
+        fut = self.loop.run_in_executor(self.executor, self._run_scheduler_tick, now)
+        fut.add_done_callback(self._on_solve_tick_done)
+
+    def _on_solve_tick_done(self, fut: "asyncio.Future"):
+        try:
+            positions = fut.result()
+        except Exception as e:
+            self.errors += 1
+            print(f"[UDP] asyncio solve tick error: {e}")
+            positions = []
+        for tag_id, x, y, z, ts in positions:
+            self.forwarder.forward(tag_id, x, y, z, ts)
+
+    # ---- executor szál ----
+
+    def _run_scheduler_tick(self, now: float) -> List[Tuple[str, float, float, float, float]]:
+        try:
+            self.processor.poll_scheduler(now)
+        except Exception as e:
+            self.errors += 1
+            print(f"[UDP] asyncio scheduler tick error: {e}")
+        out = self._out
+        self._out = []
+        return out
+
+    def _run_solve_tick(self) -> List[Tuple[str, float, float, float, float]]:
+        try:
+            self.processor.batch_tick.tick()
+        except Exception as e:
+            self.errors += 1
+            print(f"[UDP] asyncio solve tick error: {e}")
+        out = self._out
+        self._out = []
+        return out
+
+    def _collect_position(self, tag_id: str, x: float, y: float, z: float, ts: float):
+        if threading.current_thread().name.startswith("aio-cpu"):
+            self._out.append((tag_id, x, y, z, ts))
+        else:
+            # solver pool gyűjtő szála: közvetlenül a loop-ra tesszük
+            self.loop.call_soon_threadsafe(self.forwarder.forward, tag_id, x, y, z, ts)
+
+    def _process_batch(self, batch: List[Datagram]) -> List[Tuple[str, float, float, float, float]]:
+        for data, addr, ts in batch:
+            try:
+                self.pipeline.handle(data, addr, ts)
+            except Exception as e:
+                self.errors += 1
+                print(f"[UDP] asyncio handler error: {e}")
+        out = self._out
+        self._out = []
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "asyncio",
+            "sockets": 1,
+            "packets": self.packets,
+            "batches": self.batches,
+            "avg_batch": (self.packets - self.dropped) / self.batches if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "pending": self._pending_total,
+            "dropped": self.dropped,
+            "forwarded": self.forwarder.sent,
+            "errors": self.errors,
+        }
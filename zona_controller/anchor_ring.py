@@ -0,0 +1,84 @@
+# zona_controller/anchor_ring.py
+
+from typing import Optional
+
+import numpy as np
+
+# Egy anchor mérési gyűrűjének sora. Hiányzó egész mező értéke MISSING.
+ANCHOR_MEAS_DTYPE = np.dtype([
+    ("ts_recv", np.float64),
+    ("ts_raw", np.int64),
+    ("tag", np.int64),
+    ("sync", np.int32),
+    ("seq", np.int32),
+    ("zone", np.int32),
+])
+
+MISSING = -1
+
+
+class AnchorRing:
+    """
+    Előre lefoglalt, oszlopos (structured array) gyűrűpuffer egy anchor
+    méréseihez. Íráskor egyetlen sor értékadás történik, olvasáskor a
+    keresés vektorizált NumPy maszkkal megy, Python dict nem keletkezik.
+
+    Nem szálbiztos: a State lockja alatt használjuk.
+    """
+
+    __slots__ = ("data", "head", "count", "last_ts")
+
+    def __init__(self, size: int):
+        self.data = np.zeros(max(1, size), dtype=ANCHOR_MEAS_DTYPE)
+        self.head = 0     # következő írási pozíció
+        self.count = 0    # érvényes sorok száma
+        self.last_ts = 0.0
+
+    @property
+    def size(self) -> int:
+        return self.data.shape[0]
+
+    def append(self, ts_recv: float, ts_raw: Optional[int], tag: int,
+               sync: Optional[int], seq: Optional[int], zone: Optional[int]):
+        self.data[self.head] = (
+            ts_recv,
+            MISSING if ts_raw is None else ts_raw,
+            tag,
+            MISSING if sync is None else sync,
+            MISSING if seq is None else seq,
+            MISSING if zone is None else zone,
+        )
+        self.head = (self.head + 1) % self.data.shape[0]
+        if self.count < self.data.shape[0]:
+            self.count += 1
+        self.last_ts = ts_recv
+
+    def ordered(self) -> np.ndarray:
+        """Az érvényes sorok másolata időrendben (régi → új)."""
+        if self.count < self.data.shape[0]:
+            return self.data[:self.count].copy()
+        return np.concatenate((self.data[self.head:], self.data[:self.head]))
+
+    def resized(self, size: int) -> "AnchorRing":
+        """Új méretű gyűrű a legfrissebb (max. size darab) sorral."""
+        ring = AnchorRing(size)
+        rows = self.ordered()[-ring.size:]
+        n = rows.shape[0]
+        ring.data[:n] = rows
+        ring.count = n
+        ring.head = n % ring.size
+        ring.last_ts = self.last_ts
+        return ring
+
+    def latest_for_tag(self, tag: int, min_ts: float) -> Optional[np.void]:
+        """
+        A tag legfrissebb, min_ts-nél nem régebbi mérése (egy sor másolata),
+        vagy None. A sorrendet a ts_recv adja, így a gyűrű fejét nem kell nézni.
+        """
+        valid = self.data[:self.count]
+        mask = (valid["tag"] == tag) & (valid["ts_recv"] >= min_ts)
+        idx = np.flatnonzero(mask)
+        if idx.size == 0:
+            return None
+        best = idx[np.argmax(valid["ts_recv"][idx])]
+        return valid[best].copy()
@@ -1,25 +1,41 @@
+import math
+import time
+
+import numpy as np
 from flask import Blueprint, jsonify, request
 
 from .auth import require_role, current_user
 from .config import ConfigManager
+from .runtime_params import TDoARuntimeParams
 from .state import State
+from .tdoa_solver.clock import get_clock_table
+from .tdoa_solver.gdop import get_gdop_grid
+from .tdoa_solver.geometry import get_anchor_geometry
 
 bp = Blueprint("api", __name__, url_prefix="/api")
 
 
+def _since_arg():
+    """?since=<seq> paraméter; hiányzó vagy hibás érték → None (teljes válasz)."""
+    return request.args.get("since", type=int)
+
+
 def create_api_blueprint(state: State, config_path: str):
     cfg_mgr = ConfigManager(config_path)
+    params = TDoARuntimeParams(config_path)
 
     @bp.route("/status", methods=["GET"])
     @require_role("diag")
     def status():
-        return jsonify({
-            "status": "ok",
-            "last_msg": state.get_last_message(),
-            "tags": state.get_all_tag_positions(),
-            # ÚJ: fix pontok HB + mérés összefoglalója
-            "nodes": state.get_nodes_summary(),
-        })
+        # egyetlen, konzisztens snapshot – nem vesszük fel a State lockját;
+        # ?since=<seq> esetén csak az azóta változott rekordok mennek ki
+        changes = state.get_changes_since(_since_arg())
+        return jsonify({"status": "ok", **changes})
+
+    @bp.route("/stats", methods=["GET"])
+    @require_role("diag")
+    def runtime_stats():
+        return jsonify(state.get_runtime_stats())
 
     @bp.route("/health", methods=["GET"])
     def health():
@@ -55,6 +71,12 @@ def create_api_blueprint(state: State, config_path: str):
         tdoa = cfg.get("tdoa", {})
         return jsonify(tdoa.get("anchors", []))
 
+    @bp.route("/anchors/geometry", methods=["GET"])
+    @require_role("diag")
+    def get_anchor_geometry_info():
+        """A solver által használt, cache-elt anchor geometria (config generációval)."""
+        return jsonify(get_anchor_geometry(cfg_mgr).as_dict())
+
     @bp.route("/anchors", methods=["POST"])
     @require_role("admin")
     def add_anchor():
@@ -104,10 +126,116 @@ def create_api_blueprint(state: State, config_path: str):
         tag_id = request.args.get("tag_id")
         if not tag_id:
             return jsonify({"error": "tag_id required"}), 400
-        pos = state.get_tag_position(tag_id)
+        snap = state.get_snapshot()
+        pos = snap.tags.get(tag_id)
         if not pos:
             return jsonify({"error": "not_found"}), 404
-        return jsonify({"tag_id": tag_id, **pos})
+        since = _since_arg()
+        if since is not None and 0 <= since <= snap.seq and pos["seq"] <= since:
+            return jsonify({"tag_id": tag_id, "changed": False, "seq": snap.seq})
+        return jsonify({"tag_id": tag_id, "changed": True, **pos})
+
+    @bp.route("/tdoa/positions", methods=["GET"])
+    @require_role("diag")
+    def get_positions():
+        changes = state.get_changes_since(_since_arg())
+        return jsonify({
+            "full": changes["full"],
+            "seq": changes["seq"],
+            "tags": changes["tags"],
+        })
+
+    @bp.route("/tdoa/history", methods=["GET"])
+    @require_role("diag")
+    def get_history():
+        """
+        ?tag_id=&from=&to=&step= – TAG pozíció történet memóriából.
+        from/to unix idő (alap: az utolsó 5 perc), step másodperc (0 = nyers).
+        A pontok tömör formában mennek: [t, x, y, z, quality].
+        """
+        tag_id = request.args.get("tag_id")
+        if not tag_id:
+            return jsonify({"error": "tag_id required"}), 400
+        t_to = request.args.get("to", type=float)
+        if t_to is None:
+            t_to = time.time()
+        t_from = request.args.get("from", type=float)
+        if t_from is None:
+            t_from = t_to - 300.0
+        step = max(0.0, request.args.get("step", 0.0, type=float))
+        if t_from > t_to:
+            return jsonify({"error": "from must be <= to"}), 400
+
+        max_points = int(params.get_history_params().get("max_points", 5000))
+        result = state.get_tag_history(tag_id, t_from, t_to, step, max_points)
+        if result is None:
+            return jsonify({"error": "not_found"}), 404
+        resolution, rows = result
+        points = [
+            [t, x, y, z, None if math.isnan(q) else q]
+            for t, x, y, z, q in rows.tolist()
+        ]
+        return jsonify({
+            "tag_id": tag_id,
+            "from": t_from,
+            "to": t_to,
+            "resolution_sec": resolution,
+            "fields": ["t", "x", "y", "z", "quality"],
+            "points": points,
+        })
+
+    @bp.route("/tdoa/gdop", methods=["GET"])
+    @require_role("diag")
+    def get_gdop():
+        """
+        ?exclude=<anchor_id>&stride=n – az előre számolt GDOP rács (lefedettség
+        overlay). exclude: az adott anchor kiesésének leave-one-out rétege.
+        A values sorai y szerint növekvőek; a polygonon kívüli és az elfajuló
+        (végtelen GDOP-ú) cellák null-ok.
+        """
+        gdop_cfg = params.get_gdop_params()
+        if not gdop_cfg.pop("enabled", True):
+            return jsonify({"error": "gdop_disabled"}), 404
+        grid = get_gdop_grid(cfg_mgr, gdop_cfg, wait=True)
+        if grid is None:
+            return jsonify({"error": "no grid"}), 404
+
+        exclude = request.args.get("exclude")
+        exclude_idx = None
+        if exclude:
+            exclude_idx = get_anchor_geometry(cfg_mgr).index_of(exclude)
+            if exclude_idx is None:
+                return jsonify({"error": "unknown anchor"}), 404
+        layer = grid.layer_for(exclude_idx)
+        if layer is None:
+            return jsonify({"error": "no layer (too few anchors)"}), 404
+
+        stride = max(1, request.args.get("stride", 1, type=int))
+        values = np.where(grid.mask & np.isfinite(layer), np.round(layer, 2), np.nan)
+        values = values[::stride, ::stride]
+        return jsonify({
+            "generation": grid.generation,
+            "origin": {"x": grid.x0, "y": grid.y0},
+            "resolution_m": grid.resolution * stride,
+            "nx": values.shape[1],
+            "ny": values.shape[0],
+            "z_m": grid.z,
+            "exclude": exclude,
+            "max_gdop": grid.max_gdop,
+            "anchors": [grid.ids[i] for i in grid.full_key],
+            "values": [[None if math.isnan(v) else v for v in row] for row in values.tolist()],
+        })
+
+    @bp.route("/tdoa/clocks", methods=["GET"])
+    @require_role("diag")
+    def get_tdoa_clocks():
+        """
+        Az anchor óra modell táblája: anchoronként offset (tick), skew (ppm),
+        az offset szórása és a maradék RMS méterben, körök / outlierek száma.
+        """
+        if not params.get_clock_params().get("enabled", True):
+            return jsonify({"error": "clock_disabled"}), 404
+        return jsonify(get_clock_table(cfg_mgr).as_dict())
 
     @bp.route("/tdoa/map", methods=["GET"])
     @require_role("diag")
@@ -17,7 +17,9 @@ from .auth import bp as auth_bp, current_user
 from .api import create_api_blueprint
 from .state import State
 from .udp_server import UDPServer
+from .aio_server import AsyncUDPServer
 from .tdoa import TDoAProcessor
+from .eviction import EvictionSweeper
 from .runtime_params import TDoARuntimeParams
 from .config import ConfigManager
 
@@ -47,6 +49,7 @@ def create_app(config_path: str = "zona.conf"):
 
     # Globális state
     state = State()
+    state.set_snapshot_interval(float(web_cfg.get("status_snapshot_interval_sec", 0.2)))
 
     # Runtime paraméterek (tdoa.runtime.* a zona.conf-ból)
     params = TDoARuntimeParams(config_path)
@@ -58,14 +61,38 @@ def create_app(config_path: str = "zona.conf"):
     processor = TDoAProcessor(state, params)
     state.set_anchor_buffer_size(per_anchor_size)
 
+    hist_cfg = params.get_history_params()
+    state.configure_history(
+        enabled=bool(hist_cfg.get("enabled", True)),
+        raw_size=int(hist_cfg.get("raw_size", 600)),
+        tiers=hist_cfg.get("tiers"),
+    )
+
     # Csak a "fő" processzben indítjuk el a UDP szervert:
     # - debug=False esetén egyszer indul (pl. Debian / production)
     # - debug=True esetén csak akkor, ha WERKZEUG_RUN_MAIN == "true"
     is_reloader_child = os.environ.get("WERKZEUG_RUN_MAIN") == "true"
     if not app.debug or is_reloader_child:
-        udp_server = UDPServer(config_path, state, processor, params)
+        # network.runtime: "thread" (UDPServer) vagy "asyncio" (AsyncUDPServer)
+        runtime = str(cfg.get("network", {}).get("runtime", "thread")).lower()
+        # solver processzek (solver.pool_workers > 0) a csomagfogadás előtt
+        processor.start_solver_pool()
+        if runtime == "asyncio":
+            udp_server = AsyncUDPServer(config_path, state, processor, params)
+        else:
+            udp_server = UDPServer(config_path, state, processor, params)
         udp_server.start()
 
+        # kötegelt solver tick: szál módban saját szálon, asyncio-ban a loop ütemezi
+        if processor.batch_tick is not None and runtime != "asyncio":
+            processor.batch_tick.start()
+        if processor.scheduler_ticker is not None and runtime != "asyncio":
+            processor.scheduler_ticker.start()
+
+        # háttér TTL takarítás (TAG-ek, fix pontok, anchor gyűrűk)
+        sweeper = EvictionSweeper(state, params, processor)
+        sweeper.start()
+
     app.register_blueprint(auth_bp)
     api_bp = create_api_blueprint(state, config_path)
     app.register_blueprint(api_bp)
@@ -1,6 +1,6 @@
 import threading
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
 from pyhocon import ConfigFactory, HOCONConverter
 
@@ -24,6 +24,9 @@ class ConfigManager:
             raise FileNotFoundError(f"Config file not found: {self._path}")
         self._config = ConfigFactory.parse_file(str(self._path))
         self._config_lock = threading.RLock()
+        # minden update_from_dict növeli; erre kulcsolnak a származtatott
+        # cache-ek (pl. AnchorGeometry)
+        self._generation = 0
 
     @staticmethod
     def _deep_merge(dst: Dict[str, Any], src: Dict[str, Any]) -> None:
@@ -42,6 +45,24 @@ class ConfigManager:
         with self._config_lock:
             return self._config.as_plain_ordered_dict()
 
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get_section_with_generation(self, path: str, default: Any = None) -> Tuple[int, Any]:
+        """
+        Egyetlen (pontozott útvonalú) szekció plain alakban, a hozzá tartozó
+        generációval együtt – a teljes fa konvertálása nélkül.
+        """
+        with self._config_lock:
+            value = self._config.get(path, default)
+            if hasattr(value, "as_plain_ordered_dict"):
+                value = value.as_plain_ordered_dict()
+            elif isinstance(value, list):
+                value = [v.as_plain_ordered_dict() if hasattr(v, "as_plain_ordered_dict") else v
+                         for v in value]
+            return self._generation, value
+
     def save_config(self):
         with self._config_lock:
             text = HOCONConverter.convert(self._config, "hocon")
@@ -76,4 +97,5 @@ class ConfigManager:
                 subtree = ConfigFactory.from_dict({section: base})[section]
                 self._config[section] = subtree
 
+            self._generation += 1
             self.save_config()
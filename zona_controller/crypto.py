@@ -1,10 +1,19 @@
-from typing import Optional, Tuple
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from Crypto.Cipher import AES
 from Crypto.Util import Counter
 
+from .uwb_parser import is_binary_frame
+
 PRINTABLE_PREFIXES = ("UWB:", "BLINK:", "TAG", "ver=", "HB", "HB:", "HB ")
 
+GCM_ZERO_NONCE = b"\x00" * 12
+
+# dekódolt tartalom: szöveges sor(ok) str-ként, bináris UWB keret bytes-ként
+Payload = Union[str, bytes]
+
 
 def is_printable_ascii(b: bytes) -> bool:
     for x in b:
@@ -31,54 +40,175 @@ def looks_like_line(pt: bytes) -> bool:
 
 
 class CryptoEngine:
+    """
+    AES dekódolás több lehetséges csomagformátummal (variáns):
+      0) GCM[nonce=first12]: nonce = első 12 byte, tag = utolsó 16 byte
+      1) GCM[nonce=0]:       nonce = 12 x 0x00,   tag = utolsó 16 byte
+      2) CTR[iv=first16]:    IV = első 16 byte
+
+    Bináris UWB keretet csak a hitelesített GCM variánsokból fogadunk el: a
+    CTR kimenet bármilyen bemenetre "dekódol", és a keretben nincs
+    ellenőrzőösszeg, így véletlen adat is átmenne a magic/hossz ellenőrzésen.
+
+    Forrásonkénti (IP) tanuló cache: megjegyezzük, melyik variáns volt
+    sikeres, és legközelebb azzal kezdünk. crypto.variant_cache_max_failures
+    egymást követő hiba után a bejegyzést eldobjuk. A cache LRU, legfeljebb
+    MAX_TRACKED_SOURCES forrással (a /api/stats is ezt listázza).
+    """
+
+    VARIANT_NAMES = ("GCM[nonce=first12]", "GCM[nonce=0]", "CTR[iv=first16]")
+    AUTHENTICATED_VARIANTS = (True, True, False)
+    MAX_TRACKED_SOURCES = 256
+
     def __init__(self, aes_key: bytes, config: dict):
         self.aes_key = aes_key
         crypto_cfg = config.get("crypto", {})
         self.enable_gcm_first_nonce = crypto_cfg.get("enable_gcm_first_nonce", True)
         self.enable_gcm_zero_nonce = crypto_cfg.get("enable_gcm_zero_nonce", True)
         self.enable_ctr_first_iv = crypto_cfg.get("enable_ctr_first_iv", True)
+        self.cache_max_failures = int(crypto_cfg.get("variant_cache_max_failures", 3))
+
+        variants: List[Tuple[int, Callable[[bytes], Optional[bytes]]]] = []
+        if self.enable_gcm_first_nonce:
+            variants.append((0, self._decrypt_gcm_first_nonce))
+        if self.enable_gcm_zero_nonce:
+            variants.append((1, self._decrypt_gcm_zero_nonce))
+        if self.enable_ctr_first_iv:
+            variants.append((2, self._decrypt_ctr_first_iv))
+        self._variants = variants
+        self._variant_by_index = dict(variants)
+
+        # forrás → [variáns index, egymást követő hibák száma]
+        self._cache: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        n = len(self.VARIANT_NAMES)
+        self._hits = [0] * n         # cache-elt variáns elsőre sikerült
+        self._misses = [0] * n       # cache-elt variáns nem sikerült
+        self._successes = [0] * n    # összes sikeres dekódolás variánsonként
+        self._attempts = [0] * n     # összes próbálkozás variánsonként
+        self._invalidations = 0
+        self._evictions = 0
+        self._failed = 0
+
+    # ---- egyes variánsok ----
 
-    def try_decrypt_variants(self, data: bytes) -> Tuple[Optional[str], Optional[str]]:
+    def _decrypt_gcm_first_nonce(self, data: bytes) -> Optional[bytes]:
+        # AES-GCM: nonce = első 12 byte, ct = közép, tag = utolsó 16 byte
+        if len(data) <= 12 + 16:
+            return None
+        cipher = AES.new(self.aes_key, AES.MODE_GCM, nonce=data[:12])
+        try:
+            return cipher.decrypt_and_verify(data[12:-16], data[-16:])
+        except ValueError:
+            return None
+
+    def _decrypt_gcm_zero_nonce(self, data: bytes) -> Optional[bytes]:
+        # AES-GCM: nonce = 12 x 0x00, ct = data[:-16], tag = data[-16:]
+        cipher = AES.new(self.aes_key, AES.MODE_GCM, nonce=GCM_ZERO_NONCE)
+        try:
+            return cipher.decrypt_and_verify(data[:-16], data[-16:])
+        except ValueError:
+            return None
+
+    def _decrypt_ctr_first_iv(self, data: bytes) -> Optional[bytes]:
+        # AES-CTR: IV = első 16 byte, ciphertext = maradék
+        ctr = Counter.new(128, initial_value=int.from_bytes(data[:16], "big"))
+        cipher = AES.new(self.aes_key, AES.MODE_CTR, counter=ctr)
+        return cipher.decrypt(data[16:])
+
+    def _try_variant(self, index: int, data: bytes) -> Optional[Payload]:
+        pt = self._variant_by_index[index](data)
+        decoded: Optional[Payload] = None
+        if pt is not None:
+            if looks_like_line(pt):
+                decoded = pt.decode("ascii", errors="replace").strip()
+            elif self.AUTHENTICATED_VARIANTS[index] and is_binary_frame(pt):
+                decoded = pt
+        with self._cache_lock:
+            self._attempts[index] += 1
+            if decoded is not None:
+                self._successes[index] += 1
+        return decoded
+
+    # ---- publikus API ----
+
+    def try_decrypt_variants(self, data: bytes,
+                             source: Optional[str] = None) -> Tuple[Optional[Payload], Optional[str]]:
+        """
+        source: a küldő azonosítója (IP). Ha meg van adva, a cache-elt
+        variánssal kezdünk, és csak hiba esetén próbáljuk a többit.
+
+        Szöveges tartalomnál str, bináris UWB keretnél bytes az első elem.
+        """
         if len(data) <= 16:
             return None, None
 
-        # 1) AES-GCM: nonce = első 12 byte, ct = közép, tag = utolsó 16 byte
-        if self.enable_gcm_first_nonce and len(data) > 12 + 16:
-            nonce = data[:12]
-            tag = data[-16:]
-            ct = data[12:-16]
-            try:
-                cipher = AES.new(self.aes_key, AES.MODE_GCM, nonce=nonce)
-                pt = cipher.decrypt_and_verify(ct, tag)
-                if looks_like_line(pt):
-                    return pt.decode("ascii", errors="replace").strip(), "GCM[nonce=first12]"
-            except Exception:
-                pass
-
-        # 2) AES-GCM: nonce = 12 x 0x00, ct = data[:-16], tag = data[-16:]
-        if self.enable_gcm_zero_nonce and len(data) > 16:
-            nonce = b"\x00" * 12
-            tag = data[-16:]
-            ct = data[:-16]
-            try:
-                cipher = AES.new(self.aes_key, AES.MODE_GCM, nonce=nonce)
-                pt = cipher.decrypt_and_verify(ct, tag)
-                if looks_like_line(pt):
-                    return pt.decode("ascii", errors="replace").strip(), "GCM[nonce=0]"
-            except Exception:
-                pass
-
-        # 3) AES-CTR: IV = első 16 byte, ciphertext = maradék
-        if self.enable_ctr_first_iv and len(data) > 16:
-            iv = data[:16]
-            ct = data[16:]
-            try:
-                ctr = Counter.new(128, initial_value=int.from_bytes(iv, "big"))
-                cipher = AES.new(self.aes_key, AES.MODE_CTR, counter=ctr)
-                pt = cipher.decrypt(ct)
-                if looks_like_line(pt):
-                    return pt.decode("ascii", errors="replace").strip(), "CTR[iv=first16]"
-            except Exception:
-                pass
+        cached = None
+        if source is not None:
+            with self._cache_lock:
+                entry = self._cache.get(source)
+                if entry is not None:
+                    cached = entry[0]
+                    self._cache.move_to_end(source)
+
+        if cached is not None:
+            decoded = self._try_variant(cached, data)
+            if decoded is not None:
+                with self._cache_lock:
+                    entry = self._cache.get(source)
+                    if entry is not None:
+                        entry[1] = 0
+                    self._hits[cached] += 1
+                return decoded, self.VARIANT_NAMES[cached]
+
+            with self._cache_lock:
+                self._misses[cached] += 1
+                entry = self._cache.get(source)
+                if entry is not None:
+                    entry[1] += 1
+                    if entry[1] >= self.cache_max_failures:
+                        del self._cache[source]
+                        self._invalidations += 1
 
+        for index, _fn in self._variants:
+            if index == cached:
+                continue
+            decoded = self._try_variant(index, data)
+            if decoded is None:
+                continue
+            if source is not None:
+                with self._cache_lock:
+                    # új (vagy érvénytelenített) bejegyzés: ezzel kezdünk legközelebb
+                    if source not in self._cache:
+                        self._cache[source] = [index, 0]
+                        if len(self._cache) > self.MAX_TRACKED_SOURCES:
+                            self._cache.popitem(last=False)
+                            self._evictions += 1
+            return decoded, self.VARIANT_NAMES[index]
+
+        with self._cache_lock:
+            self._failed += 1
         return None, None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            per_variant = {
+                name: {
+                    "attempts": self._attempts[i],
+                    "successes": self._successes[i],
+                    "cache_hits": self._hits[i],
+                    "cache_misses": self._misses[i],
+                }
+                for i, name in enumerate(self.VARIANT_NAMES)
+            }
+            return {
+                "cached_sources": len(self._cache),
+                "invalidations": self._invalidations,
+                "evicted_sources": self._evictions,
+                "failed": self._failed,
+                "variants": per_variant,
+                "sources": {
+                    src: self.VARIANT_NAMES[entry[0]]
+                    for src, entry in self._cache.items()
+                },
+            }
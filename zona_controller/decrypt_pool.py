@@ -0,0 +1,257 @@
+# zona_controller/decrypt_pool.py
+
+import atexit
+import multiprocessing
+import struct
+import threading
+import zlib
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .crypto import CryptoEngine, Payload
+
+# bemeneti slot: [u32 hossz][nyers datagram]
+# kimeneti slot: [u32 hossz][i8 variáns index, -1 = sikertelen][dekódolt tartalom]
+#                bináris UWB keretnél a variáns indexhez _BINARY_FLAG adódik
+_IN_HDR = struct.Struct("<I")
+_OUT_HDR = struct.Struct("<Ib")
+# vezérlő üzenetek a pipe-on: csak slot index (+ forrás IP a cache-hez)
+_SLOT = struct.Struct("<I")
+_BINARY_FLAG = 0x40
+
+# (data, addr, ts_recv, decoded, mode)
+ResultHandler = Callable[[bytes, Tuple[str, int], float, Optional[Payload], Optional[str]], None]
+
+
+def _worker_main(aes_key: bytes, crypto_cfg: Dict[str, Any], in_name: str,
+                 out_name: str, slot_count: int, slot_size: int, conn) -> None:
+    """
+    Worker processz: a slot indexet a pipe-on kapja, a datagramot a közös
+    memóriából olvassa, és az eredményt is oda írja vissza.
+    """
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    in_buf = shm_in.buf
+    out_buf = shm_out.buf
+    crypto = CryptoEngine(aes_key, {"crypto": crypto_cfg})
+    variant_index = {name: i for i, name in enumerate(CryptoEngine.VARIANT_NAMES)}
+    max_out = slot_size - _OUT_HDR.size
+
+    try:
+        while True:
+            try:
+                msg = conn.recv_bytes()
+            except EOFError:
+                break
+            slot = _SLOT.unpack_from(msg)[0]
+            source = msg[_SLOT.size:].decode("ascii")
+
+            off = slot * slot_size
+            n = _IN_HDR.unpack_from(in_buf, off)[0]
+            data = in_buf[off + _IN_HDR.size: off + _IN_HDR.size + n]
+            try:
+                decoded, mode = crypto.try_decrypt_variants(data, source=source)
+            finally:
+                data.release()
+
+            if decoded is not None:
+                variant = variant_index[mode]
+                if isinstance(decoded, bytes):
+                    raw = decoded[:max_out]
+                    variant |= _BINARY_FLAG
+                else:
+                    raw = decoded.encode("ascii", errors="replace")[:max_out]
+                _OUT_HDR.pack_into(out_buf, off, len(raw), variant)
+                out_buf[off + _OUT_HDR.size: off + _OUT_HDR.size + len(raw)] = raw
+            else:
+                _OUT_HDR.pack_into(out_buf, off, 0, -1)
+
+            conn.send_bytes(msg[:_SLOT.size])
+    finally:
+        del in_buf, out_buf
+        shm_in.close()
+        shm_out.close()
+
+
+class _DecryptWorker:
+    """Egy worker processz + a hozzá tartozó közös memória és gyűjtő szál."""
+
+    def __init__(self, index: int, ctx, aes_key: bytes, crypto_cfg: Dict[str, Any],
+                 slot_count: int, slot_size: int, on_result: ResultHandler):
+        self.index = index
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.on_result = on_result
+
+        size = slot_count * slot_size
+        self.shm_in = shared_memory.SharedMemory(create=True, size=size)
+        self.shm_out = shared_memory.SharedMemory(create=True, size=size)
+
+        self.conn, child_conn = ctx.Pipe(duplex=True)
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(aes_key, crypto_cfg, self.shm_in.name, self.shm_out.name,
+                  slot_count, slot_size, child_conn),
+            daemon=True,
+            name=f"decrypt-{index}",
+        )
+
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._free: Deque[int] = deque(range(slot_count))
+        # slot → (data, addr, ts): a nyers csomag a szülőben marad, nem pickle-öljük
+        self._meta: List[Optional[Tuple[bytes, Tuple[str, int], float]]] = [None] * slot_count
+        self._collector = threading.Thread(
+            target=self._collect, daemon=True, name=f"decrypt-collect-{index}"
+        )
+
+        self.submitted = 0
+        self.completed = 0
+        self.decrypt_failed = 0
+        self.dropped_full = 0
+        self.dropped_oversize = 0
+        self.errors = 0
+
+    def start(self):
+        self.process.start()
+        self._collector.start()
+
+    def submit(self, data: bytes, addr: Tuple[str, int], ts: float) -> bool:
+        if len(data) > self.slot_size - _IN_HDR.size:
+            self.dropped_oversize += 1
+            return False
+        with self._lock:
+            if not self._free:
+                self.dropped_full += 1
+                return False
+            slot = self._free.popleft()
+            self._meta[slot] = (data, addr, ts)
+
+        off = slot * self.slot_size
+        _IN_HDR.pack_into(self.shm_in.buf, off, len(data))
+        self.shm_in.buf[off + _IN_HDR.size: off + _IN_HDR.size + len(data)] = data
+        try:
+            # külön lock a küldésre: a gyűjtő szál közben szabadon adhat vissza slotot
+            with self._send_lock:
+                self.conn.send_bytes(_SLOT.pack(slot) + addr[0].encode("ascii"))
+        except OSError:
+            # a worker processz nem él → a slotot visszaadjuk
+            with self._lock:
+                self._meta[slot] = None
+                self._free.append(slot)
+                self.errors += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def _collect(self):
+        out_buf = self.shm_out.buf
+        names = CryptoEngine.VARIANT_NAMES
+        while True:
+            try:
+                msg = self.conn.recv_bytes()
+            except (EOFError, OSError):
+                break
+            slot = _SLOT.unpack_from(msg)[0]
+            off = slot * self.slot_size
+            n, variant = _OUT_HDR.unpack_from(out_buf, off)
+            if variant >= 0:
+                start = off + _OUT_HDR.size
+                if variant & _BINARY_FLAG:
+                    decoded = bytes(out_buf[start: start + n])
+                else:
+                    decoded = str(out_buf[start: start + n], "ascii")
+                mode = names[variant & ~_BINARY_FLAG]
+            else:
+                decoded, mode = None, None
+                self.decrypt_failed += 1
+
+            with self._lock:
+                data, addr, ts = self._meta[slot]
+                self._meta[slot] = None
+                self._free.append(slot)
+
+            try:
+                self.on_result(data, addr, ts, decoded, mode)
+            except Exception as e:
+                self.errors += 1
+                print(f"[UDP] decrypt-{self.index} result handler error: {e}")
+            self.completed += 1
+
+    def close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+        for shm in (self.shm_in, self.shm_out):
+            try:
+                shm.close()
+                shm.unlink()
+            except (FileNotFoundError, BufferError):
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            inflight = self.slot_count - len(self._free)
+        return {
+            "worker": self.index,
+            "alive": self.process.is_alive(),
+            "inflight": inflight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "decrypt_failed": self.decrypt_failed,
+            "dropped_full": self.dropped_full,
+            "dropped_oversize": self.dropped_oversize,
+            "errors": self.errors,
+        }
+
+
+class DecryptPool:
+    """
+    Processz-alapú dekódoló fokozat (crypto.decrypt_workers > 0).
+
+    A datagramokat forrás IP szerint shardoljuk (crc32), így egy anchor
+    csomagjai mindig ugyanahhoz a workerhez kerülnek, és a worker FIFO
+    sorrendjében, egyetlen gyűjtő szálon keresztül jutnak vissza a
+    State / TDoAProcessor folyamba → anchoronként megmarad a sorrend.
+
+    A nyers és a dekódolt bájtok workerenkénti SharedMemory slotokban
+    utaznak, a pipe-on csak a slot index megy át.
+    """
+
+    def __init__(self, aes_key: bytes, config: Dict[str, Any], on_result: ResultHandler,
+                 workers: int = 4, slots_per_worker: int = 1024, slot_size: int = 4096 + 8):
+        crypto_cfg = dict(config.get("crypto", {}))
+        ctx = multiprocessing.get_context("spawn")
+        self.workers = [
+            _DecryptWorker(i, ctx, aes_key, crypto_cfg, slots_per_worker, slot_size, on_result)
+            for i in range(max(1, workers))
+        ]
+        atexit.register(self.close)
+
+    def start(self):
+        for w in self.workers:
+            w.start()
+
+    def shard_for(self, source: str) -> int:
+        return zlib.crc32(source.encode("ascii")) % len(self.workers)
+
+    def submit(self, data: bytes, addr: Tuple[str, int], ts: float) -> bool:
+        return self.workers[self.shard_for(addr[0])].submit(data, addr, ts)
+
+    def close(self):
+        for w in self.workers:
+            w.close()
+
+    def stats(self) -> Dict[str, Any]:
+        per_worker = [w.stats() for w in self.workers]
+        return {
+            "workers": len(self.workers),
+            "inflight": sum(s["inflight"] for s in per_worker),
+            "completed": sum(s["completed"] for s in per_worker),
+            "dropped": sum(s["dropped_full"] + s["dropped_oversize"] for s in per_worker),
+            "per_worker": per_worker,
+        }
@@ -0,0 +1,104 @@
+# zona_controller/dedup.py
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class DuplicateFilter:
+    """
+    Duplikátum / replay szűrő korlátos, időben lejáró LRU-val.
+
+    A kulcsokat beszúrási idő szerint rendezve tartjuk (OrderedDict), így
+    a lejárt bejegyzések mindig a lista elején vannak, és a takarítás csak
+    a ténylegesen lejárt elemeken megy végig. max_entries felett a
+    legrégebbi bejegyzés esik ki.
+
+    A számlálók forrásonként (anchor / IP) is megvannak: [látott, duplikált].
+    Ezt is LRU tartja, legfeljebb MAX_TRACKED_SOURCES forrással; a kiesett
+    források számai az "other" gyűjtőbe kerülnek (hamisított / pásztázó
+    forráscímek sem növelik korlátlanul a /api/stats méretét).
+    """
+
+    MAX_TRACKED_SOURCES = 256
+
+    def __init__(self, window_sec: float = 2.0, max_entries: int = 65536):
+        self.window_sec = window_sec
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._per_source: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._other = [0, 0]
+        self.checked = 0
+        self.duplicates = 0
+        self.expired = 0
+        self.evicted = 0
+
+    @classmethod
+    def from_params(cls, dedup_cfg: Dict[str, Any]) -> Optional["DuplicateFilter"]:
+        """Szűrő a tdoa.runtime.dedup szekcióból; None, ha enabled = false."""
+        if not dedup_cfg.get("enabled", True):
+            return None
+        return cls(
+            window_sec=float(dedup_cfg.get("window_sec", 2.0)),
+            max_entries=int(dedup_cfg.get("max_entries", 65536)),
+        )
+
+    def is_duplicate(self, key: Hashable, now: float, source: str) -> bool:
+        with self._lock:
+            entries = self._entries
+            cutoff = now - self.window_sec
+            while entries:
+                first_key, first_ts = next(iter(entries.items()))
+                if first_ts >= cutoff:
+                    break
+                entries.popitem(last=False)
+                self.expired += 1
+
+            self.checked += 1
+            per_source = self._per_source
+            counters = per_source.get(source)
+            if counters is None:
+                counters = per_source[source] = [0, 0]
+                if len(per_source) > self.MAX_TRACKED_SOURCES:
+                    _src, (seen, dup) = per_source.popitem(last=False)
+                    self._other[0] += seen
+                    self._other[1] += dup
+            else:
+                per_source.move_to_end(source)
+            counters[0] += 1
+
+            if key in entries:
+                self.duplicates += 1
+                counters[1] += 1
+                return True
+
+            entries[key] = now
+            if len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self.evicted += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_source = {
+                src: {
+                    "seen": seen,
+                    "duplicates": dup,
+                    "duplicate_rate": (dup / seen) if seen else 0.0,
+                }
+                for src, (seen, dup) in self._per_source.items()
+            }
+            return {
+                "entries": len(self._entries),
+                "checked": self.checked,
+                "duplicates": self.duplicates,
+                "duplicate_rate": (self.duplicates / self.checked) if self.checked else 0.0,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "per_source": per_source,
+                "other_sources": {
+                    "seen": self._other[0],
+                    "duplicates": self._other[1],
+                },
+            }
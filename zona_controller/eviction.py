@@ -0,0 +1,82 @@
+# zona_controller/eviction.py
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .runtime_params import TDoARuntimeParams
+from .state import State
+
+
+class EvictionSweeper(threading.Thread):
+    """
+    Háttér TTL takarító a State-hez.
+
+    interval_sec-enként meghívja a State.evict_expired()-et a config szerinti
+    korokkal:
+        - filter.tag_max_age_sec       → TAG "stale" jelölés
+        - eviction.tag_remove_after_sec → TAG törlés (tombstone a delta API-nak)
+        - eviction.node_max_age_sec     → fix pont (forrás IP) törlés
+        - buffer.max_age_sec            → anchor gyűrűk és sync csoportok
+
+    A paramétereket minden körben újraolvassa, így futás közben állíthatók.
+    """
+
+    def __init__(self, state: State, params: TDoARuntimeParams, processor=None):
+        super().__init__(daemon=True, name="eviction-sweeper")
+        self.state = state
+        self.params = params
+        self.processor = processor
+        self._stop_event = threading.Event()
+        self.rounds = 0
+        self.last_duration_sec = 0.0
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.state.register_stats_provider("eviction", self.stats)
+
+    def run(self):
+        print("[EVICT] TTL sweeper started")
+        while not self._stop_event.is_set():
+            ev = self.params.get_eviction_params()
+            interval = max(0.05, float(ev.get("interval_sec", 1.0)))
+            if ev.get("enabled", True):
+                try:
+                    self.sweep(ev)
+                except Exception as e:
+                    print(f"[EVICT] sweep error: {e}")
+            self._stop_event.wait(interval)
+
+    def sweep(self, ev: Optional[Dict[str, Any]] = None, now: Optional[float] = None) -> Dict[str, Any]:
+        if ev is None:
+            ev = self.params.get_eviction_params()
+        filter_cfg = self.params.get_filter_params()
+        buffer_cfg = self.params.get_buffer_params()
+
+        self.state.set_tombstone_limit(int(ev.get("tombstone_max_entries", 4096)))
+        t0 = time.perf_counter()
+        result = self.state.evict_expired(
+            now=time.time() if now is None else now,
+            tag_stale_sec=float(filter_cfg.get("tag_max_age_sec", 2.0)),
+            tag_remove_sec=float(ev.get("tag_remove_after_sec", 300.0)),
+            node_max_age_sec=float(ev.get("node_max_age_sec", 600.0)),
+            buffer_max_age_sec=float(buffer_cfg.get("max_age_sec", 2.0)),
+        )
+        self.last_duration_sec = time.perf_counter() - t0
+
+        removed = result.pop("removed_tag_ids", [])
+        if removed and self.processor is not None:
+            self.processor.forget_tags(removed)
+
+        self.rounds += 1
+        self.last_result = result
+        return result
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rounds": self.rounds,
+            "last_duration_ms": self.last_duration_sec * 1000.0,
+            "last_round": self.last_result,
+            **self.state.get_eviction_stats(),
+        }
@@ -0,0 +1,244 @@
+# zona_controller/filter_bank.py
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class KalmanFilterBank:
+    """
+    Az összes TAG 2D állandó sebességű Kalman szűrője egy tömbkészletben.
+    Állapot soronként: [x, y, vx, vy]; kovariancia: (4, 4).
+
+    - state: (N, 4), cov: (N, 4, 4), last_t: (N,) – előre foglalt, a
+      kapacitás duplázással nő; TAG → sor index a rows dictben
+    - predict / update egy hívással tetszőleges számú TAG-re: a
+      kovariancia 2x2 blokkokban, zárt alakban frissül (nincs F, Q, H
+      mátrix építés és nincs np.linalg.inv lépésenként)
+
+    Paraméterek (tdoa.runtime.filter):
+    - process_noise:    Q = q * I lépésenként
+    - pos_sigma_m:      mérési szórás (R = sigma^2 * I)
+    - tag_max_age_sec:  ennél régebbi track új fixnél újraindul
+    - max_jump_m:       az előrejelzéstől ennél messzebbi fixet eldobjuk;
+                        max_gated_in_row egymás utáni eldobás után a track
+                        újraindul (valódi ugrás, nem outlier)
+    - velocity_damping: sebesség csillapítás másodpercenként (v *= d^dt
+                        a predikcióban)
+
+    A track utolsó fixénél régebbi (késve beérkezett) mérést nem
+    dolgozzuk fel: a track és a last_t változatlan marad.
+
+    Nem szálbiztos: a hívó (TDoAProcessor) saját lockja alatt használja.
+    """
+
+    def __init__(self, capacity: int = 64, max_gated_in_row: int = 3):
+        capacity = max(1, int(capacity))
+        self.state = np.zeros((capacity, 4), dtype=np.float64)
+        self.cov = np.zeros((capacity, 4, 4), dtype=np.float64)
+        self.last_t = np.zeros(capacity, dtype=np.float64)
+        self.gated = np.zeros(capacity, dtype=np.int32)
+        self.rows: Dict[str, int] = {}
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+        self.max_gated_in_row = max_gated_in_row
+
+        self.process_noise = 0.1
+        self.meas_var = 0.25
+        self.max_age_sec = 2.0
+        self.max_jump_m = 5.0
+        self.velocity_damping = 0.8
+
+        self.updates = 0
+        self.inits = 0
+        self.gated_total = 0
+        self.late_total = 0
+
+    def configure(self, filter_cfg: Dict[str, Any]):
+        sigma = float(filter_cfg.get("pos_sigma_m", 0.5))
+        self.process_noise = float(filter_cfg.get("process_noise", 0.1))
+        self.meas_var = max(sigma * sigma, 1e-9)
+        self.max_age_sec = float(filter_cfg.get("tag_max_age_sec", 2.0))
+        self.max_jump_m = float(filter_cfg.get("max_jump_m", 5.0))
+        self.velocity_damping = min(max(float(filter_cfg.get("velocity_damping", 0.8)), 0.0), 1.0)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, tag_id: str) -> bool:
+        return tag_id in self.rows
+
+    @property
+    def capacity(self) -> int:
+        return self.state.shape[0]
+
+    def _grow(self):
+        old = self.capacity
+        new = old * 2
+        for name in ("state", "cov", "last_t", "gated"):
+            arr = getattr(self, name)
+            grown = np.zeros((new,) + arr.shape[1:], dtype=arr.dtype)
+            grown[:old] = arr
+            setattr(self, name, grown)
+        self._free.extend(range(new - 1, old - 1, -1))
+
+    def _row_for(self, tag_id: str) -> int:
+        row = self.rows.get(tag_id)
+        if row is None:
+            if not self._free:
+                self._grow()
+            row = self._free.pop()
+            self.rows[tag_id] = row
+            # új sor: a last_t = -inf miatt az első fix inicializál
+            self.last_t[row] = -np.inf
+        return row
+
+    def forget(self, tag_ids: Iterable[str]):
+        for tag_id in tag_ids:
+            row = self.rows.pop(tag_id, None)
+            if row is not None:
+                self._free.append(row)
+
+    def predict(self, tag_ids: Sequence[str], t) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Előrejelzett (x, y) a t időpont(ok)ra az állapot módosítása nélkül.
+        Visszatér: ((n, 2) pozíciók, (n,) érvényes maszk – van friss track).
+        """
+        n = len(tag_ids)
+        out = np.full((n, 2), np.nan)
+        rows = np.array([self.rows.get(tag_id, -1) for tag_id in tag_ids], dtype=np.intp)
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64), (n,))
+        known = rows >= 0
+        valid = known.copy()
+        if known.any():
+            r = rows[known]
+            age = t[known] - self.last_t[r]
+            fresh = age <= self.max_age_sec
+            valid[known] = fresh
+            s = self.state[r[fresh]]
+            out[valid] = s[:, :2] + s[:, 2:] * np.maximum(age[fresh], 0.0)[:, None]
+        return out, valid
+
+    def update(self, tag_ids: Sequence[str], t, xy: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Egy mérés TAG-enként (a tag_ids egyediek), egyetlen vektorizált lépésben.
+        Visszatér: ((n, 2) szűrt pozíciók, (n,) elfogadott maszk); a max_jump_m
+        kapun elbukott fixeknél a szűrt pozíció az előrejelzés, a track-nél
+        régebbi fixeknél a track aktuális pozíciója, a maszk mindkettőnél False.
+        """
+        n = len(tag_ids)
+        xy = np.asarray(xy, dtype=np.float64).reshape(n, 2)
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64), (n,))
+        rows = np.fromiter((self._row_for(tag_id) for tag_id in tag_ids), dtype=np.intp, count=n)
+        accepted = np.ones(n, dtype=bool)
+        if n == 0:
+            return xy.copy(), accepted
+
+        filtered = xy.copy()
+        age = t - self.last_t[rows]
+        late = age < 0.0
+        if late.any():
+            accepted[late] = False
+            filtered[late] = self.state[rows[late], :2]
+            self.late_total += int(late.sum())
+        init = (~(age <= self.max_age_sec) | (self.gated[rows] >= self.max_gated_in_row)) & ~late
+        if init.any():
+            self._init_rows(rows[init], t[init], xy[init])
+
+        step = ~init & ~late
+        if step.any():
+            accepted[step], filtered[step] = self._step_rows(
+                rows[step], np.maximum(age[step], 1e-3), t[step], xy[step])
+        self.updates += n
+        return filtered, accepted
+
+    def _init_rows(self, rows: np.ndarray, t: np.ndarray, xy: np.ndarray):
+        self.state[rows, :2] = xy
+        self.state[rows, 2:] = 0.0
+        self.cov[rows] = 0.0
+        # pozíció: a mérés szórása; sebesség: ismeretlen (nagy bizonytalanság)
+        idx = np.arange(4)
+        self.cov[rows[:, None], idx, idx] = (self.meas_var, self.meas_var, 1000.0, 1000.0)
+        self.last_t[rows] = t
+        self.gated[rows] = 0
+        self.inits += len(rows)
+
+    def _step_rows(self, rows: np.ndarray, dt: np.ndarray, t: np.ndarray,
+                   xy: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        P = self.cov[rows]
+        A = P[:, :2, :2]   # pozíció
+        B = P[:, :2, 2:]   # pozíció–sebesség
+        C = P[:, 2:, 2:]   # sebesség
+        d = self.velocity_damping ** dt if self.velocity_damping > 0.0 else np.zeros_like(dt)
+        dt_ = dt[:, None, None]
+        d_ = d[:, None, None]
+
+        # predikció: F = [[I, dt I], [0, d I]], P = F P F^T + q I (2x2 blokkokban)
+        Bt = np.swapaxes(B, 1, 2)
+        A_p = A + dt_ * (B + Bt) + dt_ * dt_ * C
+        B_p = d_ * (B + dt_ * C)
+        C_p = d_ * d_ * C
+        q = self.process_noise
+        A_p[:, 0, 0] += q
+        A_p[:, 1, 1] += q
+        C_p[:, 0, 0] += q
+        C_p[:, 1, 1] += q
+
+        s = self.state[rows]
+        pos = s[:, :2] + s[:, 2:] * dt[:, None]
+        vel = s[:, 2:] * d[:, None]
+        innov = xy - pos
+
+        # max_jump_m kapu (0: kikapcsolva); az eldobott fix csak a gated
+        # számlálót növeli, a track változatlan marad
+        if self.max_jump_m > 0.0:
+            ok = np.einsum("ij,ij->i", innov, innov) <= self.max_jump_m * self.max_jump_m
+        else:
+            ok = np.ones(len(rows), dtype=bool)
+
+        # S = A_p + R, zárt alakú 2x2 inverz; K = [A_p; B_p^T] S^-1
+        s00 = A_p[:, 0, 0] + self.meas_var
+        s01 = A_p[:, 0, 1]
+        s11 = A_p[:, 1, 1] + self.meas_var
+        det = s00 * s11 - s01 * s01
+        S_inv = np.empty_like(A_p)
+        S_inv[:, 0, 0] = s11 / det
+        S_inv[:, 0, 1] = -s01 / det
+        S_inv[:, 1, 0] = -s01 / det
+        S_inv[:, 1, 1] = s00 / det
+        PHt = np.concatenate((A_p, np.swapaxes(B_p, 1, 2)), axis=1)   # (n, 4, 2)
+        K = PHt @ S_inv
+
+        new_s = np.concatenate((pos, vel), axis=1) + np.einsum("nij,nj->ni", K, innov)
+        P_p = np.concatenate((np.concatenate((A_p, B_p), axis=2),
+                              np.concatenate((np.swapaxes(B_p, 1, 2), C_p), axis=2)), axis=1)
+        # P = P_p - K H P_p, ahol H P_p = P_p első két sora
+        new_P = P_p - K @ P_p[:, :2, :]
+
+        acc = rows[ok]
+        self.state[acc] = new_s[ok]
+        self.cov[acc] = new_P[ok]
+        self.last_t[acc] = t[ok]
+        self.gated[acc] = 0
+        rej = rows[~ok]
+        self.gated[rej] += 1
+        self.gated_total += len(rej)
+        # az eldobott fixeknél a visszaadott pozíció az előrejelzés
+        return ok, np.where(ok[:, None], new_s[:, :2], pos)
+
+    def snapshot(self, tag_id: str) -> Optional[Tuple[float, float, float, float, float]]:
+        """(x, y, vx, vy, last_t) egy TAG-re, vagy None."""
+        row = self.rows.get(tag_id)
+        if row is None:
+            return None
+        x, y, vx, vy = (float(v) for v in self.state[row])
+        return x, y, vx, vy, float(self.last_t[row])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracks": len(self.rows),
+            "capacity": self.capacity,
+            "updates": self.updates,
+            "inits": self.inits,
+            "gated": self.gated_total,
+            "late": self.late_total,
+        }
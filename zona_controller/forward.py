@@ -1,5 +1,11 @@
+import asyncio
 import socket
-from typing import Dict
+from typing import Dict, Optional
+
+
+def format_position(tag_id: str, x: float, y: float, z: float, ts: float) -> bytes:
+    msg = f"TAG:{tag_id},X:{x:.3f},Y:{y:.3f},Z:{z:.3f},T:{ts:.3f}"
+    return msg.encode("ascii")
 
 
 class PositionForwarder:
@@ -17,10 +23,40 @@ class PositionForwarder:
     def forward(self, tag_id: str, x: float, y: float, z: float, ts: float):
         if not self.enabled:
             return
-        msg = f"TAG:{tag_id},X:{x:.3f},Y:{y:.3f},Z:{z:.3f},T:{ts:.3f}"
-        data = msg.encode("ascii")
+        data = format_position(tag_id, x, y, z, ts)
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         try:
             sock.sendto(data, (self.host, self.port))
         finally:
             sock.close()
+
+
+class AsyncPositionForwarder(PositionForwarder):
+    """
+    asyncio-s változat: egyetlen, az event loop-hoz kötött datagram
+    transporton küld, csomagonként nem nyit új socketet.
+    Csak az event loop szálából hívható.
+    """
+    def __init__(self, cfg: Dict):
+        super().__init__(cfg)
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self.sent = 0
+
+    async def open(self, loop: asyncio.AbstractEventLoop):
+        if not self.enabled:
+            return
+        self._transport, _ = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol,
+            remote_addr=(self.host, self.port),
+        )
+
+    def forward(self, tag_id: str, x: float, y: float, z: float, ts: float):
+        if self._transport is None:
+            return
+        self._transport.sendto(format_position(tag_id, x, y, z, ts))
+        self.sent += 1
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
@@ -0,0 +1,421 @@
+# zona_controller/ingest.py
+
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# Linux: SO_RXQ_OVFL → a kernel minden datagramhoz csatolja a socket
+# eddigi eldobott csomagjainak számát (uint32, ancillary data).
+SO_RXQ_OVFL = getattr(socket, "SO_RXQ_OVFL", 40)
+_OVFL_STRUCT = struct.Struct("=I")
+
+# Egy batch: [(data, addr, ts_recv), ...]
+Datagram = Tuple[bytes, Tuple[str, int], float]
+BatchHandler = Callable[[List[Datagram]], None]
+
+
+def open_udp_socket(host: str, port: int, rcvbuf_bytes: int = 0,
+                    reuse_port: bool = False) -> socket.socket:
+    """
+    UDP socket nyitása opcionális SO_REUSEPORT / SO_RCVBUF / SO_RXQ_OVFL beállítással.
+    A nem támogatott opciókat csendben kihagyjuk (pl. nem Linux rendszeren).
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if reuse_port:
+        if not hasattr(socket, "SO_REUSEPORT"):
+            sock.close()
+            raise OSError("SO_REUSEPORT is not supported on this platform")
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    if rcvbuf_bytes > 0:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf_bytes)
+        except OSError:
+            pass
+    if sys.platform.startswith("linux"):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+        except OSError:
+            pass
+    sock.bind((host, port))
+    return sock
+
+
+class _SocketWorker(threading.Thread):
+    """
+    Egy SO_REUSEPORT sockethez tartozó fogadó szál.
+    Blokkolva vár az első datagramra, utána nem blokkoló módon
+    kiüríti a socketet max. batch_size elemig, és az egészet
+    egyszerre adja tovább a feldolgozó fokozatnak.
+    """
+
+    def __init__(self, index: int, sock: socket.socket, batch_size: int,
+                 max_datagram: int, handler: BatchHandler):
+        super().__init__(daemon=True, name=f"udp-rx-{index}")
+        self.index = index
+        self.sock = sock
+        self.batch_size = max(1, batch_size)
+        self.max_datagram = max_datagram
+        self.handler = handler
+        self._ancbufsize = socket.CMSG_SPACE(_OVFL_STRUCT.size)
+
+        # számlálók (csak ez a szál írja → nem kell lock)
+        self.packets = 0
+        self.bytes = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.kernel_drops = 0
+        self.errors = 0
+
+    def _recv(self, flags: int) -> Datagram:
+        data, ancdata, _msg_flags, addr = self.sock.recvmsg(
+            self.max_datagram, self._ancbufsize, flags
+        )
+        for level, ctype, cdata in ancdata:
+            if level == socket.SOL_SOCKET and ctype == SO_RXQ_OVFL \
+                    and len(cdata) >= _OVFL_STRUCT.size:
+                # kumulatív számláló a socket létrehozása óta
+                self.kernel_drops = _OVFL_STRUCT.unpack_from(cdata)[0]
+        return data, addr, time.time()
+
+    def run(self):
+        while True:
+            try:
+                batch = [self._recv(0)]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._recv(socket.MSG_DONTWAIT))
+                    except BlockingIOError:
+                        break
+            except OSError:
+                self.errors += 1
+                continue
+
+            n = len(batch)
+            self.packets += n
+            self.bytes += sum(len(d) for d, _, _ in batch)
+            self.batches += 1
+            if n > self.max_batch:
+                self.max_batch = n
+
+            try:
+                self.handler(batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"[UDP] rx-{self.index} handler error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "socket": self.index,
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "batches": self.batches,
+            "avg_batch": (self.packets / self.batches) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "kernel_drops": self.kernel_drops,
+            "errors": self.errors,
+        }
+
+
+class MultiSocketReceiver:
+    """
+    Többsocketes UDP fogadó (network.udp_ingest_mode = "multi").
+
+    N darab SO_REUSEPORT socketet nyit ugyanarra a host:port-ra, a kernel
+    forrás (ip:port) hash alapján osztja szét köztük a csomagokat, így egy
+    anchor csomagjai mindig ugyanarra a socketre (és szálra) érkeznek.
+    Minden socketet külön szál ürít batch-ekben.
+    """
+
+    def __init__(self, host: str, port: int, handler: BatchHandler,
+                 socket_count: int = 4, rcvbuf_bytes: int = 4 * 1024 * 1024,
+                 batch_size: int = 64, max_datagram: int = 4096):
+        self.host = host
+        self.port = port
+        self.rcvbuf_bytes = rcvbuf_bytes
+        self.workers: List[_SocketWorker] = []
+
+        for i in range(max(1, socket_count)):
+            sock = open_udp_socket(host, port, rcvbuf_bytes, reuse_port=True)
+            self.workers.append(
+                _SocketWorker(i, sock, batch_size, max_datagram, handler)
+            )
+
+    def start(self):
+        for w in self.workers:
+            w.start()
+
+    def effective_rcvbuf(self) -> Optional[int]:
+        # a kernel a kért érték kétszeresét adja vissza, a sysctl limit vághatja
+        if not self.workers:
+            return None
+        return self.workers[0].sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+    def stats(self) -> Dict[str, Any]:
+        per_socket = [w.stats() for w in self.workers]
+        return {
+            "mode": "multi",
+            "sockets": len(self.workers),
+            "rcvbuf_requested": self.rcvbuf_bytes,
+            "rcvbuf_effective": self.effective_rcvbuf(),
+            "packets": sum(s["packets"] for s in per_socket),
+            "kernel_drops": sum(s["kernel_drops"] for s in per_socket),
+            "per_socket": per_socket,
+        }
+
+
+DROP_POLICIES = ("drop_oldest", "drop_newest", "fair_share")
+
+
+class IngestQueue:
+    """
+    Korlátos gyűrűpuffer a fogadás és a feldolgozás között.
+
+    A slotok (nyers bytes, addr, fogadási idő) előre le vannak foglalva,
+    így a fogadó szál soha nem blokkol a lassú feldolgozáson: ha a puffer
+    tele van, a drop policy dönti el, mi vész el, és ez számlálóban látszik.
+
+    Drop policy-k:
+      - drop_oldest: a legrégebbi elem kiesik, az új bekerül
+      - drop_newest: az új elem kerül eldobásra
+      - fair_share:  forrás IP-nként kvóta (kapacitás / aktív források);
+                     aki a kvótája fölött van, annak az új csomagja esik ki,
+                     egyébként a leginkább kvóta fölötti forrás legrégebbi
+                     eleme (egy elárasztó forrás nem szoríthatja ki a csendeseket)
+
+    fair_share módban a sor közepéről kivett elem helyén "lyuk" marad (data
+    None); a gyűrű fizikailag kétszeres méretű, és ha betelik, egyetlen
+    menetben tömörítjük (amortizáltan O(1) elemenként).
+    """
+
+    # ennyi forrás eldobás számlálóját tartjuk külön; a többi "other"-be kerül
+    MAX_TRACKED_SOURCES = 256
+
+    def __init__(self, capacity: int, policy: str = "drop_oldest"):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown ingest drop policy: {policy}")
+        self.capacity = max(1, capacity)
+        self.policy = policy
+
+        slots = self.capacity * 2 if policy == "fair_share" else self.capacity
+        self._slots = slots
+        self._data: List[Optional[bytes]] = [None] * slots
+        self._addr: List[Optional[Tuple[str, int]]] = [None] * slots
+        self._ts: List[float] = [0.0] * slots
+        self._head = 0
+        self._used = 0    # fizikai foglaltság (élő elemek + lyukak)
+        self._count = 0   # élő elemek
+        self._cond = threading.Condition(threading.Lock())
+
+        # forrásonkénti foglaltság (fair_share: az elemek slot indexei, érkezési sorrendben)
+        self._per_source: Dict[str, Deque[int]] = {}
+        # forrásonkénti eldobás (korlátos, a legrégebben eldobó forrás kerül ki)
+        self._drops_by_source: "OrderedDict[str, int]" = OrderedDict()
+        self._drops_other = 0
+
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.dropped_fair = 0
+        self.high_watermark = 0
+
+    def _count_drop_locked(self, source: str):
+        drops = self._drops_by_source
+        n = drops.pop(source, 0) + 1
+        drops[source] = n
+        if len(drops) > self.MAX_TRACKED_SOURCES:
+            _src, old = drops.popitem(last=False)
+            self._drops_other += old
+
+    def _release_locked(self, i: int) -> Datagram:
+        item = (self._data[i], self._addr[i], self._ts[i])
+        self._data[i] = None
+        self._addr[i] = None
+        self._count -= 1
+        return item
+
+    def _pop_head_locked(self) -> Datagram:
+        # a fair_share által kivett elemek lyukait átugorjuk
+        while self._data[self._head] is None:
+            self._head = (self._head + 1) % self._slots
+            self._used -= 1
+        i = self._head
+        item = self._release_locked(i)
+        self._head = (i + 1) % self._slots
+        self._used -= 1
+
+        source = item[1][0]
+        slots = self._per_source[source]
+        slots.popleft()
+        if not slots:
+            del self._per_source[source]
+        return item
+
+    def _evict_from_locked(self, source: str) -> Datagram:
+        slots = self._per_source[source]
+        item = self._release_locked(slots.popleft())
+        if not slots:
+            del self._per_source[source]
+        return item
+
+    def _compact_locked(self):
+        """A lyukak kiszedése: az élő elemek a gyűrű elejére, sorrendtartóan."""
+        items = []
+        i = self._head
+        for _ in range(self._used):
+            if self._data[i] is not None:
+                items.append((self._data[i], self._addr[i], self._ts[i]))
+                self._data[i] = None
+                self._addr[i] = None
+            i = (i + 1) % self._slots
+        self._head = 0
+        self._used = len(items)
+        self._per_source = {}
+        for j, (data, addr, ts) in enumerate(items):
+            self._data[j] = data
+            self._addr[j] = addr
+            self._ts[j] = ts
+            self._per_source.setdefault(addr[0], deque()).append(j)
+
+    def _put_locked(self, data: bytes, addr: Tuple[str, int], ts: float) -> bool:
+        source = addr[0]
+
+        if self._count >= self.capacity:
+            if self.policy == "drop_newest":
+                self.dropped_newest += 1
+                self._count_drop_locked(source)
+                return False
+
+            if self.policy == "fair_share":
+                active = len(self._per_source)
+                if source not in self._per_source:
+                    active += 1
+                quota = max(1, self.capacity // active)
+                own = self._per_source.get(source)
+                if own is not None and len(own) >= quota:
+                    self.dropped_fair += 1
+                    self._count_drop_locked(source)
+                    return False
+                # a leginkább kvóta fölötti forrás legrégebbi eleme esik ki
+                victim = max(self._per_source, key=lambda src: len(self._per_source[src]))
+                self._evict_from_locked(victim)
+                self.dropped_fair += 1
+                self._count_drop_locked(victim)
+            else:
+                _, old_addr, _ = self._pop_head_locked()
+                self.dropped_oldest += 1
+                self._count_drop_locked(old_addr[0])
+
+        if self._used >= self._slots:
+            self._compact_locked()
+        tail = (self._head + self._used) % self._slots
+        self._data[tail] = data
+        self._addr[tail] = addr
+        self._ts[tail] = ts
+        self._used += 1
+        self._count += 1
+        slots = self._per_source.get(source)
+        if slots is None:
+            slots = self._per_source[source] = deque()
+        slots.append(tail)
+
+        self.enqueued += 1
+        if self._count > self.high_watermark:
+            self.high_watermark = self._count
+        return True
+
+    def put(self, data: bytes, addr: Tuple[str, int], ts: float) -> bool:
+        with self._cond:
+            ok = self._put_locked(data, addr, ts)
+            self._cond.notify()
+        return ok
+
+    def put_batch(self, batch: List[Datagram]) -> int:
+        """Egy lock-felvétellel teszi be a teljes batch-et. Visszaadja a bekerültek számát."""
+        accepted = 0
+        with self._cond:
+            for data, addr, ts in batch:
+                if self._put_locked(data, addr, ts):
+                    accepted += 1
+            self._cond.notify(len(batch))
+        return accepted
+
+    def get_batch(self, max_items: int = 64, timeout: Optional[float] = None) -> List[Datagram]:
+        with self._cond:
+            if self._count == 0:
+                self._cond.wait(timeout)
+            n = min(max_items, self._count)
+            items = [self._pop_head_locked() for _ in range(n)]
+            self.dequeued += n
+            return items
+
+    def depth(self) -> int:
+        with self._cond:
+            return self._count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "policy": self.policy,
+                "depth": self._count,
+                "high_watermark": self.high_watermark,
+                "enqueued": self.enqueued,
+                "dequeued": self.dequeued,
+                "dropped_oldest": self.dropped_oldest,
+                "dropped_newest": self.dropped_newest,
+                "dropped_fair": self.dropped_fair,
+                "dropped_total": self.dropped_oldest + self.dropped_newest + self.dropped_fair,
+                "active_sources": len(self._per_source),
+                "drops_by_source": dict(self._drops_by_source),
+                "drops_other_sources": self._drops_other,
+            }
+
+
+class IngestWorkerPool:
+    """
+    Feldolgozó szálak az IngestQueue mögött.
+
+    Egy worker esetén a csomagok sorrendje teljesen megmarad; több worker
+    esetén a forrásonkénti sorrend nem garantált (a State műveletei ettől
+    még szálbiztosak).
+    """
+
+    def __init__(self, queue: IngestQueue,
+                 handler: Callable[[bytes, Tuple[str, int], float], None],
+                 workers: int = 1, batch_size: int = 64):
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = max(1, batch_size)
+        self.errors = 0
+        self.processed = 0
+        self._threads = [
+            threading.Thread(target=self._run, daemon=True, name=f"ingest-worker-{i}")
+            for i in range(max(1, workers))
+        ]
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+
+    def _run(self):
+        while True:
+            batch = self.queue.get_batch(self.batch_size, timeout=1.0)
+            for data, addr, ts in batch:
+                try:
+                    self.handler(data, addr, ts)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[UDP] ingest worker error: {e}")
+            self.processed += len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        result = self.queue.stats()
+        result["workers"] = len(self._threads)
+        result["processed"] = self.processed
+        result["errors"] = self.errors
+        return result
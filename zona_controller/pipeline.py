@@ -0,0 +1,71 @@
+# zona_controller/pipeline.py
+
+from typing import Optional, Tuple
+
+from .crypto import CryptoEngine, Payload
+from .dedup import DuplicateFilter
+from .uwb_parser import describe_uwb_frame, parse_uwb_frame, parse_uwb_lines
+from .state import State
+from .tdoa import TDoAProcessor
+from .runtime_params import TDoARuntimeParams
+
+
+class PacketPipeline:
+    """
+    Egy beérkezett datagram feldolgozása a fogadás után:
+    dekódolás → zóna előszűrés → State frissítés → TDoAProcessor.
+
+    A szálas (UDPServer) és az asyncio (AsyncUDPServer) futtatókörnyezet
+    is ezt használja, így a két modell csak a fogadásban különbözik.
+    """
+
+    def __init__(self, state: State, processor: TDoAProcessor,
+                 params: TDoARuntimeParams, crypto: CryptoEngine):
+        self.state = state
+        self.processor = processor
+        self.params = params
+        self.crypto = crypto
+        self.state.register_stats_provider("crypto", self.crypto.stats)
+
+        # dekódolás ELŐTTI duplikátum szűrés a nyers bájtok hash-e alapján
+        self.dedup = DuplicateFilter.from_params(params.get_dedup_params())
+        if self.dedup is not None:
+            self.state.register_stats_provider("dedup_raw", self.dedup.stats)
+
+    def is_duplicate(self, data: bytes, addr: Tuple[str, int], ts: float) -> bool:
+        """Ugyanaz a datagram (pl. relé switch miatt) másodszor már nem megy tovább."""
+        if self.dedup is None:
+            return False
+        return self.dedup.is_duplicate((len(data), hash(data)), ts, addr[0])
+
+    def handle(self, data: bytes, addr: Tuple[str, int], ts: float):
+        if self.is_duplicate(data, addr, ts):
+            return
+        decoded, mode = self.crypto.try_decrypt_variants(data, source=addr[0])
+        self.handle_decoded(data, addr, ts, decoded, mode)
+
+    def handle_decoded(self, data: bytes, addr: Tuple[str, int], ts: float,
+                       decoded: Optional[Payload], mode: Optional[str]):
+        """A dekódolás utáni rész (a DecryptPool eredményei is ide érkeznek)."""
+        # ELŐSZŰRÉS zóna alapján: ami itt nem megy át, az sehová nem kerül.
+        # A sorokat itt egyetlen menetben parse-oljuk, a processzor már a
+        # kész rekordokat kapja (nincs második tokenizálás / zóna ellenőrzés).
+        records = None
+        if decoded:
+            zone_cfg = self.params.get_zone_params()
+            expected_hex = zone_cfg.get("expected_zone_id_hex")
+            if isinstance(decoded, bytes):
+                # bináris keret: több mérés egy datagramban
+                zone_ok, records = parse_uwb_frame(decoded, expected_hex)
+                decoded = describe_uwb_frame(decoded)
+            else:
+                zone_ok, records = parse_uwb_lines(decoded, expected_hex)
+            # ha nincs zone_id, vagy nem egyezik → eldobjuk a csomagot
+            if not zone_ok:
+                return
+
+        # CSAK az engedélyezett csomagok frissítik az állapotot
+        self.state.update_last_message(addr, data, decoded, mode)
+
+        if records:
+            self.processor.update_from_records(records, ts)
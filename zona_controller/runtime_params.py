@@ -17,6 +17,11 @@ class TDoARuntimeParams:
             buffer { ... }
             solver { ... }
             filter { ... }
+            dedup { ... }
+            eviction { ... }
+            history { ... }
+            gdop { ... }
+            clock { ... }
         }
 
     A get_*_params() metódusok diktet adnak vissza a releváns részekkel.
@@ -28,6 +33,8 @@ class TDoARuntimeParams:
         self._lock = threading.Lock()
         self._last_load_ts = 0.0
         self._cache: Dict[str, Any] = {}
+        # a _cache-be betöltött config generációja (-1: még nincs betöltve)
+        self._generation = -1
 
     def _reload_if_needed(self) -> None:
         now = time.time()
@@ -35,6 +42,7 @@ class TDoARuntimeParams:
         if now - self._last_load_ts < 1.0:
             return
 
+        generation = self._cfg_mgr.generation
         cfg = self._cfg_mgr.get_config()
         tdoa = cfg.get("tdoa", {})
         runtime = tdoa.get("runtime", {})
@@ -42,6 +50,11 @@ class TDoARuntimeParams:
         buffer_cfg = runtime.get("buffer", {})
         solver_cfg = runtime.get("solver", {})
         filter_cfg = runtime.get("filter", {})
+        dedup_cfg = runtime.get("dedup", {})
+        eviction_cfg = runtime.get("eviction", {})
+        history_cfg = runtime.get("history", {})
+        gdop_cfg = runtime.get("gdop", {})
+        clock_cfg = runtime.get("clock", {})
 
         # zóna filter rész
         zone_cfg = {
@@ -76,7 +89,32 @@ class TDoARuntimeParams:
                 "initial_guess", {"x": 0.0, "y": 0.0, "z": 0.0}
             ),
             "debug_output": bool(solver_cfg.get("debug_output", False)),
+            # "filtered" / "raw" / "both" (TDoAProcessor.publish_results)
             "forward_mode": solver_cfg.get("forward_mode", "filtered"),
+            # "iterative" (GN/LM) vagy "fast" (csak zárt alakú becslés);
+            # zone_modes: zóna hex → mód felülírás
+            "mode": str(solver_cfg.get("mode", "iterative")),
+            # (tag, sync) befejezés ütemező: megoldás a várt anchorok
+            # beérkezésekor vagy a deadline lejártakor, max. ennyi finomítással
+            "completion_scheduler": bool(solver_cfg.get("completion_scheduler", True)),
+            "completion_deadline_ms": float(solver_cfg.get("completion_deadline_ms", 30.0)),
+            "max_refinements": int(solver_cfg.get("max_refinements", 1)),
+            # 0: csomagonkénti solve, > 0: kötegelt solver tick ennyi Hz-cel
+            "batch_tick_hz": float(solver_cfg.get("batch_tick_hz", 0.0)),
+            # NLOS / outlier anchor kiszűrés: ennél nagyobb RMS maradéknál
+            # részhalmazokat próbálunk, részhalmaz- és időkerettel
+            "robust_enabled": bool(solver_cfg.get("robust_enabled", True)),
+            "robust_trigger_rms_m": float(solver_cfg.get("robust_trigger_rms_m", 0.3)),
+            "robust_max_subsets": int(solver_cfg.get("robust_max_subsets", 32)),
+            "robust_max_us": float(solver_cfg.get("robust_max_us", 2000.0)),
+            # 0: megoldás a feldolgozó szálon, > 0: ennyi solver processz,
+            # TAG hash szerinti shardolással (osztott memórián át)
+            "pool_workers": int(solver_cfg.get("pool_workers", 0)),
+            "pool_slots_per_worker": int(solver_cfg.get("pool_slots_per_worker", 256)),
+            "pool_max_anchors": int(solver_cfg.get("pool_max_anchors", 32)),
+            "zone_modes": {
+                str(k).strip('"'): str(v) for k, v in dict(solver_cfg.get("zone_modes", {})).items()
+            },
         }
 
         # filter paraméterek
@@ -88,15 +126,91 @@ class TDoARuntimeParams:
             "velocity_damping": float(filter_cfg.get("velocity_damping", 0.8)),
         }
 
+        # duplikátum / replay szűrés
+        dedup_params = {
+            "enabled": bool(dedup_cfg.get("enabled", True)),
+            "window_sec": float(dedup_cfg.get("window_sec", 2.0)),
+            "max_entries": int(dedup_cfg.get("max_entries", 65536)),
+        }
+
+        # háttér TTL takarítás (a stale / buffer korokat a filter / buffer rész adja)
+        eviction_params = {
+            "enabled": bool(eviction_cfg.get("enabled", True)),
+            "interval_sec": float(eviction_cfg.get("interval_sec", 1.0)),
+            "tag_remove_after_sec": float(eviction_cfg.get("tag_remove_after_sec", 300.0)),
+            "node_max_age_sec": float(eviction_cfg.get("node_max_age_sec", 600.0)),
+            "tombstone_max_entries": int(eviction_cfg.get("tombstone_max_entries", 4096)),
+        }
+
+        # TAG pozíció történet: nyers gyűrű + bucket átlagolt szintek
+        history_params = {
+            "enabled": bool(history_cfg.get("enabled", True)),
+            "raw_size": int(history_cfg.get("raw_size", 600)),
+            "tiers": [
+                (float(t.get("bucket_sec", 1.0)), int(t.get("size", 1800)))
+                for t in history_cfg.get("tiers", [
+                    {"bucket_sec": 1.0, "size": 1800},
+                    {"bucket_sec": 10.0, "size": 2880},
+                ])
+            ],
+            "max_points": int(history_cfg.get("max_points", 5000)),
+        }
+
+        # előre számolt GDOP rács a tdoa.map területére (geometria minőség)
+        guess = solver_params["initial_guess"] or {}
+        gdop_params = {
+            "enabled": bool(gdop_cfg.get("enabled", True)),
+            "resolution_m": float(gdop_cfg.get("resolution_m", 0.25)),
+            "max_cells": int(gdop_cfg.get("max_cells", 250_000)),
+            # a TAG-ek feltételezett magassága (alapból az initial_guess z)
+            "z_m": float(gdop_cfg.get("z_m", guess.get("z", 0.0))),
+            "leave_one_out": bool(gdop_cfg.get("leave_one_out", True)),
+            # enable_geometry_checks mellett az ennél rosszabb GDOP-ú fixek
+            # eldobása (0: csak a debug_info-ba kerül)
+            "max_gdop": float(gdop_cfg.get("max_gdop", 0.0)),
+            # üres: nincs lemez cache
+            "cache_dir": str(gdop_cfg.get("cache_dir", "") or ""),
+        }
+
+        # anchor óra modell (offset + skew) a sync beaconokból
+        clock_params = {
+            "enabled": bool(clock_cfg.get("enabled", True)),
+            # üres: az első engedélyezett anchor az időalap
+            "master_anchor": str(clock_cfg.get("master_anchor", "") or ""),
+            "forgetting": float(clock_cfg.get("forgetting", 0.995)),
+            "noise_m": float(clock_cfg.get("noise_m", 0.05)),
+            "max_skew_ppm": float(clock_cfg.get("max_skew_ppm", 100.0)),
+            "outlier_m": float(clock_cfg.get("outlier_m", 1.0)),
+            "min_rounds": int(clock_cfg.get("min_rounds", 5)),
+            "stale_sec": float(clock_cfg.get("stale_sec", 30.0)),
+            "max_rounds": int(clock_cfg.get("max_rounds", 16)),
+            "recenter_sec": float(clock_cfg.get("recenter_sec", 600.0)),
+        }
+
         with self._lock:
             self._cache = {
                 "zone": zone_cfg,
                 "buffer": buffer_params,
                 "solver": solver_params,
                 "filter": filter_params,
+                "dedup": dedup_params,
+                "eviction": eviction_params,
+                "history": history_params,
+                "gdop": gdop_params,
+                "clock": clock_params,
             }
+            self._generation = generation
             self._last_load_ts = now
 
+    @property
+    def generation(self) -> int:
+        """
+        A legutóbb betöltött paraméterek config generációja; az ebből
+        származtatott állapot (pl. ClockTable) csak ennek változásakor
+        konfigurálandó újra.
+        """
+        return self._generation
+
     def get_zone_params(self) -> Dict[str, Any]:
         self._reload_if_needed()
         with self._lock:
@@ -116,3 +230,28 @@ class TDoARuntimeParams:
         self._reload_if_needed()
         with self._lock:
             return dict(self._cache.get("filter", {}))
+
+    def get_dedup_params(self) -> Dict[str, Any]:
+        self._reload_if_needed()
+        with self._lock:
+            return dict(self._cache.get("dedup", {}))
+
+    def get_eviction_params(self) -> Dict[str, Any]:
+        self._reload_if_needed()
+        with self._lock:
+            return dict(self._cache.get("eviction", {}))
+
+    def get_history_params(self) -> Dict[str, Any]:
+        self._reload_if_needed()
+        with self._lock:
+            return dict(self._cache.get("history", {}))
+
+    def get_gdop_params(self) -> Dict[str, Any]:
+        self._reload_if_needed()
+        with self._lock:
+            return dict(self._cache.get("gdop", {}))
+
+    def get_clock_params(self) -> Dict[str, Any]:
+        self._reload_if_needed()
+        with self._lock:
+            return dict(self._cache.get("clock", {}))
@@ -0,0 +1,147 @@
+# zona_controller/solve_tick.py
+
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+from .tdoa_solver.api import (
+    anchor_geometry,
+    clock_table_for,
+    gdop_grid_for,
+    prepare_sync_group,
+    tag_to_int,
+)
+from .tdoa_solver.batch import solve_problems_batch
+
+
+class BatchSolveTick(threading.Thread):
+    """
+    Kötegelt solver tick (solver.batch_tick_hz > 0).
+
+    A TDoAProcessor csomagonként csak megjelöli az érintett TAG-eket (mark);
+    a tick 1 / batch_tick_hz másodpercenként az összes megjelölt TAG legjobb
+    (tag, sync) csoportját egy lock alatt kiveszi a State-ből, egy kötegben
+    megoldja (solve_problems_batch), és az eredményeket egyetlen State
+    frissítéssel írja vissza. A csomagonkénti késleltetés legfeljebb egy tick.
+
+    Szál módban saját szálon fut (start()); asyncio runtime-ban az
+    AsyncUDPServer hívja a tick()-et a feldolgozó executoron.
+    """
+
+    def __init__(self, processor, hz: float):
+        super().__init__(daemon=True, name="solve-tick")
+        self.processor = processor
+        self.hz = hz
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._stop_event = threading.Event()
+
+        self.ticks = 0
+        self.solved = 0
+        self.failed = 0
+        self.max_batch = 0
+        self.last_batch = 0
+        self.last_duration_sec = 0.0
+        self.errors = 0
+
+    @property
+    def interval_sec(self) -> float:
+        return 1.0 / max(self.hz, 1e-3)
+
+    def mark(self, tag_id: str):
+        with self._lock:
+            self._pending.add(tag_id)
+
+    def run(self):
+        print(f"[TDOA] batch solve tick started ({self.hz:g} Hz)")
+        next_ts = time.monotonic()
+        while not self._stop_event.is_set():
+            next_ts += self.interval_sec
+            try:
+                self.tick()
+            except Exception as e:
+                self.errors += 1
+                print(f"[TDOA] batch solve tick error: {e}")
+            delay = next_ts - time.monotonic()
+            if delay < 0:
+                # lemaradtunk: nem próbáljuk behozni, a következő tick most indul
+                next_ts = time.monotonic()
+                delay = 0.0
+            self._stop_event.wait(delay)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def tick(self, now: Optional[float] = None) -> int:
+        """Egy kötegelt megoldás; visszatér a megoldott TAG-ek számával."""
+        with self._lock:
+            pending = self._pending
+            self._pending = set()
+        if not pending:
+            return 0
+
+        t0 = time.perf_counter()
+        if now is None:
+            now = time.time()
+        processor = self.processor
+        params = processor.params
+        state = processor.state
+
+        max_age_sec = float(params.get_buffer_params().get("max_age_sec", 2.0))
+        solver_cfg = params.get_solver_params()
+        geometry = anchor_geometry(params)
+        if geometry is None:
+            return 0
+
+        by_int: Dict[int, str] = {}
+        for tag_id in pending:
+            tag_int = tag_to_int(tag_id)
+            if tag_int is not None:
+                by_int[tag_int] = tag_id
+
+        groups = state.get_best_sync_groups(list(by_int), now - max_age_sec)
+        clocks = clock_table_for(params)
+        problems = []
+        # a pozíció ideje a csoport utolsó mérésének fogadási ideje (mint
+        # csomagonkénti módban), nem a tick ideje
+        group_ts: Dict[str, float] = {}
+        for tag_int, (sync, heard) in groups.items():
+            tag_id = by_int[tag_int]
+            problem = prepare_sync_group(tag_id, sync, heard, geometry, solver_cfg, clocks)
+            if problem is not None:
+                problems.append(problem)
+                group_ts[tag_id] = max(ts for ts, _uwb in heard.values())
+        if problems:
+            # kezdőpont: a TAG track előrejelzése a mérés idejére (egy bank hívás)
+            hints = processor.track_hints([p.tag_id for p in problems],
+                                          [group_ts[p.tag_id] for p in problems])
+            problems = [p._replace(x0_hint=h) for p, h in zip(problems, hints)]
+
+        results = (solve_problems_batch(problems, solver_cfg, gdop_grid_for(params))
+                   if problems else [])
+        solved = [r for r in results if r is not None]
+        self.failed += len(results) - len(solved)
+        # track frissítés (egy vektorizált Kalman lépés) + State / forward kiírás
+        published = processor.publish_results(solved, [group_ts[r.tag_id] for r in solved])
+
+        self.ticks += 1
+        self.solved += len(solved)
+        self.last_batch = len(problems)
+        self.max_batch = max(self.max_batch, len(problems))
+        self.last_duration_sec = time.perf_counter() - t0
+        return published
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "hz": self.hz,
+            "ticks": self.ticks,
+            "pending_tags": pending,
+            "solved": self.solved,
+            "failed": self.failed,
+            "last_batch": self.last_batch,
+            "max_batch": self.max_batch,
+            "last_duration_ms": self.last_duration_sec * 1000.0,
+            "errors": self.errors,
+        }
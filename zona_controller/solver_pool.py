@@ -0,0 +1,403 @@
+# zona_controller/solver_pool.py
+
+import atexit
+import multiprocessing
+import pickle
+import struct
+import threading
+import zlib
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .tdoa_solver.api import (
+    ProblemSolution,
+    SyncGroupProblem,
+    solve_problem,
+    subproblem,
+)
+from .tdoa_solver.solver import SolverOutput
+
+# vezérlő üzenetek a pipe-on:
+#   b"S" + slot        – megoldandó probléma a slotban
+#   b"C" + pickle(cfg) – új solver paraméterek (ha változtak)
+# válasz: slot index
+_SLOT = struct.Struct("<I")
+_MSG_SOLVE = b"S"
+_MSG_CONFIG = b"C"
+
+_MODES = ("iterative", "fast")
+_SOLVERS = ("closed_form", "lm", "gauss_newton")
+_INITS = (None, "track", "closed_form", "centroid")
+
+# (probléma, megoldás vagy None, ts)
+ResultHandler = Callable[[SyncGroupProblem, Optional[ProblemSolution], float], None]
+
+
+def _in_dtype(max_anchors: int) -> np.dtype:
+    return np.dtype([
+        ("n", "<i4"), ("ref", "<i4"), ("dims", "<i4"), ("mode", "i1"), ("has_hint", "i1"),
+        ("z_guess", "<f8"), ("hint", "<f8", (2,)),
+        ("anchors", "<f8", (max_anchors, 3)), ("range_diff", "<f8", (max_anchors,)),
+    ])
+
+
+def _out_dtype(max_anchors: int) -> np.dtype:
+    return np.dtype([
+        ("ok", "i1"), ("converged", "i1"), ("solver", "i1"), ("init", "i1"),
+        ("dims", "<i4"), ("iterations", "<i4"), ("discarded", "<i4"),
+        # robust lépés: megtartott anchorok (eredeti index, az első n_keep),
+        # eldobottak sorrendben, új referencia a megtartottak közt
+        ("n_keep", "<i4"), ("keep", "<i2", (max_anchors,)), ("ref", "<i4"),
+        ("robust", "i1"), ("n_rejected", "<i4"), ("rejected", "<i2", (max_anchors,)),
+        ("subsets", "<i4"), ("budget_exhausted", "i1"),
+        ("elapsed_us", "<f8"), ("rms_before_m", "<f8"),
+        ("position", "<f8", (3,)), ("residuals", "<f8", (max_anchors,)), ("rms", "<f8"),
+    ])
+
+
+def _write_problem(row, problem: SyncGroupProblem):
+    n = problem.anchors.shape[0]
+    row["n"] = n
+    row["ref"] = problem.ref
+    row["dims"] = problem.dims
+    row["mode"] = _MODES.index(problem.mode)
+    row["z_guess"] = problem.z_guess
+    row["has_hint"] = problem.x0_hint is not None
+    if problem.x0_hint is not None:
+        row["hint"] = problem.x0_hint
+    row["anchors"][:n] = problem.anchors
+    row["range_diff"][:n] = problem.range_diff
+
+
+def _read_problem(row) -> SyncGroupProblem:
+    n = int(row["n"])
+    # a worker csak indexeket lát: az azonosítók az eredeti sorszámok
+    return SyncGroupProblem(
+        tag_id="",
+        sync=0,
+        ids=[str(i) for i in range(n)],
+        anchors=np.array(row["anchors"][:n]),
+        range_diff=np.array(row["range_diff"][:n]),
+        ref=int(row["ref"]),
+        zone_hex=None,
+        mode=_MODES[int(row["mode"])],
+        dims=int(row["dims"]),
+        z_guess=float(row["z_guess"]),
+        anchor_index=list(range(n)),
+        x0_hint=(float(row["hint"][0]), float(row["hint"][1])) if row["has_hint"] else None,
+    )
+
+
+def _write_solution(row, solution: ProblemSolution):
+    out = solution.out
+    keep = [int(i) for i in solution.problem.ids]
+    row["ok"] = 1
+    row["converged"] = out.converged
+    row["solver"] = _SOLVERS.index(solution.solver_name)
+    row["init"] = _INITS.index(solution.init)
+    row["dims"] = out.dims
+    row["iterations"] = out.iterations
+    row["discarded"] = solution.discarded_iterations
+    row["n_keep"] = len(keep)
+    row["keep"][:len(keep)] = keep
+    row["ref"] = solution.problem.ref
+    robust = solution.robust
+    row["robust"] = robust is not None
+    if robust is not None:
+        rejected = [int(i) for i in robust["rejected_anchors"]]
+        row["n_rejected"] = len(rejected)
+        row["rejected"][:len(rejected)] = rejected
+        row["subsets"] = robust["subsets"]
+        row["budget_exhausted"] = robust["budget_exhausted"]
+        row["elapsed_us"] = robust["elapsed_us"]
+        row["rms_before_m"] = robust["rms_before_m"]
+    row["position"] = out.position
+    row["residuals"][:len(keep)] = out.residuals
+    row["rms"] = out.rms_residual_m
+
+
+def _read_solution(row, problem: SyncGroupProblem) -> Optional[ProblemSolution]:
+    if not row["ok"]:
+        return None
+    n_keep = int(row["n_keep"])
+    robust = None
+    if row["robust"]:
+        robust = {
+            "rejected_anchors": [problem.ids[i] for i in row["rejected"][:int(row["n_rejected"])]],
+            "subsets": int(row["subsets"]),
+            "elapsed_us": float(row["elapsed_us"]),
+            "rms_before_m": float(row["rms_before_m"]),
+            "budget_exhausted": bool(row["budget_exhausted"]),
+        }
+    if n_keep != problem.anchors.shape[0]:
+        problem = subproblem(problem, [int(i) for i in row["keep"][:n_keep]], int(row["ref"]))
+    out = SolverOutput(
+        np.array(row["position"]),
+        np.array(row["residuals"][:n_keep]),
+        int(row["iterations"]),
+        bool(row["converged"]),
+        float(row["rms"]),
+        int(row["dims"]),
+    )
+    return ProblemSolution(problem, out, _SOLVERS[int(row["solver"])], _INITS[int(row["init"])],
+                           robust, int(row["discarded"]))
+
+
+def _worker_main(solver_cfg: Dict[str, Any], in_name: str, out_name: str, slot_count: int,
+                 max_anchors: int, conn) -> None:
+    """
+    Solver worker processz: a slot indexet a pipe-on kapja, a probléma
+    tömbjeit a közös memóriából olvassa, a megoldást is oda írja vissza.
+    """
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    inputs = np.ndarray((slot_count,), dtype=_in_dtype(max_anchors), buffer=shm_in.buf)
+    outputs = np.ndarray((slot_count,), dtype=_out_dtype(max_anchors), buffer=shm_out.buf)
+
+    try:
+        while True:
+            try:
+                msg = conn.recv_bytes()
+            except EOFError:
+                break
+            if msg[:1] == _MSG_CONFIG:
+                solver_cfg = pickle.loads(msg[1:])
+                continue
+            slot = _SLOT.unpack_from(msg, 1)[0]
+            row = outputs[slot]
+            row["ok"] = 0
+            try:
+                _write_solution(row, solve_problem(_read_problem(inputs[slot]), solver_cfg))
+            except Exception as e:
+                print(f"[TDOA] solver worker error: {e}")
+            conn.send_bytes(msg[1:1 + _SLOT.size])
+    finally:
+        del inputs, outputs
+        shm_in.close()
+        shm_out.close()
+
+
+class _SolverWorker:
+    """Egy solver processz + a hozzá tartozó közös memória és gyűjtő szál."""
+
+    def __init__(self, index: int, ctx, solver_cfg: Dict[str, Any], slot_count: int,
+                 max_anchors: int, on_result: ResultHandler):
+        self.index = index
+        self.slot_count = slot_count
+        self.on_result = on_result
+
+        in_dtype = _in_dtype(max_anchors)
+        out_dtype = _out_dtype(max_anchors)
+        self.shm_in = shared_memory.SharedMemory(create=True, size=slot_count * in_dtype.itemsize)
+        self.shm_out = shared_memory.SharedMemory(create=True, size=slot_count * out_dtype.itemsize)
+        self.inputs = np.ndarray((slot_count,), dtype=in_dtype, buffer=self.shm_in.buf)
+        self.outputs = np.ndarray((slot_count,), dtype=out_dtype, buffer=self.shm_out.buf)
+
+        self.conn, child_conn = ctx.Pipe(duplex=True)
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(solver_cfg, self.shm_in.name, self.shm_out.name, slot_count, max_anchors,
+                  child_conn),
+            daemon=True,
+            name=f"solver-{index}",
+        )
+
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._free: Deque[int] = deque(range(slot_count))
+        # slot → (probléma, ts): az azonosítók és a metaadat a szülőben maradnak
+        self._meta: List[Optional[Tuple[SyncGroupProblem, float]]] = [None] * slot_count
+        self._collector = threading.Thread(
+            target=self._collect, daemon=True, name=f"solver-collect-{index}"
+        )
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped_full = 0
+        self.max_inflight = 0
+        self.errors = 0
+
+    def start(self):
+        self.process.start()
+        self._collector.start()
+
+    def send_config(self, solver_cfg: Dict[str, Any]):
+        try:
+            with self._send_lock:
+                self.conn.send_bytes(_MSG_CONFIG + pickle.dumps(solver_cfg))
+        except OSError:
+            self.errors += 1
+
+    def submit(self, problem: SyncGroupProblem, ts: float) -> bool:
+        with self._lock:
+            if not self._free:
+                self.dropped_full += 1
+                return False
+            slot = self._free.popleft()
+            self._meta[slot] = (problem, ts)
+            inflight = self.slot_count - len(self._free)
+            if inflight > self.max_inflight:
+                self.max_inflight = inflight
+
+        _write_problem(self.inputs[slot], problem)
+        try:
+            # külön lock a küldésre: a gyűjtő szál közben szabadon adhat vissza slotot
+            with self._send_lock:
+                self.conn.send_bytes(_MSG_SOLVE + _SLOT.pack(slot))
+        except OSError:
+            # a worker processz nem él → a slotot visszaadjuk
+            with self._lock:
+                self._meta[slot] = None
+                self._free.append(slot)
+                self.errors += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def _collect(self):
+        while True:
+            try:
+                msg = self.conn.recv_bytes()
+            except (EOFError, OSError):
+                break
+            slot = _SLOT.unpack_from(msg)[0]
+            with self._lock:
+                problem, ts = self._meta[slot]
+            # a slotot csak a kimenet kiolvasása után adjuk vissza
+            solution = _read_solution(self.outputs[slot], problem)
+            with self._lock:
+                self._meta[slot] = None
+                self._free.append(slot)
+            if solution is None:
+                self.failed += 1
+
+            try:
+                self.on_result(problem, solution, ts)
+            except Exception as e:
+                self.errors += 1
+                print(f"[TDOA] solver-{self.index} result handler error: {e}")
+            self.completed += 1
+
+    def close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+        del self.inputs, self.outputs
+        for shm in (self.shm_in, self.shm_out):
+            try:
+                shm.close()
+                shm.unlink()
+            except (FileNotFoundError, BufferError):
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            inflight = self.slot_count - len(self._free)
+        return {
+            "worker": self.index,
+            "alive": self.process.is_alive(),
+            "queue_depth": inflight,
+            "max_queue_depth": self.max_inflight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped_full": self.dropped_full,
+            "errors": self.errors,
+        }
+
+
+class SolverPool:
+    """
+    Processz-alapú solver fokozat (solver.pool_workers > 0).
+
+    A TDoAProcessor a teljes (tag, sync) csoportot előkészíti
+    (prepare_sync_group), és TAG azonosító szerint shardolva (crc32) adja
+    át egy workernek; így egy TAG blinkjei mindig ugyanarra a workerre
+    kerülnek, és a worker FIFO sorrendjében, egyetlen gyűjtő szálon jönnek
+    vissza → a TAG track (Kalman) frissítések sorrendje megmarad.
+
+    A probléma és a megoldás tömbjei workerenkénti SharedMemory slotokban
+    (fix méretű numpy rekordokban) utaznak, a pipe-on csak a slot index
+    megy át; a solver paramétereket csak változáskor küldjük újra.
+    A processzek és a közös memória a start()-ban jönnek létre.
+    """
+
+    def __init__(self, on_result: ResultHandler, workers: int = 2,
+                 slots_per_worker: int = 256, max_anchors: int = 32):
+        self.on_result = on_result
+        self.worker_count = max(1, workers)
+        self.slots_per_worker = slots_per_worker
+        self.max_anchors = max_anchors
+        self.workers: List[_SolverWorker] = []
+        self._solver_cfg: Optional[Dict[str, Any]] = None
+        self._cfg_lock = threading.Lock()
+        self.oversize = 0
+
+    def start(self, solver_cfg: Dict[str, Any]):
+        ctx = multiprocessing.get_context("spawn")
+        self._solver_cfg = solver_cfg
+        self.workers = [
+            _SolverWorker(i, ctx, solver_cfg, self.slots_per_worker, self.max_anchors,
+                          self.on_result)
+            for i in range(self.worker_count)
+        ]
+        for w in self.workers:
+            w.start()
+        atexit.register(self.close)
+        print(f"[TDOA] solver pool started ({self.worker_count} workers)")
+
+    @property
+    def running(self) -> bool:
+        return bool(self.workers)
+
+    def shard_for(self, tag_id: str) -> int:
+        return zlib.crc32(tag_id.encode("ascii", errors="replace")) % len(self.workers)
+
+    def update_config(self, solver_cfg: Dict[str, Any]):
+        """Új solver paraméterek a workereknek, ha változtak."""
+        if solver_cfg == self._solver_cfg:
+            return
+        with self._cfg_lock:
+            if solver_cfg == self._solver_cfg:
+                return
+            for w in self.workers:
+                w.send_config(solver_cfg)
+            self._solver_cfg = solver_cfg
+
+    def submit(self, problem: SyncGroupProblem, ts: float) -> bool:
+        """
+        True, ha a pool kezelte a problémát. Tele worker sor esetén a blinket
+        eldobjuk (dropped_full): helyben megoldva megelőzné a TAG sorban
+        váró blinkjeit. False (túl sok anchor / nem élő worker) esetén
+        a hívónak helyben kell megoldania.
+        """
+        if problem.anchors.shape[0] > self.max_anchors:
+            self.oversize += 1
+            return False
+        worker = self.workers[self.shard_for(problem.tag_id)]
+        if worker.submit(problem, ts):
+            return True
+        return worker.process.is_alive()
+
+    def close(self):
+        for w in self.workers:
+            w.close()
+        self.workers = []
+
+    def stats(self) -> Dict[str, Any]:
+        per_worker = [w.stats() for w in self.workers]
+        return {
+            "workers": len(self.workers),
+            "queue_depth": sum(s["queue_depth"] for s in per_worker),
+            "completed": sum(s["completed"] for s in per_worker),
+            "dropped": sum(s["dropped_full"] for s in per_worker),
+            "oversize": self.oversize,
+            "per_worker": per_worker,
+        }
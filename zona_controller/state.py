@@ -1,7 +1,53 @@
+import math
 import threading
 import time
-from collections import deque
-from typing import Any, Dict, Optional, List, Deque
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, List, Tuple
+
+import numpy as np
+
+from .anchor_ring import AnchorRing, ANCHOR_MEAS_DTYPE
+from .sync_index import GroupMeasurements, SyncIndex
+from .tag_history import DEFAULT_TIERS, TagHistory
+from .uwb_parser import UWBRecord
+
+
+class StateSnapshot:
+    """
+    A State egy publikált, változatlan pillanatképe az API olvasók számára.
+    A mezőket (és a bennük lévő dicteket) az olvasók nem módosíthatják.
+
+    seq: a legutóbbi változás sorszáma (high-water mark). change_seqs /
+    change_keys: a TAG-ek és fix pontok utolsó változásának sorszáma,
+    növekvő sorrendben ("tag" | "node", kulcs) → a ?since= lekérdezés bisecttel
+    csak a változott rekordokon megy végig. removed_seqs / removed_keys ugyanez
+    a törölt rekordokra (tombstone); tombstone_floor alatti since-re a törlések
+    már nem teljesek, ilyenkor teljes állapot megy ki.
+    """
+
+    __slots__ = ("version", "time", "last_msg", "tags", "nodes", "seq",
+                 "change_seqs", "change_keys", "removed_seqs", "removed_keys",
+                 "tombstone_floor")
+
+    def __init__(self, version: int, time: float, last_msg: Dict[str, Any],
+                 tags: Dict[str, Dict[str, Any]], nodes: Tuple[Dict[str, Any], ...],
+                 seq: int = 0, change_seqs: Tuple[int, ...] = (),
+                 change_keys: Tuple[Tuple[str, str], ...] = (),
+                 removed_seqs: Tuple[int, ...] = (),
+                 removed_keys: Tuple[Tuple[str, str], ...] = (),
+                 tombstone_floor: int = 0):
+        self.version = version
+        self.time = time
+        self.last_msg = last_msg
+        self.tags = tags
+        self.nodes = nodes
+        self.seq = seq
+        self.change_seqs = change_seqs
+        self.change_keys = change_keys
+        self.removed_seqs = removed_seqs
+        self.removed_keys = removed_keys
+        self.tombstone_floor = tombstone_floor
 
 
 class State:
@@ -11,41 +57,166 @@ class State:
             "time": None,
             "from": None,
             "raw_len": 0,
-            "raw_hex": "",
+            "raw": b"",
             "decoded": None,
             "mode": None,
+            "seq": 0,
         }
         # TAG pozíciók (meglevő funkció)
         self._tag_positions: Dict[str, Dict[str, Any]] = {}
+        # TAG-enkénti pozíció történet (nyers gyűrű + 1 s / 10 s szintek)
+        self._tag_history: Dict[str, TagHistory] = {}
+        self._history_enabled = True
+        self._history_raw_size = 600
+        self._history_tiers: Tuple[Tuple[float, int], ...] = DEFAULT_TIERS
         # ÚJ: fix pontok (forrás IP:port alapján)
         # { "addr": "ip:port", "last_hb": {...}, "last_meas": {...} }
         self._nodes: Dict[str, Dict[str, Any]] = {}
-        self._anchor_buffers: Dict[str, Deque[Dict[str, Any]]] = {}
+        # anchoronkénti oszlopos mérési gyűrűk (ts_recv, ts_raw, tag, sync, seq, zone);
+        # utolsó írás szerint rendezve, így a lejárt gyűrűk mindig elöl vannak
+        self._anchor_buffers: "OrderedDict[str, AnchorRing]" = OrderedDict()
         self._anchor_buffer_size = 50  # később configból
+        # (tag, sync) → az adott blinket hallott anchorok mérései
+        self._sync_index = SyncIndex()
+        # RCU-szerű olvasói snapshot: az író legfeljebb _snapshot_interval
+        # másodpercenként publikál új, változatlan StateSnapshot-ot, az olvasók
+        # egyetlen referencia olvasással, lock nélkül kapják meg
+        self._snapshot_interval = 0.2
+        self._version = 0
+        self._dirty = False
+        self._dirty_nodes: set = set()
+        self._node_items: Dict[str, Dict[str, Any]] = {}
+        # változás-sorszám: minden TAG / fix pont módosítás kap egyet;
+        # _changes a rekordokat utolsó változás szerinti sorrendben tartja
+        self._seq = 0
+        self._changes: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        # TTL alapú takarítás: utolsó frissítés szerint rendezett lejárati sorok
+        # (elöl a legrégebbi), így a sweeper csak a ténylegesen lejárt elemeket nézi
+        self._tag_live: "OrderedDict[str, float]" = OrderedDict()
+        self._tag_stale: "OrderedDict[str, float]" = OrderedDict()
+        self._node_expiry: "OrderedDict[str, float]" = OrderedDict()
+        # törölt rekordok a delta lekérdezésekhez (korlátos)
+        self._tombstones: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._tombstone_max = 4096
+        self._tombstone_floor = 0
+        self._eviction_counts = {
+            "tags_stale": 0,
+            "tags_removed": 0,
+            "nodes_removed": 0,
+            "anchor_buffers_removed": 0,
+            "sync_groups_removed": 0,
+        }
+        self._snapshot = StateSnapshot(0, 0.0, {
+            "time": None, "from": None, "raw_len": 0,
+            "raw_hex": "", "decoded": None, "mode": None, "seq": 0,
+        }, {}, ())
+        # futásidejű számlálók forrásai (ingest, crypto, solver, ...)
+        self._stats_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def register_stats_provider(self, name: str, provider: Callable[[], Dict[str, Any]]):
+        """
+        Egy komponens számláló-függvényének regisztrálása (/api/stats).
+        A provider-nek gyorsnak kell lennie, a hívás nem a State lock alatt fut.
+        """
+        with self._lock:
+            self._stats_providers[name] = provider
+
+    def get_runtime_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            providers = list(self._stats_providers.items())
+        result: Dict[str, Any] = {}
+        for name, provider in providers:
+            try:
+                result[name] = provider()
+            except Exception as e:
+                result[name] = {"error": str(e)}
+        return result
 
     def set_anchor_buffer_size(self, size: int):
         with self._lock:
             self._anchor_buffer_size = max(1, size)
-            # meglévő bufferek maxlen frissítése
-            for aid, buf in self._anchor_buffers.items():
-                new_buf = deque(buf, maxlen=self._anchor_buffer_size)
-                self._anchor_buffers[aid] = new_buf
+            # meglévő gyűrűk átméretezése (a legfrissebb sorok megmaradnak)
+            for aid, ring in self._anchor_buffers.items():
+                if ring.size != self._anchor_buffer_size:
+                    self._anchor_buffers[aid] = ring.resized(self._anchor_buffer_size)
+
+    def add_anchor_measurement(self, anchor_id: str, ts_recv: float, uwb: UWBRecord,
+                               max_age_sec: Optional[float] = None) -> int:
+        """
+        Egy mérés beírása az anchor gyűrűjébe és a (tag, sync) indexbe.
+        max_age_sec megadása esetén a régi sync csoportok itt kiesnek.
+        Visszatér: ennyi anchor hallotta eddig ezt a (tag, sync) blinket.
+        """
+        if uwb.tag_id is None:
+            return 0
+        with self._lock:
+            ring = self._anchor_buffers.get(anchor_id)
+            if ring is None:
+                ring = AnchorRing(self._anchor_buffer_size)
+                self._anchor_buffers[anchor_id] = ring
+            else:
+                self._anchor_buffers.move_to_end(anchor_id)
+            ring.append(ts_recv, uwb.ts_raw, uwb.tag_id, uwb.sync, uwb.tag_seq, uwb.zone_id)
+
+            if max_age_sec is not None:
+                self._sync_index.evict_older_than(ts_recv - max_age_sec)
+            group = self._sync_index.add(anchor_id, ts_recv, uwb)
+            return len(group.anchors) if group is not None else 0
+
+    def get_best_sync_group(self, tag: int,
+                            min_ts: float) -> Optional[Tuple[int, GroupMeasurements]]:
+        """
+        A TAG legtöbb anchor által hallott, min_ts utáni sync köre:
+        (sync, {anchor_id: (ts_recv, uwb)}) vagy None.
+        """
+        with self._lock:
+            group = self._sync_index.best_group_for_tag(tag, min_ts)
+            if group is None:
+                return None
+            return group.sync, dict(group.anchors)
 
-    def add_anchor_measurement(self, anchor_id: str, measurement: Dict[str, Any]):
-        from collections import deque
+    def get_sync_group(self, tag: int, sync: int) -> Optional[GroupMeasurements]:
+        """Egy adott (tag, sync) csoport méréseinek másolata (vagy None)."""
         with self._lock:
-            buf = self._anchor_buffers.get(anchor_id)
-            if buf is None:
-                buf = deque(maxlen=self._anchor_buffer_size)
-                self._anchor_buffers[anchor_id] = buf
-            buf.append(measurement)
+            group = self._sync_index.get(tag, sync)
+            return dict(group.anchors) if group is not None else None
 
-    def get_anchor_buffer(self, anchor_id: str):
+    def get_best_sync_groups(self, tags: List[int],
+                             min_ts: float) -> Dict[int, Tuple[int, GroupMeasurements]]:
+        """get_best_sync_group() több TAG-re, egyetlen lock alatt."""
+        result: Dict[int, Tuple[int, GroupMeasurements]] = {}
         with self._lock:
-            buf = self._anchor_buffers.get(anchor_id)
-            if not buf:
-                return []
-            return list(buf)
+            for tag in tags:
+                group = self._sync_index.best_group_for_tag(tag, min_ts)
+                if group is not None:
+                    result[tag] = (group.sync, dict(group.anchors))
+        return result
+
+    def get_sync_groups_for_tag(self, tag: int,
+                                min_ts: float) -> List[Tuple[int, GroupMeasurements]]:
+        """A TAG összes min_ts utáni sync köre, a legfrissebb elöl."""
+        with self._lock:
+            return [
+                (g.sync, dict(g.anchors))
+                for g in self._sync_index.groups_for_tag(tag, min_ts)
+            ]
+
+    def get_anchor_buffer(self, anchor_id: str) -> np.ndarray:
+        """Az anchor gyűrűjének másolata időrendben (ANCHOR_MEAS_DTYPE structured array)."""
+        with self._lock:
+            ring = self._anchor_buffers.get(anchor_id)
+            if ring is None:
+                return np.zeros(0, dtype=ANCHOR_MEAS_DTYPE)
+            return ring.ordered()
+
+    def get_latest_anchor_measurement(self, anchor_id: str, tag: int,
+                                      min_ts: float) -> Optional[np.void]:
+        """Az adott TAG legfrissebb, min_ts utáni mérése az anchornál (vagy None)."""
+        with self._lock:
+            ring = self._anchor_buffers.get(anchor_id)
+            if ring is None:
+                return None
+            return ring.latest_for_tag(tag, min_ts)
 
     def update_last_message(self, addr, data: bytes, decoded: Optional[str], mode: Optional[str]):
         ts = time.time()
@@ -55,14 +226,29 @@ class State:
         addr_full = f"{ip}:{port}"  # debug / last_msg-hez
         node_key = ip  # <-- csak IP alapján csoportosítunk
 
+        if decoded:
+            text = decoded.strip()
+            kind = "hb" if text.startswith(("HB", "HB:", "HB ")) else "meas"
+            # a hex alakot csak publikáláskor számoljuk (lásd _publish_locked)
+            entry = {
+                "time": ts,
+                "raw_len": len(data),
+                "raw": data,
+                "decoded": decoded,
+                "mode": mode,
+            }
+
         with self._lock:
             # globális last_msg maradhat ip:port-tal
             self._last_msg["time"] = ts
             self._last_msg["from"] = addr_full
             self._last_msg["raw_len"] = len(data)
-            self._last_msg["raw_hex"] = data.hex()
+            self._last_msg["raw"] = data
             self._last_msg["decoded"] = decoded
             self._last_msg["mode"] = mode
+            self._seq += 1
+            self._last_msg["seq"] = self._seq
+            self._dirty = True
 
             if decoded:
                 node = self._nodes.get(node_key)
@@ -77,47 +263,312 @@ class State:
 
                 node["last_addr_full"] = addr_full
 
-                text = decoded.strip()
-                kind = "hb" if text.startswith(("HB", "HB:", "HB ")) else "meas"
-
-                entry = {
-                    "time": ts,
-                    "raw_len": len(data),
-                    "raw_hex": data.hex(),
-                    "decoded": decoded,
-                    "mode": mode,
-                }
-
                 if kind == "hb":
                     node["last_hb"] = entry
                 else:
                     node["last_meas"] = entry
+                node["seq"] = self._seq
+                self._node_expiry[node_key] = ts
+                self._node_expiry.move_to_end(node_key)
+                self._mark_changed_locked("node", node_key, self._seq)
+                self._dirty_nodes.add(node_key)
 
-    def get_last_message(self) -> Dict[str, Any]:
+            self._maybe_publish_locked(ts)
+
+    def update_tag_position(self, tag_id: str, x: float, y: float, z: float, ts: float,
+                            quality: float = math.nan):
         with self._lock:
-            return dict(self._last_msg)
+            self._set_tag_position_locked(tag_id, x, y, z, ts, quality)
+            self._maybe_publish_locked(time.time())
 
-    def update_tag_position(self, tag_id: str, x: float, y: float, z: float, ts: float):
+    def update_tag_positions(self, items: List[Tuple[str, float, float, float, float, float]]):
+        """
+        Több TAG pozíciója egyetlen lock alatt (kötegelt solver tick):
+        (tag_id, x, y, z, ts, quality) sorok.
+        """
+        if not items:
+            return
         with self._lock:
-            self._tag_positions[tag_id] = {"x": x, "y": y, "z": z, "time": ts}
+            for tag_id, x, y, z, ts, quality in items:
+                self._set_tag_position_locked(tag_id, x, y, z, ts, quality)
+            self._maybe_publish_locked(time.time())
+
+    def _set_tag_position_locked(self, tag_id: str, x: float, y: float, z: float, ts: float,
+                                 quality: float):
+        # egy régebbi (később beérkezett) fix nem írhatja felül az újabbat
+        prev = self._tag_positions.get(tag_id)
+        if prev is not None and ts < prev["time"]:
+            return
+
+        if self._history_enabled:
+            history = self._tag_history.get(tag_id)
+            if history is None:
+                history = TagHistory(self._history_raw_size, self._history_tiers)
+                self._tag_history[tag_id] = history
+            history.append(ts, x, y, z, quality)
+
+        # mindig új dict: a publikált snapshotok a régit változatlanul látják
+        self._seq += 1
+        self._tag_positions[tag_id] = {"x": x, "y": y, "z": z, "time": ts, "seq": self._seq}
+        self._mark_changed_locked("tag", tag_id, self._seq)
+        self._tag_stale.pop(tag_id, None)
+        self._tag_live[tag_id] = ts
+        self._tag_live.move_to_end(tag_id)
+        self._dirty = True
+
+    # ---- olvasó oldal: snapshotból, lock nélkül ----
+
+    def get_last_message(self) -> Dict[str, Any]:
+        return dict(self.get_snapshot().last_msg)
 
     def get_tag_position(self, tag_id: str) -> Optional[Dict[str, Any]]:
-        with self._lock:
-            return self._tag_positions.get(tag_id)
+        return self.get_snapshot().tags.get(tag_id)
 
     def get_all_tag_positions(self):
-        with self._lock:
-            return dict(self._tag_positions)
+        return dict(self.get_snapshot().tags)
 
     # ÚJ: összefoglaló a fix pontokról – Dashboard kártyákhoz
     def get_nodes_summary(self) -> List[Dict[str, Any]]:
+        return list(self.get_snapshot().nodes)
+
+    def configure_history(self, enabled: bool = True, raw_size: int = 600,
+                          tiers: Optional[List[Tuple[float, int]]] = None):
+        """
+        Pozíció történet beállítása. Új méretek csak az újonnan induló
+        TAG történetekre vonatkoznak, a meglévők változatlanok maradnak.
+        """
         with self._lock:
-            result: List[Dict[str, Any]] = []
-            for addr, node in self._nodes.items():
-                item: Dict[str, Any] = {"addr": addr}
-                if node.get("last_hb"):
-                    item["last_hb"] = dict(node["last_hb"])
-                if node.get("last_meas"):
-                    item["last_meas"] = dict(node["last_meas"])
-                result.append(item)
-            return result
+            self._history_enabled = enabled
+            self._history_raw_size = max(1, raw_size)
+            if tiers is not None:
+                self._history_tiers = tuple((float(b), max(1, int(n))) for b, n in tiers if b > 0)
+            if not enabled:
+                self._tag_history.clear()
+
+    def get_tag_history(self, tag_id: str, t_from: float, t_to: float, step: float = 0.0,
+                        max_points: int = 0) -> Optional[Tuple[float, np.ndarray]]:
+        """(felbontás_sec, HISTORY_DTYPE sorok) vagy None, ha nincs ilyen TAG."""
+        with self._lock:
+            history = self._tag_history.get(tag_id)
+            if history is None:
+                return None
+            return history.query(t_from, t_to, step, max_points)
+
+    def get_changes_since(self, since: Optional[int]) -> Dict[str, Any]:
+        """
+        A since sorszám óta változott TAG-ek és fix pontok egy snapshotból.
+        since=None, a szerver újraindulása miatt a jelenleginél nagyobb, vagy
+        a megőrzött tombstone-oknál régebbi since esetén teljes állapot megy
+        ("full": True).
+        """
+        snap = self.get_snapshot()
+        if since is None or since < snap.tombstone_floor or since > snap.seq:
+            return {
+                "full": True,
+                "seq": snap.seq,
+                "version": snap.version,
+                "last_msg": snap.last_msg,
+                "tags": snap.tags,
+                "nodes": list(snap.nodes),
+                "removed": {"tags": [], "nodes": []},
+            }
+
+        removed: Dict[str, List[str]] = {"tags": [], "nodes": []}
+        for kind, key in snap.removed_keys[bisect_right(snap.removed_seqs, since):]:
+            removed["tags" if kind == "tag" else "nodes"].append(key)
+
+        start = bisect_right(snap.change_seqs, since)
+        tags: Dict[str, Dict[str, Any]] = {}
+        node_keys = set()
+        for kind, key in snap.change_keys[start:]:
+            if kind == "tag":
+                pos = snap.tags.get(key)
+                if pos is not None:
+                    tags[key] = pos
+            else:
+                node_keys.add(key)
+        nodes = [n for n in snap.nodes if n["addr"] in node_keys] if node_keys else []
+        return {
+            "full": False,
+            "seq": snap.seq,
+            "version": snap.version,
+            "last_msg": snap.last_msg if snap.last_msg.get("seq", 0) > since else None,
+            "tags": tags,
+            "nodes": nodes,
+            "removed": removed,
+        }
+
+    def _mark_changed_locked(self, kind: str, key: str, seq: int):
+        changes = self._changes
+        changes[(kind, key)] = seq
+        changes.move_to_end((kind, key))
+        self._tombstones.pop((kind, key), None)
+
+    def _mark_removed_locked(self, kind: str, key: str):
+        self._seq += 1
+        self._changes.pop((kind, key), None)
+        tombstones = self._tombstones
+        tombstones[(kind, key)] = self._seq
+        if len(tombstones) > self._tombstone_max:
+            _key, seq = tombstones.popitem(last=False)
+            self._tombstone_floor = seq
+        self._dirty = True
+
+    def evict_expired(self, now: float, tag_stale_sec: float, tag_remove_sec: float,
+                      node_max_age_sec: float, buffer_max_age_sec: float) -> Dict[str, Any]:
+        """
+        Lejárt bejegyzések takarítása (a háttér sweeper hívja).
+
+        - TAG: tag_stale_sec után "stale" jelölést kap, tag_remove_sec után törlődik
+        - fix pont: node_max_age_sec óta nem küldött semmit → törlődik
+        - anchor gyűrű és sync csoportok: buffer_max_age_sec-nél régebbiek kiesnek
+
+        Minden sor utolsó frissítés szerint rendezett, így csak a lejárt elemeken
+        megyünk végig. Visszatér az e körben érintett darabszámokkal és a törölt
+        TAG azonosítókkal.
+        """
+        removed_tags: List[str] = []
+        counts = {"tags_stale": 0, "tags_removed": 0, "nodes_removed": 0,
+                  "anchor_buffers_removed": 0, "sync_groups_removed": 0}
+        with self._lock:
+            cutoff = now - tag_stale_sec
+            live = self._tag_live
+            while live:
+                tag_id, ts = next(iter(live.items()))
+                if ts >= cutoff:
+                    break
+                live.popitem(last=False)
+                self._tag_stale[tag_id] = ts
+                pos = self._tag_positions.get(tag_id)
+                if pos is not None:
+                    self._seq += 1
+                    self._tag_positions[tag_id] = dict(pos, stale=True, seq=self._seq)
+                    self._mark_changed_locked("tag", tag_id, self._seq)
+                    self._dirty = True
+                counts["tags_stale"] += 1
+
+            cutoff = now - max(tag_remove_sec, tag_stale_sec)
+            stale = self._tag_stale
+            while stale:
+                tag_id, ts = next(iter(stale.items()))
+                if ts >= cutoff:
+                    break
+                stale.popitem(last=False)
+                self._tag_positions.pop(tag_id, None)
+                self._tag_history.pop(tag_id, None)
+                self._mark_removed_locked("tag", tag_id)
+                removed_tags.append(tag_id)
+                counts["tags_removed"] += 1
+
+            cutoff = now - node_max_age_sec
+            nodes = self._node_expiry
+            while nodes:
+                node_key, ts = next(iter(nodes.items()))
+                if ts >= cutoff:
+                    break
+                nodes.popitem(last=False)
+                self._nodes.pop(node_key, None)
+                self._node_items.pop(node_key, None)
+                self._dirty_nodes.discard(node_key)
+                self._mark_removed_locked("node", node_key)
+                counts["nodes_removed"] += 1
+
+            cutoff = now - buffer_max_age_sec
+            buffers = self._anchor_buffers
+            while buffers:
+                anchor_id, ring = next(iter(buffers.items()))
+                if ring.last_ts >= cutoff:
+                    break
+                buffers.popitem(last=False)
+                counts["anchor_buffers_removed"] += 1
+            counts["sync_groups_removed"] = self._sync_index.evict_older_than(cutoff)
+
+            for name, n in counts.items():
+                self._eviction_counts[name] += n
+            if self._dirty:
+                self._maybe_publish_locked(time.time())
+
+        counts["removed_tag_ids"] = removed_tags
+        return counts
+
+    def set_tombstone_limit(self, max_entries: int):
+        with self._lock:
+            self._tombstone_max = max(1, max_entries)
+
+    def get_eviction_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tags_live": len(self._tag_live),
+                "tags_stale": len(self._tag_stale),
+                "nodes": len(self._nodes),
+                "anchor_buffers": len(self._anchor_buffers),
+                "sync_groups": len(self._sync_index),
+                "tombstones": len(self._tombstones),
+                "totals": dict(self._eviction_counts),
+            }
+
+    def set_snapshot_interval(self, interval_sec: float):
+        with self._lock:
+            self._snapshot_interval = max(0.0, interval_sec)
+
+    def get_snapshot(self) -> "StateSnapshot":
+        """
+        A legutóbb publikált, változatlan snapshot (egyetlen referencia olvasás).
+        Ha a snapshot elavult és van új adat, megpróbáljuk frissíteni – de csak
+        ha a lock épp szabad, így az olvasó soha nem várakoztatja a fogadást.
+        """
+        snap = self._snapshot
+        if self._dirty and time.time() - snap.time >= self._snapshot_interval:
+            if self._lock.acquire(blocking=False):
+                try:
+                    if self._dirty:
+                        self._publish_locked(time.time())
+                    snap = self._snapshot
+                finally:
+                    self._lock.release()
+        return snap
+
+    def _maybe_publish_locked(self, now: float):
+        if now - self._snapshot.time >= self._snapshot_interval:
+            self._publish_locked(now)
+
+    def _publish_locked(self, now: float):
+        last_msg = dict(self._last_msg)
+        raw = last_msg.pop("raw", b"")
+        last_msg["raw_hex"] = raw.hex() if raw else ""
+
+        # csak a változott fix pontok összefoglalóját építjük újra
+        for key in self._dirty_nodes:
+            node = self._nodes.get(key)
+            if node is None:
+                self._node_items.pop(key, None)
+                continue
+            item: Dict[str, Any] = {"addr": key, "seq": node.get("seq", 0)}
+            for name in ("last_hb", "last_meas"):
+                entry = node.get(name)
+                if entry:
+                    item[name] = {
+                        "time": entry["time"],
+                        "raw_len": entry["raw_len"],
+                        "raw_hex": entry["raw"].hex(),
+                        "decoded": entry["decoded"],
+                        "mode": entry["mode"],
+                    }
+            self._node_items[key] = item
+        self._dirty_nodes.clear()
+
+        self._version += 1
+        self._snapshot = StateSnapshot(
+            version=self._version,
+            time=now,
+            last_msg=last_msg,
+            tags=dict(self._tag_positions),
+            nodes=tuple(self._node_items[k] for k in self._nodes if k in self._node_items),
+            seq=self._seq,
+            change_seqs=tuple(self._changes.values()),
+            change_keys=tuple(self._changes.keys()),
+            removed_seqs=tuple(self._tombstones.values()),
+            removed_keys=tuple(self._tombstones.keys()),
+            tombstone_floor=self._tombstone_floor,
+        )
+        self._dirty = False
@@ -0,0 +1,98 @@
+# zona_controller/sync_index.py
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .uwb_parser import UWBRecord
+
+# anchor_id → (ts_recv, uwb rekord)
+GroupMeasurements = Dict[str, Tuple[float, UWBRecord]]
+
+
+class SyncGroup:
+    """Egy TAG egy blinkjét (sync kör) hallott anchorok mérései."""
+
+    __slots__ = ("tag", "sync", "first_ts", "last_ts", "anchors")
+
+    def __init__(self, tag: int, sync: int, ts_recv: float):
+        self.tag = tag
+        self.sync = sync
+        self.first_ts = ts_recv
+        self.last_ts = ts_recv
+        self.anchors: GroupMeasurements = {}
+
+
+class SyncIndex:
+    """
+    (tag, sync) → SyncGroup index.
+
+    A csoportok létrehozási idő szerinti sorrendben vannak (OrderedDict),
+    így a max_age_sec-nél régebbi csoportok kidobása mindig a lista elejéről
+    történik, csak a ténylegesen lejárt elemeken. TAG-enként külön dict
+    tartja az élő csoportokat, így egy TAG pillanatképe egyetlen lookup.
+
+    Nem szálbiztos: a State lockja alatt használjuk.
+    """
+
+    def __init__(self):
+        self._groups: "OrderedDict[Tuple[int, int], SyncGroup]" = OrderedDict()
+        self._by_tag: Dict[int, Dict[int, SyncGroup]] = {}
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def add(self, anchor_id: str, ts_recv: float, uwb: UWBRecord) -> Optional[SyncGroup]:
+        if uwb.tag_id is None or uwb.sync is None:
+            return None
+        key = (uwb.tag_id, uwb.sync)
+        group = self._groups.get(key)
+        if group is None:
+            group = SyncGroup(uwb.tag_id, uwb.sync, ts_recv)
+            self._groups[key] = group
+            self._by_tag.setdefault(uwb.tag_id, {})[uwb.sync] = group
+        group.anchors[anchor_id] = (ts_recv, uwb)
+        group.last_ts = ts_recv
+        return group
+
+    def evict_older_than(self, min_ts: float) -> int:
+        removed = 0
+        groups = self._groups
+        while groups:
+            key, group = next(iter(groups.items()))
+            if group.first_ts >= min_ts:
+                break
+            groups.popitem(last=False)
+            per_tag = self._by_tag.get(group.tag)
+            if per_tag is not None:
+                per_tag.pop(group.sync, None)
+                if not per_tag:
+                    del self._by_tag[group.tag]
+            removed += 1
+        self.evicted += removed
+        return removed
+
+    def get(self, tag: int, sync: int) -> Optional[SyncGroup]:
+        return self._groups.get((tag, sync))
+
+    def groups_for_tag(self, tag: int, min_ts: float) -> List[SyncGroup]:
+        """A TAG élő csoportjai, a legfrissebb elöl."""
+        per_tag = self._by_tag.get(tag)
+        if not per_tag:
+            return []
+        groups = [g for g in per_tag.values() if g.last_ts >= min_ts]
+        groups.sort(key=lambda g: g.last_ts, reverse=True)
+        return groups
+
+    def best_group_for_tag(self, tag: int, min_ts: float) -> Optional[SyncGroup]:
+        """A legtöbb anchor által hallott élő csoport (egyezésnél a frissebb)."""
+        per_tag = self._by_tag.get(tag)
+        if not per_tag:
+            return None
+        best = None
+        for g in per_tag.values():
+            if g.last_ts < min_ts:
+                continue
+            if best is None or (len(g.anchors), g.last_ts) > (len(best.anchors), best.last_ts):
+                best = g
+        return best
@@ -0,0 +1,193 @@
+# zona_controller/sync_scheduler.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# (tag_id, tag_int, sync, ts) – egy megoldandó blink
+ReadyBlink = Tuple[str, int, int, float]
+
+
+class _Blink:
+    __slots__ = ("tag_id", "key", "first_ts", "last_ts", "count", "solves", "solved_count")
+
+    def __init__(self, tag_id: str, key: Tuple[int, int], ts: float):
+        self.tag_id = tag_id
+        self.key = key
+        self.first_ts = ts
+        self.last_ts = ts
+        self.count = 0
+        self.solves = 0
+        self.solved_count = 0
+
+
+class SyncCompletionScheduler:
+    """
+    (tag, sync) alapú megoldás ütemező: blinkenként egyszer oldunk meg,
+    amikor
+        - a várt anchor szám beérkezett ("complete"), vagy
+        - lejárt a deadline (első mérés + deadline_ms) és megvan a
+          min_anchor_count ("deadline").
+    A megoldás után érkező késői mérés legfeljebb max_refinements újabb
+    megoldást indít ("refinement").
+
+    A várt anchor szám TAG-enként tanult: az előző blinket végül hallott
+    anchorok száma (kezdetben a konfigurált anchorok száma).
+
+    A várakozó és a már megoldott blinkek létrehozási sorrendben vannak
+    (OrderedDict), így a deadline és a takarítás csak a lejárt elemeket nézi.
+    """
+
+    def __init__(self, deadline_sec: float = 0.03, max_refinements: int = 1,
+                 min_anchor_count: int = 3, retain_sec: float = 2.0,
+                 expected_default: Callable[[], int] = lambda: 0):
+        self.deadline_sec = deadline_sec
+        self.max_refinements = max(0, max_refinements)
+        self.min_anchor_count = max(1, min_anchor_count)
+        self.retain_sec = retain_sec
+        self._expected_default = expected_default
+        self._lock = threading.Lock()
+        self._waiting: "OrderedDict[Tuple[int, int], _Blink]" = OrderedDict()
+        self._done: "OrderedDict[Tuple[int, int], _Blink]" = OrderedDict()
+        self._expected: Dict[int, int] = {}
+
+        self.blinks = 0
+        self.solves = 0
+        self.complete_solves = 0
+        self.deadline_solves = 0
+        self.refinements = 0
+        self.late_solves = 0
+        self.incomplete = 0
+        self.late_ignored = 0
+
+    def configure(self, deadline_sec: float, max_refinements: int, min_anchor_count: int,
+                  retain_sec: float):
+        with self._lock:
+            self.deadline_sec = deadline_sec
+            self.max_refinements = max(0, max_refinements)
+            self.min_anchor_count = max(1, min_anchor_count)
+            self.retain_sec = retain_sec
+
+    def on_measurement(self, tag_id: str, tag: int, sync: int, count: int,
+                       ts: float) -> Optional[ReadyBlink]:
+        """
+        Egy mérés beérkezett a (tag, sync) blinkhez; count: ennyi anchor
+        hallotta eddig. Visszatér a megoldandó blinkkel, ha most kell megoldani.
+        """
+        key = (tag, sync)
+        with self._lock:
+            blink = self._waiting.get(key)
+            if blink is None:
+                blink = self._done.get(key)
+                if blink is not None:
+                    return self._on_late_locked(blink, count, ts)
+                blink = _Blink(tag_id, key, ts)
+                self._waiting[key] = blink
+                self.blinks += 1
+
+            blink.count = count
+            blink.last_ts = ts
+            expected = self._expected.get(tag) or self._expected_default()
+            if expected and count >= max(expected, self.min_anchor_count):
+                del self._waiting[key]
+                self._done[key] = blink
+                self.complete_solves += 1
+                return self._solve_locked(blink, ts)
+            return None
+
+    def _on_late_locked(self, blink: _Blink, count: int, ts: float) -> Optional[ReadyBlink]:
+        blink.count = count
+        blink.last_ts = ts
+        if count < self.min_anchor_count or count <= blink.solved_count:
+            self.late_ignored += 1
+            return None
+        if blink.solves == 0:
+            # a deadline-kor még kevés volt az anchor, most lett elég
+            self.late_solves += 1
+            return self._solve_locked(blink, ts)
+        if blink.solves - 1 < self.max_refinements:
+            self.refinements += 1
+            return self._solve_locked(blink, ts)
+        self.late_ignored += 1
+        return None
+
+    def _solve_locked(self, blink: _Blink, ts: float) -> ReadyBlink:
+        blink.solves += 1
+        blink.solved_count = blink.count
+        self.solves += 1
+        return blink.tag_id, blink.key[0], blink.key[1], ts
+
+    def poll(self, now: float) -> List[ReadyBlink]:
+        """
+        Lejárt deadline-ú blinkek megoldásra; a megőrzési időn túli, már
+        eldöntött blinkek kitakarítása (ekkor tanuljuk a várt anchor számot).
+        """
+        ready: List[ReadyBlink] = []
+        with self._lock:
+            cutoff = now - self.deadline_sec
+            waiting = self._waiting
+            while waiting:
+                key, blink = next(iter(waiting.items()))
+                if blink.first_ts > cutoff:
+                    break
+                waiting.popitem(last=False)
+                self._done[key] = blink
+                if blink.count >= self.min_anchor_count:
+                    self.deadline_solves += 1
+                    ready.append(self._solve_locked(blink, now))
+                else:
+                    self.incomplete += 1
+
+            cutoff = now - self.retain_sec
+            done = self._done
+            while done:
+                key, blink = next(iter(done.items()))
+                if blink.first_ts > cutoff:
+                    break
+                done.popitem(last=False)
+                self._expected[key[0]] = blink.count
+        return ready
+
+    def forget_tags(self, tags: List[int]):
+        with self._lock:
+            for tag in tags:
+                self._expected.pop(tag, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "waiting": len(self._waiting),
+                "retained": len(self._done),
+                "blinks": self.blinks,
+                "solves": self.solves,
+                "solves_per_blink": (self.solves / self.blinks) if self.blinks else 0.0,
+                "complete_solves": self.complete_solves,
+                "deadline_solves": self.deadline_solves,
+                "refinements": self.refinements,
+                "late_solves": self.late_solves,
+                "incomplete": self.incomplete,
+                "late_ignored": self.late_ignored,
+                "deadline_ms": self.deadline_sec * 1000.0,
+            }
+
+
+class SchedulerTicker(threading.Thread):
+    """A deadline-ok ellenőrzése szál módban (asyncio-ban a loop ütemezi)."""
+
+    def __init__(self, poll: Callable[[float], None], interval_sec: float):
+        super().__init__(daemon=True, name="sync-scheduler")
+        self.poll = poll
+        self.interval_sec = interval_sec
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll(time.time())
+            except Exception as e:
+                print(f"[TDOA] sync scheduler error: {e}")
+            self._stop_event.wait(self.interval_sec)
+
+    def stop(self):
+        self._stop_event.set()
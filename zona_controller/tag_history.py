@@ -0,0 +1,200 @@
+# zona_controller/tag_history.py
+
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Egy pozíció minta: idő + koordináták + minőség (pl. felhasznált anchorok száma)
+HISTORY_DTYPE = np.dtype([
+    ("t", np.float64),
+    ("x", np.float32),
+    ("y", np.float32),
+    ("z", np.float32),
+    ("quality", np.float32),
+])
+
+# (bucket_sec, size) – alapértelmezett lefelé mintavételezett szintek
+DEFAULT_TIERS: Tuple[Tuple[float, int], ...] = ((1.0, 1800), (10.0, 2880))
+
+# a gyűrűk ekkora tömbbel indulnak, és duplázással nőnek a méretükig
+INITIAL_ROWS = 16
+
+
+class HistoryRing:
+    """
+    Időrendben írt gyűrű (HISTORY_DTYPE sorok), legfeljebb size sorral.
+    A tömb INITIAL_ROWS sorral indul és duplázással nő, így a rövid életű
+    TAG-ek nem foglalják le a teljes méretet; körbeírni csak a teljes
+    méret elérése után kezd.
+
+    Mivel az idő monoton nő (a TagHistory a régebbi mintákat eldobja), az időtartomány keresés a gyűrű két
+    (fej előtti / fej utáni) szeletén searchsorted-del megy, így a lekérdezés
+    ideje a visszaadott pontok számával arányos.
+
+    Nem szálbiztos: a State lockja alatt használjuk.
+    """
+
+    __slots__ = ("data", "capacity", "head", "count")
+
+    def __init__(self, size: int):
+        self.capacity = max(1, size)
+        self.data = np.zeros(min(self.capacity, INITIAL_ROWS), dtype=HISTORY_DTYPE)
+        self.head = 0
+        self.count = 0
+
+    @property
+    def size(self) -> int:
+        return self.data.shape[0]
+
+    def append(self, t: float, x: float, y: float, z: float, quality: float):
+        if self.count == self.data.shape[0] < self.capacity:
+            # még nem írtunk körbe: a sorok időrendben a tömb elején vannak
+            data = np.zeros(min(self.capacity, 2 * self.count), dtype=HISTORY_DTYPE)
+            data[:self.count] = self.data
+            self.data = data
+            self.head = self.count
+        self.data[self.head] = (t, x, y, z, quality)
+        self.head = (self.head + 1) % self.data.shape[0]
+        if self.count < self.data.shape[0]:
+            self.count += 1
+
+    def oldest_t(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        start = 0 if self.count < self.size else self.head
+        return float(self.data["t"][start])
+
+    def _segments(self) -> List[np.ndarray]:
+        if self.count < self.size:
+            return [self.data[:self.count]]
+        return [self.data[self.head:], self.data[:self.head]]
+
+    def range(self, t_from: float, t_to: float) -> np.ndarray:
+        """A [t_from, t_to] közötti sorok másolata időrendben."""
+        parts = []
+        for seg in self._segments():
+            if seg.shape[0] == 0:
+                continue
+            ts = seg["t"]
+            lo = int(np.searchsorted(ts, t_from, side="left"))
+            hi = int(np.searchsorted(ts, t_to, side="right"))
+            if hi > lo:
+                parts.append(seg[lo:hi])
+        if not parts:
+            return np.zeros(0, dtype=HISTORY_DTYPE)
+        if len(parts) == 1:
+            return parts[0].copy()
+        return np.concatenate(parts)
+
+
+class _Tier:
+    """Egy lefelé mintavételezett szint: bucket_sec-es átlagok gyűrűje."""
+
+    __slots__ = ("bucket_sec", "ring", "bucket", "n", "sums", "q_min")
+
+    def __init__(self, bucket_sec: float, size: int):
+        self.bucket_sec = bucket_sec
+        self.ring = HistoryRing(size)
+        self.bucket: Optional[int] = None
+        self.n = 0
+        self.sums = [0.0, 0.0, 0.0]
+        self.q_min = math.inf
+
+    def add(self, t: float, x: float, y: float, z: float, quality: float):
+        bucket = int(t // self.bucket_sec)
+        if self.bucket is not None and bucket != self.bucket:
+            self.flush()
+        self.bucket = bucket
+        self.n += 1
+        self.sums[0] += x
+        self.sums[1] += y
+        self.sums[2] += z
+        # a bucket minősége a leggyengébb mintáé
+        self.q_min = min(self.q_min, quality)
+
+    def flush(self):
+        if self.n == 0 or self.bucket is None:
+            return
+        n = self.n
+        self.ring.append(
+            (self.bucket + 0.5) * self.bucket_sec,
+            self.sums[0] / n,
+            self.sums[1] / n,
+            self.sums[2] / n,
+            self.q_min,
+        )
+        self.n = 0
+        self.sums = [0.0, 0.0, 0.0]
+        self.q_min = math.inf
+
+
+class TagHistory:
+    """
+    Egy TAG pozíció története: nyers gyűrű + bucket átlagolt szintek
+    (alapból 1 s és 10 s), hosszabb időablakokhoz.
+
+    A lekérdezés a legfinomabb olyan szintet választja, amelynek bucketje
+    nem nagyobb a kért lépésnél, és még visszaér a kért kezdetig; ha ilyen
+    nincs, a legrégebbre visszanyúló szintből válaszol.
+
+    Egy TAG fixei nem feltétlenül időrendben érkeznek (több fogadó szál,
+    ingest workerek, ütemező finomítások): az utolsó mintánál régebbit
+    eldobjuk, mert a gyűrűk keresése monoton időt feltételez.
+    """
+
+    def __init__(self, raw_size: int = 600,
+                 tiers: Sequence[Tuple[float, int]] = DEFAULT_TIERS):
+        self.raw = HistoryRing(raw_size)
+        self.tiers = [_Tier(float(b), int(n)) for b, n in sorted(tiers)]
+        self.last_t = -math.inf
+        self.dropped = 0
+
+    def append(self, t: float, x: float, y: float, z: float, quality: float = math.nan) -> bool:
+        """False, ha a minta régebbi az utolsónál (eldobtuk)."""
+        if not t >= self.last_t:
+            self.dropped += 1
+            return False
+        self.last_t = t
+        self.raw.append(t, x, y, z, quality)
+        for tier in self.tiers:
+            tier.add(t, x, y, z, quality)
+        return True
+
+    def query(self, t_from: float, t_to: float, step: float = 0.0,
+              max_points: int = 0) -> Tuple[float, np.ndarray]:
+        """
+        (felbontás_sec, sorok). A felbontás 0.0, ha a nyers gyűrűből jött.
+        step > felbontás esetén step szerinti bucketenként az első pont marad.
+        max_points > 0 esetén ennél több pontot nem adunk vissza (a legfrissebbek).
+        """
+        rings: List[Tuple[float, HistoryRing]] = [(0.0, self.raw)]
+        rings += [(tier.bucket_sec, tier.ring) for tier in self.tiers]
+
+        def covering(candidates):
+            for resolution, ring in candidates:
+                oldest = ring.oldest_t()
+                if oldest is not None and oldest <= t_from:
+                    return resolution, ring
+            return None
+
+        # 1) a lépésnél nem durvább, a kezdetig visszaérő legfinomabb szint
+        # 2) ha nincs: bármely visszaérő szint
+        # 3) ha egyik sem ér vissza: a legrégebbre visszanyúló szint
+        chosen = covering([r for r in rings if r[0] <= step]) or covering(rings)
+        if chosen is None:
+            filled = [r for r in rings if r[1].count > 0]
+            chosen = min(filled, key=lambda r: r[1].oldest_t()) if filled else rings[0]
+
+        resolution, ring = chosen
+        rows = ring.range(t_from, t_to)
+        if step > resolution and rows.shape[0] > 1:
+            buckets = np.floor(rows["t"] / step)
+            keep = np.empty(rows.shape[0], dtype=bool)
+            keep[0] = True
+            keep[1:] = buckets[1:] != buckets[:-1]
+            rows = rows[keep]
+            resolution = step
+        if max_points > 0 and rows.shape[0] > max_points:
+            rows = rows[-max_points:]
+        return resolution, rows
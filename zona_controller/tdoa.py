@@ -1,83 +1,273 @@
-from typing import Dict, Tuple, Optional, Any
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from .state import State
+from .dedup import DuplicateFilter
+from .filter_bank import KalmanFilterBank
 from .runtime_params import TDoARuntimeParams
-from .uwb_parser import parse_uwb_header
-from .tdoa_solver import compute_position_for_tag, TDoASolveResult
+from .uwb_parser import UWBRecord, parse_uwb_lines
+from .tdoa_solver import compute_position_for_tag, solve_sync_group, TDoASolveResult
+from .tdoa_solver.api import (
+    anchor_geometry,
+    clock_table_for,
+    gdop_grid_for,
+    gdop_stats_for,
+    prepare_sync_group,
+    result_from_solution,
+    tag_to_int,
+)
+from .solve_tick import BatchSolveTick
+from .solver_pool import SolverPool
+from .sync_scheduler import ReadyBlink, SchedulerTicker, SyncCompletionScheduler
 
-class KalmanFilter2D:
-    """
-    Egyszerű 2D állandó sebességű Kalman szűrő.
-    Állapot: [x, y, vx, vy]^T
+class TDoAProcessor:
     """
-    def __init__(self, x0=0.0, y0=0.0, vx0=0.0, vy0=0.0,
-                 pos_var=1.0, vel_var=1.0, meas_var=1.0):
-        import numpy as np
-
-        self.np = np
-        self.x = np.array([[x0], [y0], [vx0], [vy0]], dtype=float)
-        self.P = np.eye(4) * 1000.0
-        self.last_t = None
-        self.pos_var = pos_var
-        self.vel_var = vel_var
-        self.meas_var = meas_var
-
-    def predict(self, dt: float):
-        np = self.np
-        F = np.array([[1, 0, dt, 0],
-                      [0, 1, 0, dt],
-                      [0, 0, 1, 0],
-                      [0, 0, 0, 1]], dtype=float)
-        q = self.pos_var
-        Q = np.eye(4) * q
-        self.x = F @ self.x
-        self.P = F @ self.P @ F.T + Q
-
-    def update(self, z: Tuple[float, float]):
-        np = self.np
-        H = np.array([[1, 0, 0, 0],
-                      [0, 1, 0, 0]], dtype=float)
-        R = np.eye(2) * self.meas_var
-        z_vec = np.array([[z[0]], [z[1]]], dtype=float)
-        y = z_vec - (H @ self.x)
-        S = H @ self.P @ H.T + R
-        K = self.P @ H.T @ np.linalg.inv(S)
-        self.x = self.x + K @ y
-        I = np.eye(4)
-        self.P = (I - K @ H) @ self.P
-
-    def step(self, t: float, z: Tuple[float, float]):
-        if self.last_t is None:
-            self.last_t = t
-        dt = max(t - self.last_t, 1e-3)
-        self.predict(dt)
-        self.update(z)
-        self.last_t = t
-
-    def get_state(self) -> Tuple[float, float, float, float]:
-        return tuple(v[0] for v in self.x)
+    TDoA feldolgozó: UWB mérések → TAG pozíciók.
 
+    - bemenet: a dekódolt "UWB: ..." sorok / bináris keretek rekordjai
+      (update_from_message / update_from_records); parse utáni duplikátum
+      szűrés (anchor, tag, tag_seq, sync) szerint
+    - sync beaconok (a "tag" egy konfigurált anchor): nem TAG mérések, az
+      anchor óra modellt (ClockTable) frissítik
+    - TAG mérések: a State anchoronkénti gyűrűibe és (tag, sync) indexébe;
+      a megoldást a befejezés ütemező (blinkenként), a kötegelt tick, vagy
+      csomagonként a legtöbb anchor által hallott sync kör indítja
+    - solver: óra korrigált TDoA (prepare_sync_group + solve_problem:
+      track / zárt alakú kezdőpont, GN / LM, robust NLOS szűrés, GDOP kapu),
+      helyben vagy a TAG szerint shardolt solver process poolban
+    - kimenet: a Kalman filter bank (tracks) frissítése, majd a
+      solver.forward_mode szerint nyers vagy szűrt pozíció a State-be és az
+      on_position kimenetre (publish_results)
 
-class TDoAProcessor:
-    """
-    Erősen egyszerűsített TDoA feldolgozó:
-    Feltételezi, hogy a dekódolt sorok formája:
-      "TAG:<id>,X:<x>,Y:<y>,Z:<z>"
-    Itt lehet később kiegészíteni valódi TDoA matematikával.
+    A parse_message() a régi "TAG:<id>,X:<x>,Y:<y>,Z:<z>" pozíció sorok parsere.
     """
     def __init__(self, state: State, params: TDoARuntimeParams):
         self.state = state
         self.params = params
-        self.filters: Dict[str, KalmanFilter2D] = {}
+        # TAG-enkénti Kalman track-ek (solver kezdőpont + forward_mode = "filtered")
+        self.tracks = KalmanFilterBank()
+        self._track_lock = threading.Lock()
+        # solver kezdőpontok: init → [megoldások, iterációk (összesen)]
+        self._init_stats: Dict[str, List[int]] = {}
+        self._track_retries = 0
+        # opcionális kimenet: (tag_id, x, y, z, ts) → pl. PositionForwarder.forward
+        self.on_position: Optional[Callable[[str, float, float, float, float], None]] = None
 
-    def _zone_matches(self, uwb: Dict[str, Any]) -> bool:
-        zone_cfg = self.params.get_zone_params()
-        expected_hex = zone_cfg.get("expected_zone_id_hex")
-        if not expected_hex:
-            # nincs konfigurálva zóna filter → mindent engedünk
-            return True
-        z = uwb.get("zone_id_hex")
-        return z == expected_hex
+        # parse UTÁNI duplikátum szűrés: (anchor, tag, tag_seq, sync)
+        self.dedup = DuplicateFilter.from_params(params.get_dedup_params())
+        if self.dedup is not None:
+            self.state.register_stats_provider("dedup_meas", self.dedup.stats)
+
+        # solver.batch_tick_hz > 0: csomagonkénti solve helyett kötegelt tick
+        # (a szálat az app / AsyncUDPServer indítja)
+        self.batch_tick: Optional[BatchSolveTick] = None
+        batch_hz = float(params.get_solver_params().get("batch_tick_hz", 0.0))
+        if batch_hz > 0:
+            self.batch_tick = BatchSolveTick(self, batch_hz)
+            self.state.register_stats_provider("solver_batch", self.batch_tick.stats)
+
+        # (tag, sync) befejezés ütemező: blinkenként egy megoldás (+ max. egy
+        # finomítás) a soronkénti újramegoldás helyett; a deadline-okat a
+        # scheduler_ticker (szál mód) vagy az AsyncUDPServer ellenőrzi
+        self.scheduler: Optional[SyncCompletionScheduler] = None
+        self.scheduler_ticker: Optional[SchedulerTicker] = None
+        solver_cfg = params.get_solver_params()
+        if solver_cfg.get("completion_scheduler", True):
+            deadline_sec = float(solver_cfg.get("completion_deadline_ms", 30.0)) / 1000.0
+            self.scheduler = SyncCompletionScheduler(
+                deadline_sec=deadline_sec,
+                max_refinements=int(solver_cfg.get("max_refinements", 1)),
+                min_anchor_count=max(3, int(solver_cfg.get("min_anchor_count", 3))),
+                retain_sec=float(params.get_buffer_params().get("max_age_sec", 2.0)),
+                expected_default=self._configured_anchor_count,
+            )
+            self.scheduler_ticker = SchedulerTicker(self.poll_scheduler, max(0.005, deadline_sec / 2.0))
+            self.state.register_stats_provider("sync_scheduler", self.scheduler.stats)
+
+        self.state.register_stats_provider("solver_init", self._init_stats_snapshot)
+        self.state.register_stats_provider("filter", self._filter_stats)
+
+        # solver.pool_workers > 0: a teljes (tag, sync) csoportok megoldása
+        # TAG szerint shardolt solver processzekben (az app indítja: start_solver_pool)
+        self.solver_pool: Optional[SolverPool] = None
+        self.pool_inline = 0
+        pool_workers = int(solver_cfg.get("pool_workers", 0))
+        if pool_workers > 0:
+            self.solver_pool = SolverPool(
+                self._on_pool_result,
+                workers=pool_workers,
+                slots_per_worker=int(solver_cfg.get("pool_slots_per_worker", 256)),
+                max_anchors=int(solver_cfg.get("pool_max_anchors", 32)),
+            )
+            self.state.register_stats_provider("solver_pool", self._pool_stats)
+
+        # GDOP rács (enable_geometry_checks): indításkor elindítjuk a háttér
+        # építést; amíg nincs kész, a fixek GDOP ellenőrzés nélkül mennek ki
+        gdop_grid_for(params)
+        self.state.register_stats_provider("gdop", self._gdop_stats)
+
+    def _gdop_stats(self) -> Dict[str, Any]:
+        return gdop_stats_for(self.params)
+
+    def forget_tags(self, tag_ids: Iterable[str]):
+        """A State-ből kitakarított TAG-ek szűrő állapotának eldobása."""
+        tag_ids = list(tag_ids)
+        with self._track_lock:
+            self.tracks.forget(tag_ids)
+        if self.scheduler is not None:
+            ints = [tag_to_int(t) for t in tag_ids]
+            self.scheduler.forget_tags([t for t in ints if t is not None])
+
+    def _configured_anchor_count(self) -> int:
+        # a várt anchor szám alapértéke (cache-elt geometria, olcsó)
+        geometry = anchor_geometry(self.params)
+        return geometry.enabled_count if geometry is not None else 0
+
+    def track_hint(self, tag_id: str, t: float) -> Optional[Tuple[float, float]]:
+        """
+        A TAG Kalman track előrejelzett (x, y) pozíciója a t mérési időre, a
+        solver kezdőpontjának; None, ha nincs track, vagy régebbi, mint
+        filter.tag_max_age_sec (ekkor a solver zárt alakú becslésből indul).
+        """
+        return self.track_hints([tag_id], [t])[0]
+
+    def track_hints(self, tag_ids: List[str], ts: List[float]) -> List[Optional[Tuple[float, float]]]:
+        """track_hint() több TAG-re, egyetlen bank lekérdezéssel."""
+        with self._track_lock:
+            self.tracks.configure(self.params.get_filter_params())
+            xy, valid = self.tracks.predict(tag_ids, ts)
+        return [(float(p[0]), float(p[1])) if ok else None for p, ok in zip(xy, valid)]
+
+    def record_solutions(self, results: List[TDoASolveResult], ts: List[float]):
+        """
+        A track-ek frissítése az új fixekkel (egy vektorizált bank lépés, a
+        TAG-ek egyediek) és a kezdőpont statisztika.
+        Visszatér: ((n, 2) szűrt pozíciók, (n,) elfogadott maszk).
+        """
+        with self._track_lock:
+            self.tracks.configure(self.params.get_filter_params())
+            filtered, accepted = self.tracks.update(
+                [r.tag_id for r in results], ts, [(r.x, r.y) for r in results])
+
+            for result in results:
+                info = result.debug_info
+                init = info.get("init") or info.get("mode") or "unknown"
+                entry = self._init_stats.setdefault(init, [0, 0])
+                entry[0] += 1
+                entry[1] += int(info.get("iterations_total", info.get("iterations", 0)))
+                if info.get("track_retry"):
+                    self._track_retries += 1
+        return filtered, accepted
+
+    def record_solution(self, result: TDoASolveResult, ts: float):
+        self.record_solutions([result], [ts])
+
+    def publish_results(self, results: List[TDoASolveResult], ts: List[float]) -> int:
+        """
+        Megoldások kiírása a State-be (egy lock alatt) és az on_position
+        kimenetre, solver.forward_mode szerint:
+          - "raw":      a solver fixe mindkét helyre
+          - "filtered": a Kalman szűrt pozíció mindkét helyre; a max_jump_m
+                        kapun elbukott és a track-nél régebbi fix nem kerül ki
+          - "both":     State / térkép a nyers fixet, a forward a szűrtet kapja
+        Visszatér a State-be írt pozíciók számával.
+        """
+        if not results:
+            return 0
+        filtered, accepted = self.record_solutions(results, ts)
+        mode = str(self.params.get_solver_params().get("forward_mode", "filtered")).lower()
+        items: List[Tuple[str, float, float, float, float, float]] = []
+        forward: List[Tuple[str, float, float, float, float]] = []
+        for result, t, (fx, fy), ok in zip(results, ts, filtered.tolist(), accepted.tolist()):
+            quality = float(len(result.used_anchors))
+            if mode == "raw":
+                items.append((result.tag_id, result.x, result.y, result.z, t, quality))
+                forward.append((result.tag_id, result.x, result.y, result.z, t))
+                continue
+            if mode == "both":
+                items.append((result.tag_id, result.x, result.y, result.z, t, quality))
+            elif ok:
+                items.append((result.tag_id, fx, fy, result.z, t, quality))
+            if ok:
+                forward.append((result.tag_id, fx, fy, result.z, t))
+
+        self.state.update_tag_positions(items)
+        if self.on_position is not None:
+            for tag_id, x, y, z, t in forward:
+                self.on_position(tag_id, x, y, z, t)
+        return len(items)
+
+    def _init_stats_snapshot(self) -> Dict[str, Any]:
+        with self._track_lock:
+            by_init = {
+                init: {"solves": n, "avg_iterations": (it / n) if n else 0.0}
+                for init, (n, it) in self._init_stats.items()
+            }
+            return {"by_init": by_init, "track_retries": self._track_retries,
+                    "tracks": len(self.tracks)}
+
+    def _filter_stats(self) -> Dict[str, Any]:
+        with self._track_lock:
+            return self.tracks.stats()
+
+    def start_solver_pool(self):
+        if self.solver_pool is not None and not self.solver_pool.running:
+            self.solver_pool.start(self.params.get_solver_params())
+
+    def _pool_stats(self) -> Dict[str, Any]:
+        stats = self.solver_pool.stats()
+        stats["inline_fallback"] = self.pool_inline
+        return stats
+
+    def _on_pool_result(self, problem, solution, ts: float):
+        # a pool gyűjtő szálán fut (workerenként egy, FIFO)
+        if solution is None:
+            return
+        result = result_from_solution(solution, self.params.get_solver_params(),
+                                      gdop_grid_for(self.params))
+        if result is not None:
+            self._publish(result, ts)
+
+    def poll_scheduler(self, now: float):
+        """Lejárt deadline-ú blinkek megoldása (periodikusan hívva)."""
+        for blink in self.scheduler.poll(now):
+            self._solve_blink(blink)
+
+    def _solve_blink(self, blink: ReadyBlink):
+        tag_id, tag_int, sync, _ts = blink
+        if self.batch_tick is not None:
+            self.batch_tick.mark(tag_id)
+            return
+        heard = self.state.get_sync_group(tag_int, sync)
+        if not heard:
+            return
+        # a pozíció ideje a blink utolsó mérésének fogadási ideje
+        self._solve_group(tag_id, sync, heard, max(ts for ts, _uwb in heard.values()))
+
+    def _solve_group(self, tag_id: str, sync: int, heard, ts: float):
+        geometry = anchor_geometry(self.params)
+        if geometry is None:
+            return
+        solver_cfg = self.params.get_solver_params()
+        clocks = clock_table_for(self.params)
+        hint = self.track_hint(tag_id, ts)
+        pool = self.solver_pool
+        if pool is not None and pool.running:
+            problem = prepare_sync_group(tag_id, sync, heard, geometry, solver_cfg, clocks)
+            if problem is None:
+                return
+            pool.update_config(solver_cfg)
+            if pool.submit(problem._replace(x0_hint=hint), ts):
+                return
+            # túl sok anchor / leállt worker: helyben oldjuk meg
+            self.pool_inline += 1
+        result = solve_sync_group(tag_id, sync, heard, geometry, solver_cfg,
+                                  gdop_grid_for(self.params), hint, clocks)
+        if result is not None:
+            self._publish(result, ts)
+
+    def _publish(self, result: TDoASolveResult, ts: float):
+        self.publish_results([result], [ts])
 
     def parse_message(self, decoded: str) -> Optional[Tuple[str, float, float, float]]:
         """
@@ -114,67 +304,76 @@ class TDoAProcessor:
         decoded: teljes dekódolt szöveg (lehet több sor is).
         ts_recv: fogadás időbélyege (time.time()).
         """
-        for line in decoded.splitlines():
-            line = line.strip()
-            if not line:
-                continue
+        zone_cfg = self.params.get_zone_params()
+        _zone_ok, records = parse_uwb_lines(decoded, zone_cfg.get("expected_zone_id_hex"))
+        self.update_from_records(records, ts_recv)
 
-            uwb = parse_uwb_header(line)
-            if uwb is None:
-                # nem UWB sor – ha kell, itt később kezelheted a régi TAG:X,Y,Z formátumot
-                continue
+    def update_from_records(self, records: Iterable[UWBRecord], ts_recv: float):
+        """
+        Már parse-olt (és zóna szerint szűrt) UWB rekordok feldolgozása.
+        """
+        max_age_sec = float(self.params.get_buffer_params().get("max_age_sec", 2.0))
+        clocks = clock_table_for(self.params)
+        geometry = anchor_geometry(self.params) if clocks is not None else None
+        for uwb in records:
+            anchor_id = uwb.anchor_hex or uwb.anchor_id
+            tag_id = uwb.tag_hex or uwb.tag_id
 
-            # zóna-szűrés
-            if not self._zone_matches(uwb):
+            if not anchor_id or tag_id is None:
                 continue
 
-            anchor_id = uwb.get("anchor_hex") or uwb.get("anchor_id")
-            tag_id = uwb.get("tag_hex") or uwb.get("tag_id")
-            ts_raw = uwb.get("ts_raw")
+            if self.dedup is not None:
+                key = (anchor_id, tag_id, uwb.tag_seq, uwb.sync)
+                if self.dedup.is_duplicate(key, ts_recv, str(anchor_id)):
+                    continue
 
-            if not anchor_id or tag_id is None:
+            if uwb.tag_id is None:
                 continue
 
-            meas: Dict[str, Any] = {
-                "ts_recv": ts_recv,
-                "ts_raw": ts_raw,
-                "tag_id": tag_id,
-                "uwb": uwb,
-            }
+            # sync beacon (a "tag" egy "0x" azonosítójú konfigurált anchor):
+            # óra modell megfigyelés, nem TAG mérés
+            sender = geometry.index.get(uwb.tag_id) if geometry is not None else None
+            if sender is not None:
+                receiver = geometry.lookup(anchor_id)
+                if receiver is not None and uwb.ts_raw is not None and uwb.sync is not None:
+                    clocks.observe(sender, receiver, uwb.sync, uwb.ts_raw, ts_recv)
+                continue
 
-            # anchore-onkénti buffer
-            self.state.add_anchor_measurement(str(anchor_id), meas)
+            # anchore-onkénti (oszlopos) buffer + (tag, sync) index
+            heard_count = self.state.add_anchor_measurement(
+                str(anchor_id),
+                ts_recv,
+                uwb,
+                max_age_sec=max_age_sec,
+            )
 
-            # TDoA solver belépési pont – a konkrét matek később kerül implementálásra
+            # TDoA solver belépési pont
             tag_id_str = str(tag_id)
+            if self.scheduler is not None:
+                if uwb.sync is None:
+                    continue
+                blink = self.scheduler.on_measurement(
+                    tag_id_str, uwb.tag_id, uwb.sync, heard_count, ts_recv
+                )
+                if blink is not None:
+                    self._solve_blink(blink)
+                continue
+            if self.batch_tick is not None:
+                self.batch_tick.mark(tag_id_str)
+                continue
+            if self.solver_pool is not None and self.solver_pool.running:
+                best = self.state.get_best_sync_group(uwb.tag_id, ts_recv - max_age_sec)
+                if best is not None:
+                    self._solve_group(tag_id_str, best[0], best[1], ts_recv)
+                continue
 
             result = compute_position_for_tag(
                 state=self.state,
                 tag_id=tag_id_str,
                 params=self.params,
                 now_ts=ts_recv,
+                x0_hint=self.track_hint(tag_id_str, ts_recv),
             )
 
             if result is not None:
-                self.state.update_tag_position(
-                    result.tag_id,
-                    result.x,
-                    result.y,
-                    result.z,
-                    ts_recv,
-                )
-                continue
-
-            # ---- VALÓDI solver eredmény ----
-            if result is not None:
-                self.state.update_tag_position(
-                    result.tag_id,
-                    result.x,
-                    result.y,
-                    result.z,
-                    ts_recv,
-                )
-                continue
-
-
-            # IDE jön majd később a TDoA solver + state.update_tag_position(...)
+                self._publish(result, ts_recv)
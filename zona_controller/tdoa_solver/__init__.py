@@ -1,7 +1,21 @@
 # zona_controller/tdoa_solver/__init__.py
 
 from .types import TDoASolveResult, AnchorMeasurementSnapshot
-from .api import compute_position_for_tag, collect_anchor_snapshots_for_tag, solve_tdoa_for_tag
+from .geometry import AnchorGeometry, get_anchor_geometry
+from .api import (
+    anchor_geometry,
+    compute_position_for_tag,
+    collect_anchor_snapshots_for_tag,
+    solve_sync_group,
+    solve_tdoa_for_tag,
+    tag_to_int,
+)
+from .solver import (
+    SolverOutput,
+    closed_form_position,
+    solve_tdoa_closed_form,
+    solve_tdoa_position,
+)
 
 __all__ = [
     "TDoASolveResult",
@@ -9,4 +23,13 @@ __all__ = [
     "compute_position_for_tag",
     "collect_anchor_snapshots_for_tag",
     "solve_tdoa_for_tag",
+    "solve_sync_group",
+    "solve_tdoa_position",
+    "solve_tdoa_closed_form",
+    "closed_form_position",
+    "SolverOutput",
+    "AnchorGeometry",
+    "anchor_geometry",
+    "get_anchor_geometry",
+    "tag_to_int",
 ]
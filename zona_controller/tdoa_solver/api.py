@@ -1,169 +1,520 @@
 # zona_controller/tdoa_solver/api.py
 
-from typing import Dict, List, Optional
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
 
 from ..state import State
 from ..runtime_params import TDoARuntimeParams
+from ..sync_index import GroupMeasurements
+from .solver import (
+    SolverOutput,
+    closed_form_position,
+    range_differences,
+    select_reference,
+    solve_dims,
+    solve_tdoa_closed_form,
+    solve_tdoa_position,
+    tick_differences,
+)
 from .types import TDoASolveResult, AnchorMeasurementSnapshot
+from .geometry import AnchorGeometry, get_anchor_geometry
+from .gdop import GdopGrid, get_gdop_cache, get_gdop_grid
+from .clock import ClockTable, get_clock_table
+from .robust import robust_subset_solve
+
+SOLVER_MODES = ("iterative", "fast")
+
+
+def solver_mode_for_zone(solver_cfg: Dict[str, Any], zone_hex: Optional[str]) -> str:
+    """solver.zone_modes[zone] vagy solver.mode ("iterative" | "fast")."""
+    mode = solver_cfg.get("mode", "iterative")
+    if zone_hex is not None:
+        mode = (solver_cfg.get("zone_modes") or {}).get(zone_hex, mode)
+    return mode if mode in SOLVER_MODES else "iterative"
+
+
+def tag_to_int(tag_id: str) -> Optional[int]:
+    """
+    TAG azonosító hex alakja ("0x02006655") → egész (a State gyűrűiben és
+    (tag, sync) indexében így tároljuk); None, ha nem hex.
+    """
+    try:
+        return int(tag_id, 16)
+    except ValueError:
+        return None
 
 
 def collect_anchor_snapshots_for_tag(
     state: State,
     tag_id: str,
     max_age_sec: float,
+    now_ts: Optional[float] = None,
+    max_per_anchor: Optional[int] = None,
 ) -> Dict[str, List[AnchorMeasurementSnapshot]]:
     """
     BELÉPÉSI PONT 1 – adatgyűjtés a jelenlegi State-ből.
 
     Visszaadja az adott TAG-hez tartozó releváns méréseket anchoronként
-    csoportosítva. A konkrét logika (pl. időzítés, max. elemszám) később
-    lesz részletezve; jelenleg csak a váz.
+    csoportosítva, a State (tag, sync) indexéből: a max_age_sec időablakon
+    belüli sync körök, anchoronként a legfrissebb elöl, legfeljebb
+    max_per_anchor darab (buffer.snapshots_per_anchor).
+    """
+    tag_int = tag_to_int(str(tag_id))
+    if tag_int is None:
+        return {}
+    if now_ts is None:
+        now_ts = time.time()
+
+    result: Dict[str, List[AnchorMeasurementSnapshot]] = {}
+    for _sync, anchors in state.get_sync_groups_for_tag(tag_int, now_ts - max_age_sec):
+        for aid, (ts_recv, uwb) in anchors.items():
+            snaps = result.setdefault(aid, [])
+            if max_per_anchor is not None and len(snaps) >= max_per_anchor:
+                continue
+            snaps.append(AnchorMeasurementSnapshot(
+                anchor_id=aid,
+                tag_id=str(tag_id),
+                ts_recv=ts_recv,
+                ts_raw=uwb.ts_raw,
+                uwb=uwb,
+            ))
+    return result
+
 
-    Jelenleg: PLACEHOLDER, üres dictet ad vissza.
+def anchor_geometry(params: TDoARuntimeParams) -> Optional[AnchorGeometry]:
     """
-    # TODO: később:
-    #  - végigmenni state.get_anchor_buffer(anchor_id) eredményén
-    #  - filter: tag_id egyezés, időablak max_age_sec
-    #  - AnchorMeasurementSnapshot objektumokká alakítás
-    return {}
+    A zona.conf tdoa.anchors listájának cache-elt geometriája; csak config
+    generáció váltáskor épül újra (get_anchor_geometry).
+    """
+    cfg_mgr = getattr(params, "_cfg_mgr", None)  # ConfigManager a runtime_params-ben
+    if cfg_mgr is None:
+        return None
+    return get_anchor_geometry(cfg_mgr)
 
 
-def solve_tdoa_for_tag(
+def gdop_grid_for(params: TDoARuntimeParams) -> Optional[GdopGrid]:
+    """
+    Az előre számolt GDOP rács, ha a solver.enable_geometry_checks és a
+    tdoa.runtime.gdop.enabled is be van kapcsolva; különben (és az első
+    háttér építés alatt) None. A paramétereket csak a config vagy a
+    betöltött runtime paraméterek generációjának változásakor olvassa újra;
+    egyébként lock nélküli attribútum olvasás.
+    """
+    cfg_mgr = getattr(params, "_cfg_mgr", None)
+    if cfg_mgr is None:
+        return None
+    cache = get_gdop_cache(cfg_mgr)
+    generation = (cfg_mgr.generation, params.generation)
+    if cache.generation != generation:
+        gdop_cfg = params.get_gdop_params()
+        enabled = bool(gdop_cfg.pop("enabled", True)) and bool(
+            params.get_solver_params().get("enable_geometry_checks", True))
+        if enabled:
+            get_gdop_grid(cfg_mgr, gdop_cfg)
+        cache.enabled = enabled
+        cache.generation = generation
+    return cache.grid if cache.enabled else None
+
+
+def gdop_stats_for(params: TDoARuntimeParams) -> Dict[str, Any]:
+    """A GDOP rács és a háttér építés állapota (/api/stats)."""
+    cfg_mgr = getattr(params, "_cfg_mgr", None)
+    if cfg_mgr is None:
+        return {"enabled": False}
+    gdop_grid_for(params)
+    cache = get_gdop_cache(cfg_mgr)
+    return cache.stats() if cache.enabled else {"enabled": False}
+
+
+def clock_table_for(params: TDoARuntimeParams) -> Optional[ClockTable]:
+    """
+    Az anchor óra modell táblája (tdoa.runtime.clock.enabled), a config
+    generációhoz igazítva; különben None. A paramétereket csak a geometria
+    vagy a betöltött runtime paraméterek generációjának változásakor olvassa
+    újra (a rekordonkénti / solve-onkénti hívás O(1)).
+    """
+    cfg_mgr = getattr(params, "_cfg_mgr", None)
+    if cfg_mgr is None:
+        return None
+    table = get_clock_table(cfg_mgr)
+    geometry = get_anchor_geometry(cfg_mgr)
+    generation = (geometry.generation, params.generation)
+    if table.generation != generation:
+        clock_cfg = params.get_clock_params()
+        table.enabled = bool(clock_cfg.pop("enabled", True))
+        table.configure(geometry, clock_cfg, params.get_solver_params())
+        table.generation = generation
+    return table if table.enabled else None
+
+
+class SyncGroupProblem(NamedTuple):
+    """Egy (tag, sync) csoport solverre előkészített tömbjei."""
+    tag_id: str
+    sync: int
+    ids: List[str]
+    anchors: np.ndarray      # (N, 3)
+    range_diff: np.ndarray   # (N,) méter, a referenciánál 0
+    ref: int
+    zone_hex: Optional[str]
+    mode: str                # "iterative" | "fast"
+    dims: int
+    z_guess: float
+    anchor_index: List[int]  # AnchorGeometry indexek (GDOP lookup)
+    # a TAG track (Kalman) előrejelzett (x, y) pozíciója a mérés idejére;
+    # ha van, az iteratív solver innen indul
+    x0_hint: Optional[Tuple[float, float]] = None
+
+
+def prepare_sync_group(
     tag_id: str,
-    anchor_measurements: Dict[str, List[AnchorMeasurementSnapshot]],
-    params: TDoARuntimeParams,
-) -> Optional[TDoASolveResult]:
+    sync: int,
+    heard: GroupMeasurements,
+    geometry: AnchorGeometry,
+    solver_cfg: Dict[str, Any],
+    clocks: Optional[ClockTable] = None,
+) -> Optional[SyncGroupProblem]:
     """
-    BELÉPÉSI PONT 2 – tiszta TDoA solver.
+    A csoportot hallott, ismert pozíciójú anchorok tömbjei és a referencia
+    szerinti távolság különbségek; None, ha kevés az anchor.
+    clocks megadásakor az időbélyegeket előbb a master anchor időalapjára
+    hozzuk (ClockTable.corrections; a modell nélküli anchoroké nyers marad).
+    """
+    ids: List[str] = []
+    rows: List[int] = []
+    ts_rows: List[int] = []
+    zone_hex = None
+    last_recv = 0.0
+    lookup = geometry.lookup
+    for aid, (ts_recv, uwb) in heard.items():
+        i = lookup(aid)
+        if i is None or uwb.ts_raw is None:
+            continue
+        zone_hex = zone_hex or uwb.zone_id_hex
+        last_recv = max(last_recv, ts_recv)
+        ids.append(aid)
+        rows.append(i)
+        ts_rows.append(uwb.ts_raw)
+
+    min_anchors = max(3, int(solver_cfg.get("min_anchor_count", 3)))
+    if len(ids) < min_anchors:
+        return None
 
-    Ez a függvény KIZÁRÓLAG a matematikával fog foglalkozni:
-      - anchor pozíciók (zona.conf → anchors)
-      - TDoA/TOA → (x, y, z) multilateráció
-      - hibakezelés, residual-ellenőrzés, stb.
+    # fancy indexing → saját (írható) másolat a közös, írásvédett tömbből
+    anchors = geometry.positions[rows]
+    ts_raw = np.array(ts_rows, dtype=np.int64)
+    corr = clocks.corrections(rows, ts_raw, last_recv) if clocks is not None else None
+    # "closest" referencia az (átfordulás mentes, korrigált) érkezési sorrend szerint
+    ts_order = tick_differences(ts_raw, 0, corr)
+    ref = select_reference(ids, ts_order, str(solver_cfg.get("reference_anchor", "closest")))
+    range_diff = range_differences(
+        ts_raw,
+        ref,
+        float(solver_cfg.get("ts_unit_scale", 1.0)),
+        float(solver_cfg.get("c_m_per_s", 299_792_458.0)),
+        corr,
+    )
+    guess = solver_cfg.get("initial_guess") or {}
+    return SyncGroupProblem(
+        tag_id=tag_id,
+        sync=sync,
+        ids=ids,
+        anchors=anchors,
+        range_diff=range_diff,
+        ref=ref,
+        zone_hex=zone_hex,
+        mode=solver_mode_for_zone(solver_cfg, zone_hex),
+        dims=solve_dims(anchors),
+        z_guess=float(guess.get("z", 0.0)),
+        anchor_index=rows,
+    )
 
-    Most még csak a váz létezik, a tényleges TDoA megvalósítás
-    később kerül ide.
 
-    Jelenleg: mindig None-t ad vissza.
+def result_from_output(
+    problem: SyncGroupProblem,
+    out: SolverOutput,
+    solver_name: str,
+    init: Optional[str],
+    solver_cfg: Dict[str, Any],
+    gdop: Optional[GdopGrid] = None,
+    robust: Optional[Dict[str, Any]] = None,
+    discarded_iterations: int = 0,
+) -> Optional[TDoASolveResult]:
+    """
+    Solver kimenet → TDoASolveResult; None, ha nem konvergált, vagy az RMS
+    maradék nagyobb, mint solver.max_residual_m. robust: a robust_stage()
+    által eldobott anchorok (debug_info.rejected_anchors / robust).
+    discarded_iterations: a track-ből indított megoldás újrapróbálásakor
+    az elvetett próbálkozás iterációi (debug_info.iterations_total).
+
+    gdop megadásakor (enable_geometry_checks) a fix GDOP-ja egy rács
+    olvasás; tdoa.runtime.gdop.max_gdop > 0 esetén az ennél rosszabb fixet eldobjuk.
+    Ha a rács még a régi anchor listára épült (háttér újraépítés alatt), a
+    kapu kimarad és a gdop érték None.
     """
-    # TODO: később:
-    #  - anchors beolvasása ConfigManagerből vagy params-ból
-    #  - anchor_measurements → Δt/Δd → (x, y, z) számítás
-    #  - TDoASolveResult(...) összeállítása
-    return None
+    max_residual_m = float(solver_cfg.get("max_residual_m", 2.0))
+    if not out.converged or out.rms_residual_m > max_residual_m:
+        return None
 
+    gdop_value = None
+    if gdop is not None and gdop.covers(problem.anchor_index, problem.ids):
+        gdop_value = gdop.lookup(float(out.position[0]), float(out.position[1]),
+                                 problem.anchor_index)
+        if gdop_value is not None and gdop.max_gdop > 0 and not gdop_value <= gdop.max_gdop:
+            return None
 
-def compute_position_for_tag(
-    state: State,
-    tag_id: str,
-    params: TDoARuntimeParams,
-    now_ts: float,
-) -> Optional[TDoASolveResult]:
-    """
-    Egyszerű, fejlesztői dummy pozíciószámítás.
+    ids = problem.ids
+    return TDoASolveResult(
+        tag_id=problem.tag_id,
+        x=float(out.position[0]),
+        y=float(out.position[1]),
+        z=float(out.position[2]),
+        used_anchors=ids,
+        debug_info={
+            "mode": solver_name,
+            "solver_mode": problem.mode,
+            "init": init,
+            "zone": problem.zone_hex,
+            "sync": problem.sync,
+            "anchor_count": len(ids),
+            "reference_anchor": ids[problem.ref],
+            "dims": out.dims,
+            "iterations": out.iterations,
+            "iterations_total": out.iterations + discarded_iterations,
+            "track_retry": discarded_iterations > 0,
+            "converged": out.converged,
+            "rms_residual_m": out.rms_residual_m,
+            "residuals_m": {aid: float(r) for aid, r in zip(ids, out.residuals)},
+            "gdop": gdop_value,
+            "rejected_anchors": robust["rejected_anchors"] if robust else [],
+            "robust": robust,
+        },
+    )
 
-    Nem végez valódi TDoA-t, csak:
-      - végigmegy a zona.conf tdoa.anchors listán,
-      - minden anchorhoz megnézi a State anchor-bufferét,
-      - kikeresi az adott TAG-hez tartozó legfrissebb mérést egy időablakon belül,
-      - csoportosítja őket 'sync' szerint,
-      - a legnagyobb sync-csoport anchor pozícióinak átlagát adja vissza (x,y,z).
 
-    Követelmény: ugyanazon sync-hez tartozó legalább 3 anchor mérés.
+def track_seed_ok(out: SolverOutput, solver_cfg: Dict[str, Any]) -> bool:
     """
+    A track-ből indított megoldás elfogadható-e; ha nem (nem konvergált vagy
+    gyanúsan nagy a maradék – rossz medence), a zárt alakú kezdőpontból
+    újra kell próbálni.
+    """
+    return out.converged and out.rms_residual_m <= float(solver_cfg.get("robust_trigger_rms_m", 0.3))
 
-    # 1) időablak a runtime buffer paraméterekből
-    buf_cfg = params.get_buffer_params()
-    max_age_sec = float(buf_cfg.get("max_age_sec", 2.0))
 
-    # 2) anchors beolvasása a zona.conf-ból
-    try:
-        cfg = params._cfg_mgr.get_config()  # ConfigManager a runtime_params-ben
-    except AttributeError:
-        return None
+def robust_stage(
+    problem: SyncGroupProblem,
+    out: SolverOutput,
+    solver_cfg: Dict[str, Any],
+) -> Tuple[SyncGroupProblem, SolverOutput, Optional[Dict[str, Any]]]:
+    """
+    NLOS / outlier anchorok kiszűrése (robust_subset_solve), ha a teljes
+    halmaz maradéka túl nagy. Javuláskor a megtartott anchorokra szűkített
+    problémát és megoldást adja vissza, a debug_info "robust" részével.
+    """
+    outcome = robust_subset_solve(problem.anchors, problem.range_diff, problem.ref, out, solver_cfg)
+    if outcome is None:
+        return problem, out, None
+    keep = np.flatnonzero(outcome.keep)
+    sub = subproblem(problem, keep.tolist(), int(np.flatnonzero(keep == outcome.ref)[0]))
+    info = {
+        "rejected_anchors": [problem.ids[i] for i in outcome.rejected],
+        "subsets": outcome.subsets,
+        "elapsed_us": outcome.elapsed_us,
+        "rms_before_m": outcome.rms_before_m,
+        "budget_exhausted": outcome.budget_exhausted,
+    }
+    return sub, outcome.out, info
+
+
+class ProblemSolution(NamedTuple):
+    """solve_problem() kimenete: a (robust lépés után esetleg szűkített) probléma és megoldása."""
+    problem: SyncGroupProblem
+    out: SolverOutput
+    solver_name: str          # "closed_form" | "lm" | "gauss_newton"
+    init: Optional[str]       # "track" | "closed_form" | "centroid" | None
+    robust: Optional[Dict[str, Any]]
+    discarded_iterations: int
+
+
+def subproblem(problem: SyncGroupProblem, keep: List[int], ref: int) -> SyncGroupProblem:
+    """
+    A megtartott anchorokra (keep, eredeti indexek) szűkített probléma; ref
+    a keep-en belüli referencia index, a különbségek ehhez íródnak át.
+    """
+    rd = problem.range_diff[keep]
+    return problem._replace(
+        ids=[problem.ids[i] for i in keep],
+        anchors=problem.anchors[keep],
+        range_diff=rd - rd[ref],
+        ref=ref,
+        anchor_index=[problem.anchor_index[i] for i in keep],
+    )
 
-    tdoa_cfg = cfg.get("tdoa", {})
-    anchors_cfg = tdoa_cfg.get("anchors", [])
-    if not anchors_cfg:
-        return None
 
-    tag_id_str = str(tag_id)
+def solve_problem(problem: SyncGroupProblem, solver_cfg: Dict[str, Any]) -> ProblemSolution:
+    """
+    Egy előkészített (tag, sync) csoport megoldása, a solver mód szerint:
+        "iterative" – GN / LM, a TAG track előrejelzéséből (x0_hint) indítva;
+                      ha az nincs, vagy rossz medencébe fut (track_seed_ok),
+                      a zárt alakú becslésből, ha az sem számolható, a
+                      hallott anchorok középpontjából
+        "fast"      – csak a zárt alakú becslés; ha nem számolható, iteratív
+
+    Iteratív módban túl nagy maradéknál a robust_stage() próbál NLOS
+    anchorokat eldobni (költségkerettel). Csak a problémát és a solver
+    paramétereket használja, így a solver processz pool workerei is ezt futtatják.
+    """
+    anchors, range_diff, ref, dims = problem.anchors, problem.range_diff, problem.ref, problem.dims
+    z_guess = problem.z_guess
+
+    if problem.mode == "fast":
+        out = solve_tdoa_closed_form(anchors, range_diff, ref, z_guess, dims)
+        if out is not None:
+            return ProblemSolution(problem, out, "closed_form", None, None, 0)
+
+    use_lm = bool(solver_cfg.get("use_lm_solver", True))
+
+    def iterate(x0: np.ndarray) -> SolverOutput:
+        return solve_tdoa_position(
+            anchors,
+            range_diff,
+            ref,
+            x0,
+            max_iterations=int(solver_cfg.get("max_iterations", 20)),
+            stop_threshold=float(solver_cfg.get("stop_threshold", 1e-4)),
+            use_lm=use_lm,
+            dims=dims,
+        )
 
-    # 3) per-anchor legfrissebb, időben közeli mérés az adott TAG-re
-    candidates: List[tuple] = []  # (anchor_id, pos_dict, sync_val, ts_recv)
+    # kezdőpont: a TAG track előrejelzése; ha nincs (vagy rossz medencébe
+    # futott), zárt alakú becslés, ennek hiányában a hallott anchorok
+    # középpontja (z az initial_guess-ből)
+    discarded = 0
+    out = track_out = None
+    if problem.x0_hint is not None:
+        init = "track"
+        out = iterate(np.array([problem.x0_hint[0], problem.x0_hint[1], z_guess]))
+        if not track_seed_ok(out, solver_cfg):
+            track_out, out = out, None
+    if out is None:
+        init = "closed_form"
+        x0 = closed_form_position(anchors, range_diff, ref, None if dims == 3 else z_guess)
+        if x0 is None:
+            x0 = anchors.mean(axis=0)
+            x0[2] = z_guess
+            init = "centroid"
+        out = iterate(x0)
+        if track_out is not None:
+            discarded = track_out.iterations
+            if track_out.converged and (
+                    not out.converged or track_out.rms_residual_m < out.rms_residual_m):
+                # az újrapróbálás sem lett jobb: marad a track-ből indított megoldás
+                discarded = out.iterations
+                out, init = track_out, "track"
+    problem, out, robust = robust_stage(problem, out, solver_cfg)
+    return ProblemSolution(problem, out, "lm" if use_lm else "gauss_newton", init, robust, discarded)
+
+
+def result_from_solution(
+    solution: ProblemSolution,
+    solver_cfg: Dict[str, Any],
+    gdop: Optional[GdopGrid] = None,
+) -> Optional[TDoASolveResult]:
+    return result_from_output(solution.problem, solution.out, solution.solver_name, solution.init,
+                              solver_cfg, gdop, solution.robust, solution.discarded_iterations)
 
-    for a in anchors_cfg:
-        aid = str(a.get("id") or "").strip()
-        pos = a.get("position") or {}
-        if not aid or not {"x", "y", "z"} <= pos.keys():
-            continue
 
-        buf = state.get_anchor_buffer(aid)
-        if not buf:
-            continue
+def solve_sync_group(
+    tag_id: str,
+    sync: int,
+    heard: GroupMeasurements,
+    geometry: AnchorGeometry,
+    solver_cfg: Dict[str, Any],
+    gdop: Optional[GdopGrid] = None,
+    x0_hint: Optional[Tuple[float, float]] = None,
+    clocks: Optional[ClockTable] = None,
+) -> Optional[TDoASolveResult]:
+    """
+    Egy (tag, sync) csoport megoldása: a csoportot hallott, ismert pozíciójú
+    anchorok (clocks megadásakor óra korrigált) érkezési időiből TDoA
+    (prepare_sync_group + solve_problem).
 
-        latest = None
-        for m in reversed(buf):
-            if str(m.get("tag_id")) != tag_id_str:
-                continue
-            ts_recv = float(m.get("ts_recv", 0.0))
-            if now_ts - ts_recv > max_age_sec:
-                continue
-            latest = m
-            break
+    None, ha kevés az anchor, a solver nem konvergált, vagy az RMS maradék
+    nagyobb, mint solver.max_residual_m.
+    """
+    problem = prepare_sync_group(tag_id, sync, heard, geometry, solver_cfg, clocks)
+    if problem is None:
+        return None
+    if x0_hint is not None:
+        problem = problem._replace(x0_hint=x0_hint)
+    return result_from_solution(solve_problem(problem, solver_cfg), solver_cfg, gdop)
 
-        if not latest:
-            continue
 
-        uwb = latest.get("uwb", {})
-        sync_val = uwb.get("sync")
-        if sync_val is None:
-            continue
+def solve_tdoa_for_tag(
+    tag_id: str,
+    anchor_measurements: Dict[str, List[AnchorMeasurementSnapshot]],
+    params: TDoARuntimeParams,
+) -> Optional[TDoASolveResult]:
+    """
+    BELÉPÉSI PONT 2 – tiszta TDoA solver.
 
-        candidates.append(
-            (aid, pos, sync_val, float(latest.get("ts_recv", 0.0)))
-        )
+    A collect_anchor_snapshots_for_tag() kimenetéből a legtöbb anchor által
+    hallott sync kört választja, és azt oldja meg (solve_sync_group).
+    """
+    by_sync: Dict[int, GroupMeasurements] = {}
+    for aid, snaps in anchor_measurements.items():
+        for snap in snaps:
+            sync = snap.uwb.sync
+            if sync is None:
+                continue
+            group = by_sync.setdefault(sync, {})
+            if aid not in group or snap.ts_recv > group[aid][0]:
+                group[aid] = (snap.ts_recv, snap.uwb)
+    if not by_sync:
+        return None
 
-    if not candidates:
+    sync, heard = max(
+        by_sync.items(),
+        key=lambda kv: (len(kv[1]), max(ts for ts, _u in kv[1].values())),
+    )
+    geometry = anchor_geometry(params)
+    if geometry is None or not geometry.enabled_count:
         return None
+    return solve_sync_group(str(tag_id), sync, heard, geometry, params.get_solver_params(),
+                            gdop_grid_for(params), clocks=clock_table_for(params))
 
-    # 4) Csoportosítás sync alapján – azt használjuk, amelyikhez a legtöbb anchor tartozik
-    by_sync: Dict[int, List[tuple]] = {}
-    for item in candidates:
-        sync_val = item[2]
-        by_sync.setdefault(sync_val, []).append(item)
 
-    best_sync, group = max(by_sync.items(), key=lambda kv: len(kv[1]))
+def compute_position_for_tag(
+    state: State,
+    tag_id: str,
+    params: TDoARuntimeParams,
+    now_ts: float,
+    x0_hint: Optional[Tuple[float, float]] = None,
+) -> Optional[TDoASolveResult]:
+    """
+    Egy TAG aktuális pozíciója:
+      - a State (tag, sync) indexéből kiveszi az időablakon belüli,
+        legtöbb anchor által hallott sync kört (egyetlen lookup),
+      - a zona.conf tdoa.anchors pozícióival iteratív TDoA megoldás
+        (tdoa.runtime.solver paraméterek).
+    """
+    buf_cfg = params.get_buffer_params()
+    max_age_sec = float(buf_cfg.get("max_age_sec", 2.0))
 
-    # Legalább 3 anchor kell
-    if len(group) < 3:
+    tag_id_str = str(tag_id)
+    tag_int = tag_to_int(tag_id_str)
+    if tag_int is None:
         return None
 
-    # 5) Anchor pozíciók átlaga
-    xs: List[float] = []
-    ys: List[float] = []
-    zs: List[float] = []
-    used_anchors: List[str] = []
-
-    for aid, pos, sync_val, ts in group:
-        xs.append(float(pos["x"]))
-        ys.append(float(pos["y"]))
-        zs.append(float(pos["z"]))
-        used_anchors.append(aid)
+    best = state.get_best_sync_group(tag_int, now_ts - max_age_sec)
+    if best is None:
+        return None
+    best_sync, heard = best
 
-    avg_x = sum(xs) / len(xs)
-    avg_y = sum(ys) / len(ys)
-    avg_z = sum(zs) / len(zs)
+    geometry = anchor_geometry(params)
+    if geometry is None or not geometry.enabled_count:
+        return None
 
-    return TDoASolveResult(
-        tag_id=tag_id_str,
-        x=avg_x,
-        y=avg_y,
-        z=avg_z,
-        used_anchors=used_anchors,
-        debug_info={
-            "mode": "dummy_centroid",
-            "sync": best_sync,
-            "anchor_count": len(used_anchors),
-        },
-    )
+    return solve_sync_group(tag_id_str, best_sync, heard, geometry, params.get_solver_params(),
+                            gdop_grid_for(params), x0_hint, clock_table_for(params))
@@ -0,0 +1,242 @@
+# zona_controller/tdoa_solver/batch.py
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .api import SyncGroupProblem, result_from_output, robust_stage, track_seed_ok
+from .gdop import GdopGrid
+from .solver import SolverOutput
+from .types import TDoASolveResult
+
+
+def closed_form_batch(
+    anchors: np.ndarray,
+    range_diff: np.ndarray,
+    ref: np.ndarray,
+    z_fixed: Optional[np.ndarray],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    closed_form_position() B darab azonos anchor számú csoportra egyszerre.
+
+    A referencia sor b=0, r=0 → nulla egyenlet, így nem kell kivenni; a
+    normálegyenletek (A^T A) x = A^T rhs egy kötegelt solve-val oldódnak.
+    Visszatér: (pozíciók (B, 3), ok (B,) maszk).
+    """
+    B, N, _ = anchors.shape
+    rows = np.arange(B)
+    a_ref = anchors[rows, ref]                      # (B, 3)
+    b = anchors - a_ref[:, None, :]                 # (B, N, 3)
+    r = range_diff                                  # (B, N)
+    rhs = np.einsum("bij,bij->bi", b, b) - r * r
+
+    if z_fixed is None:
+        cols = 3
+        A = np.concatenate((2.0 * b, 2.0 * r[:, :, None]), axis=2)
+    else:
+        cols = 2
+        pz = z_fixed - a_ref[:, 2]
+        A = np.concatenate((2.0 * b[:, :, :2], 2.0 * r[:, :, None]), axis=2)
+        rhs = rhs - 2.0 * b[:, :, 2] * pz[:, None]
+
+    positions = np.zeros((B, 3), dtype=np.float64)
+    ok = np.zeros(B, dtype=bool)
+    if N - 1 < cols + 1:
+        return positions, ok
+
+    AtA = np.einsum("bik,bil->bkl", A, A)
+    Atb = np.einsum("bik,bi->bk", A, rhs)
+    # elfajuló geometria: a rosszul kondicionált sorokat kihagyjuk
+    cond = np.linalg.cond(AtA)
+    ok = np.isfinite(cond) & (cond < 1e12)
+    if np.any(ok):
+        sol = np.linalg.solve(AtA[ok], Atb[ok][:, :, None])[:, :, 0]
+        positions[ok, :cols] = sol[:, :cols]
+        positions[ok, 2] = sol[:, 2] if z_fixed is None else pz[ok]
+        positions[ok] += a_ref[ok]
+    return positions, ok
+
+
+def solve_tdoa_batch(
+    anchors: np.ndarray,
+    range_diff: np.ndarray,
+    ref: np.ndarray,
+    x0: np.ndarray,
+    dims: int,
+    max_iterations: int = 20,
+    stop_threshold: float = 1e-4,
+    use_lm: bool = True,
+) -> List[SolverOutput]:
+    """
+    Kötegelt GN / LM: B darab azonos anchor számú (N) és dimenziójú csoport
+    egyszerre. A maradékok (B, N), a Jacobi (B, N, dims), a normálegyenletek
+    (B, dims, dims) egyetlen einsum / batched solve hívással állnak elő.
+
+    LM-nél a csillapítás csoportonként külön él; egy elutasított lépés is
+    egy iterációnak számít. A már konvergált csoportok nem mozdulnak.
+    """
+    B, N, _ = anchors.shape
+    rows = np.arange(B)
+    a_ref = anchors[rows, ref]
+
+    def evaluate(p: np.ndarray):
+        diff = p[:, None, :] - anchors                           # (B, N, 3)
+        dist = np.maximum(np.sqrt(np.einsum("bij,bij->bi", diff, diff)), 1e-9)
+        diff_ref = p - a_ref
+        dist_ref = np.maximum(np.sqrt(np.einsum("bi,bi->b", diff_ref, diff_ref)), 1e-9)
+        r = dist - dist_ref[:, None] - range_diff
+        r[rows, ref] = 0.0
+        return r, diff, dist, diff_ref, dist_ref
+
+    p = np.array(x0, dtype=np.float64)
+    r, diff, dist, diff_ref, dist_ref = evaluate(p)
+    cost = np.einsum("bi,bi->b", r, r)
+    lam = np.full(B, 1e-3)
+    active = np.ones(B, dtype=bool)
+    converged = np.zeros(B, dtype=bool)
+    iterations = np.zeros(B, dtype=np.int32)
+    eye = np.eye(dims)
+
+    for _ in range(max_iterations):
+        if not np.any(active):
+            break
+        iterations[active] += 1
+        J = (diff / dist[:, :, None] - (diff_ref / dist_ref[:, None])[:, None, :])[:, :, :dims]
+        J[rows, ref] = 0.0
+        JTJ = np.einsum("bik,bil->bkl", J, J)
+        g = np.einsum("bik,bi->bk", J, r)
+
+        H = JTJ
+        if use_lm:
+            diag = JTJ * eye + 1e-12 * eye
+            H = JTJ + lam[:, None, None] * diag
+        else:
+            H = JTJ + 1e-12 * eye
+        try:
+            delta = np.linalg.solve(H, -g[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            delta = np.stack([np.linalg.lstsq(H[i], -g[i], rcond=None)[0] for i in range(B)])
+        delta[~active] = 0.0
+
+        p_new = p.copy()
+        p_new[:, :dims] += delta
+        ev = evaluate(p_new)
+        new_cost = np.einsum("bi,bi->b", ev[0], ev[0])
+
+        accept = active & ((new_cost <= cost) if use_lm else True)
+        p[accept] = p_new[accept]
+        r[accept] = ev[0][accept]
+        diff[accept] = ev[1][accept]
+        dist[accept] = ev[2][accept]
+        diff_ref[accept] = ev[3][accept]
+        dist_ref[accept] = ev[4][accept]
+        cost[accept] = new_cost[accept]
+
+        step = np.sqrt(np.einsum("bi,bi->b", delta, delta))
+        done = accept & (step < stop_threshold)
+        if use_lm:
+            lam = np.where(accept, np.maximum(lam / 10.0, 1e-12), lam * 10.0)
+            # nincs javító lépés: lokális minimumban vagyunk
+            done |= active & (lam >= 1e10)
+        converged |= done
+        active &= ~done
+
+    n_eq = max(1, N - 1)
+    rms = np.sqrt(cost / n_eq)
+    return [
+        SolverOutput(p[i].copy(), r[i].copy(), int(iterations[i]), bool(converged[i]),
+                     float(rms[i]), dims)
+        for i in range(B)
+    ]
+
+
+def solve_problems_batch(
+    problems: Sequence[SyncGroupProblem],
+    solver_cfg: Dict[str, Any],
+    gdop: Optional[GdopGrid] = None,
+) -> List[Optional[TDoASolveResult]]:
+    """
+    Előkészített (tag, sync) csoportok kötegelt megoldása. A csoportokat
+    (anchor szám, dimenzió) szerint sűrű tömbökbe rakjuk; "fast" zónáknál
+    csak a zárt alakú becslés fut, a többinél a GN / LM kezdőpontja a TAG
+    track előrejelzése (x0_hint), ennek hiányában a zárt alakú becslés.
+    Az eredmény sorrendje a bemenetével egyezik.
+    """
+    results: List[Optional[TDoASolveResult]] = [None] * len(problems)
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    for i, pr in enumerate(problems):
+        buckets.setdefault((pr.anchors.shape[0], pr.dims), []).append(i)
+
+    use_lm = bool(solver_cfg.get("use_lm_solver", True))
+    max_iterations = int(solver_cfg.get("max_iterations", 20))
+    stop_threshold = float(solver_cfg.get("stop_threshold", 1e-4))
+    iter_name = "lm" if use_lm else "gauss_newton"
+
+    for (_n, dims), idx in buckets.items():
+        group = [problems[i] for i in idx]
+        anchors = np.stack([pr.anchors for pr in group])
+        range_diff = np.stack([pr.range_diff for pr in group])
+        ref = np.array([pr.ref for pr in group], dtype=np.intp)
+        z_guess = np.array([pr.z_guess for pr in group])
+
+        x_cf, ok = closed_form_batch(anchors, range_diff, ref, None if dims == 3 else z_guess)
+
+        # "fast" zónák: a zárt alakú becslés maga az eredmény
+        iterative: List[int] = []
+        for j, pr in enumerate(group):
+            if pr.mode == "fast" and ok[j]:
+                p = x_cf[j]
+                dist = np.linalg.norm(p - pr.anchors, axis=1)
+                res = dist - dist[pr.ref] - pr.range_diff
+                res[pr.ref] = 0.0
+                rms = float(np.sqrt(float(res @ res) / max(1, res.shape[0] - 1)))
+                out = SolverOutput(p, res, 0, True, rms, dims)
+                results[idx[j]] = result_from_output(pr, out, "closed_form", None, solver_cfg, gdop)
+            else:
+                iterative.append(j)
+        if not iterative:
+            continue
+
+        sel = np.array(iterative, dtype=np.intp)
+        x0 = x_cf[sel].copy()
+        centroid = ~ok[sel]
+        if np.any(centroid):
+            x0[centroid] = anchors[sel][centroid].mean(axis=1)
+            x0[centroid, 2] = z_guess[sel][centroid]
+        fallback = x0.copy()
+        # a TAG track előrejelzése, ahol van (x0_hint)
+        tracked = np.array([group[j].x0_hint is not None for j in iterative])
+        for k in np.flatnonzero(tracked):
+            x0[k, :2] = group[iterative[k]].x0_hint
+            x0[k, 2] = z_guess[sel[k]]
+
+        def run(rows: np.ndarray, start: np.ndarray) -> List[SolverOutput]:
+            return solve_tdoa_batch(anchors[sel[rows]], range_diff[sel[rows]], ref[sel[rows]],
+                                    start, dims, max_iterations, stop_threshold, use_lm)
+
+        everyone = np.arange(len(iterative))
+        outs = run(everyone, x0)
+        inits = ["track" if tracked[k] else ("centroid" if centroid[k] else "closed_form")
+                 for k in everyone]
+        discarded = [0] * len(iterative)
+
+        # rossz medencébe futott track indítás: egy kötegben újra a zárt
+        # alakú / középponti kezdőpontból, és a jobbik marad
+        retry = np.array([k for k in everyone if tracked[k] and not track_seed_ok(outs[k], solver_cfg)],
+                         dtype=np.intp)
+        if retry.size:
+            for k, out in zip(retry, run(retry, fallback[retry])):
+                prev = outs[k]
+                if prev.converged and (not out.converged or prev.rms_residual_m < out.rms_residual_m):
+                    discarded[k] = out.iterations
+                    continue
+                discarded[k] = prev.iterations
+                outs[k] = out
+                inits[k] = "centroid" if centroid[k] else "closed_form"
+
+        for k, j in enumerate(iterative):
+            # a robusztus lépés csak a gyanús (nagy maradékú) csoportokra fut
+            problem, out, robust = robust_stage(group[j], outs[k], solver_cfg)
+            results[idx[j]] = result_from_output(problem, out, iter_name, inits[k], solver_cfg,
+                                                 gdop, robust, discarded[k])
+    return results
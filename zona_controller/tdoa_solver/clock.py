@@ -0,0 +1,318 @@
+# zona_controller/tdoa_solver/clock.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .geometry import AnchorGeometry
+from .solver import TS_WRAP
+
+
+class ClockTable:
+    """
+    Anchoronkénti óra modell (offset + skew) a master anchor időalapjához.
+
+    Megfigyelések a sync körökből: ha egy UWB sor "tag" mezője egy
+    konfigurált anchor (sync beacon), a küldő és a vevő pozíciója ismert,
+    így a vevő órájával mért adási idő:
+        tau_i = ts_i - d(küldő, i) / (c * ts_unit_scale)
+    Ugyanannak a (küldő, sync) beaconnak minden vevőjénél tau_i ugyanaz a
+    fizikai pillanat; a master tau_m-jével:
+        tau_i - tau_m = offset_i + skew_i * (tau_i - t0_i) * ts_unit_scale
+    A két paramétert anchoronként rekurzív legkisebb négyzetekkel
+    (felejtő RLS / Kalman alak, zárt alakú 2x2) becsüljük; csomagonként O(1),
+    a még nem párosított körökből legfeljebb max_rounds marad meg.
+
+    A nyers ts 40 bites számláló (DW1000 tickkel ~17.2 s-onként átfordul),
+    ezért anchoronként átfordulás mentes (unwrapped, int64) tickekben
+    számolunk: az új érték az anchor utolsó unwrapped tickjéhez képest
+    modulo 2^40 vett különbség, az egész átfordulások számát a fogadási
+    idők (ts_recv) különbsége dönti el, így hosszabb kiesés után sem csúszik
+    el 2^40 tickkel. t0 és a korrekciók is unwrapped tickekre vonatkoznak.
+
+    A tábla tömbjei (N = az anchorok száma, sorrend = AnchorGeometry index):
+      theta (N, 2) [offset tick, skew tick/s], P (N, 2, 2), t0 (N,)
+      unwrapped tick, rounds / outliers (N,), rms (N,) tick, updated (N,)
+      fogadási idő, tick / tick_recv (N,) az utolsó unwrapped tick és
+      fogadási ideje.
+    Nem master anchor modellje min_rounds kör után és stale_sec-nél
+    frissebb utolsó megfigyelésnél érvényes (synced); a többinél a
+    korrekció 0 (a nyers időbélyeg marad).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ids: Tuple[str, ...] = ()
+        self.positions: Optional[np.ndarray] = None
+        self.master = -1
+        self.theta = np.zeros((0, 2))
+        self.P = np.zeros((0, 2, 2))
+        self.t0 = np.zeros(0, dtype=np.int64)
+        self.rounds = np.zeros(0, dtype=np.int64)
+        self.outliers = np.zeros(0, dtype=np.int64)
+        self.rms = np.zeros(0)
+        self.updated = np.zeros(0)
+        self.tick = np.zeros(0, dtype=np.int64)
+        self.tick_recv = np.zeros(0)
+        # (küldő index, sync) → {vevő index: (unwrapped tick, távolság tick)}
+        self._pending: "OrderedDict[Tuple[int, int], Dict[int, Tuple[int, float]]]" = OrderedDict()
+        self.observations = 0
+        self.unpaired_dropped = 0
+        self._cfg: Dict[str, Any] = {}
+        self._cfg_key: Optional[Tuple[Any, ...]] = None
+        # clock_table_for kapuja: (geometria, runtime paraméter) generáció
+        self.generation: Optional[Tuple[int, int]] = None
+        self.enabled = True
+
+    # ---- geometria / paraméterek ----
+
+    def _reset(self, geometry: AnchorGeometry):
+        n = len(geometry)
+        self.ids = geometry.ids
+        self.positions = geometry.positions
+        self.theta = np.zeros((n, 2))
+        self.P = np.zeros((n, 2, 2))
+        self.t0 = np.zeros(n, dtype=np.int64)
+        self.rounds = np.zeros(n, dtype=np.int64)
+        self.outliers = np.zeros(n, dtype=np.int64)
+        self.rms = np.zeros(n)
+        self.updated = np.full(n, -np.inf)
+        self.tick = np.zeros(n, dtype=np.int64)
+        self.tick_recv = np.full(n, -np.inf)
+        self._pending.clear()
+
+    def configure(self, geometry: AnchorGeometry, clock_cfg: Dict[str, Any],
+                  solver_cfg: Dict[str, Any]):
+        """
+        Geometria és paraméterek átvétele; az anchor lista vagy a pozíciók
+        változásakor a becslések elölről indulnak (a régi modell érvénytelen).
+        Változatlan generáció és paraméterek mellett olcsó (nem csinál semmit).
+        """
+        key = (geometry.generation, tuple(sorted(clock_cfg.items())),
+               solver_cfg.get("ts_unit_scale"), solver_cfg.get("c_m_per_s"))
+        if key == self._cfg_key:
+            return
+        with self._lock:
+            self._cfg_key = key
+            if (geometry.ids != self.ids or self.positions is None
+                    or not np.array_equal(geometry.positions, self.positions)):
+                self._reset(geometry)
+            scale = float(solver_cfg.get("ts_unit_scale", 1.0)) or 1.0
+            c = float(solver_cfg.get("c_m_per_s", 299_792_458.0))
+            ticks_per_m = 1.0 / (c * scale)
+            master_id = str(clock_cfg.get("master_anchor") or "")
+            master = geometry.lookup(master_id) if master_id else None
+            if master is None:
+                enabled = np.flatnonzero(geometry.enabled)
+                master = int(enabled[0]) if len(enabled) else -1
+            if master != self.master:
+                self._reset(geometry)
+                self.master = master
+            noise = float(clock_cfg.get("noise_m", 0.05)) * ticks_per_m
+            self._cfg = {
+                "scale": scale,
+                "ticks_per_m": ticks_per_m,
+                "forgetting": min(max(float(clock_cfg.get("forgetting", 0.995)), 0.5), 1.0),
+                "meas_var": max(noise * noise, 1e-12),
+                "skew_var0": (float(clock_cfg.get("max_skew_ppm", 100.0)) * 1e-6 / scale) ** 2,
+                "outlier_ticks": float(clock_cfg.get("outlier_m", 1.0)) * ticks_per_m,
+                "min_rounds": max(1, int(clock_cfg.get("min_rounds", 5))),
+                "stale_sec": float(clock_cfg.get("stale_sec", 30.0)),
+                "max_rounds": max(1, int(clock_cfg.get("max_rounds", 16))),
+                "recenter_sec": float(clock_cfg.get("recenter_sec", 600.0)),
+            }
+
+    # ---- megfigyelések ----
+
+    def _unwrap(self, i: int, ts_raw: int, ts_recv: float) -> int:
+        """
+        ts_raw az i anchor unwrapped tick tartományában: az utolsó tickhez
+        képesti különbség modulo 2^40, plusz annyi teljes átfordulás, amennyi
+        a fogadási idők különbségéhez a legközelebb van.
+        """
+        last_recv = self.tick_recv[i]
+        if not np.isfinite(last_recv):
+            u = int(ts_raw)
+        else:
+            last = int(self.tick[i])
+            d = (int(ts_raw) - last) % TS_WRAP
+            expected = (ts_recv - last_recv) / self._cfg["scale"]
+            u = last + d + int(round((expected - d) / TS_WRAP)) * TS_WRAP
+            if u <= last:
+                # késve érkezett (régebbi) érték: a követett tick marad
+                return u
+        self.tick[i] = u
+        self.tick_recv[i] = ts_recv
+        return u
+
+    def observe(self, sender: int, receiver: int, sync: int, ts_raw: int, ts_recv: float):
+        """
+        Egy sync beacon vétele: sender adta, receiver hallotta ts_raw-kor
+        (mindkettő AnchorGeometry index). A küldő saját sora (ha jelenti az
+        adási időt) távolság 0-val ugyanígy megfigyelés.
+        """
+        with self._lock:
+            if self.master < 0 or self.positions is None:
+                return
+            cfg = self._cfg
+            diff = self.positions[sender] - self.positions[receiver]
+            obs = (self._unwrap(receiver, ts_raw, ts_recv),
+                   float(np.sqrt(diff @ diff)) * cfg["ticks_per_m"])
+            key = (sender, sync)
+            heard = self._pending.get(key)
+            if heard is None:
+                heard = self._pending[key] = {}
+                while len(self._pending) > cfg["max_rounds"]:
+                    _key, old = self._pending.popitem(last=False)
+                    if self.master not in old:
+                        self.unpaired_dropped += len(old)
+            heard[receiver] = obs
+            self.observations += 1
+
+            if receiver == self.master:
+                for i, obs_i in heard.items():
+                    if i != self.master:
+                        self._update(i, obs_i, obs, ts_recv)
+            elif self.master in heard:
+                self._update(receiver, obs, heard[self.master], ts_recv)
+
+    def _update(self, i: int, obs_i: Tuple[int, float], obs_m: Tuple[int, float], ts_recv: float):
+        # tau = u - dist; az unwrapped tickeket egészként vonjuk ki, a
+        # (nagy) abszolút értékek float kerekítése így nem számít
+        cfg = self._cfg
+        u_i, dist_i = obs_i
+        u_m, dist_m = obs_m
+        y = float(u_i - u_m) - (dist_i - dist_m)
+        if self.rounds[i] == 0:
+            self.t0[i] = u_i
+            self.theta[i] = (y, 0.0)
+            self.P[i] = ((cfg["meas_var"], 0.0), (0.0, cfg["skew_var0"]))
+            self.rounds[i] = 1
+            self.updated[i] = ts_recv
+            return
+
+        x = float(u_i - int(self.t0[i])) * cfg["scale"]
+        if x > cfg["recenter_sec"]:
+            # t0 előre tolása: az offset átveszi a skew * x részt, P ennek
+            # megfelelően transzformálódik (T P T^T, T = [[1, x], [0, 1]])
+            th = self.theta[i]
+            th[0] += th[1] * x
+            p = self.P[i]
+            p00 = p[0, 0] + 2.0 * x * p[0, 1] + x * x * p[1, 1]
+            p01 = p[0, 1] + x * p[1, 1]
+            p[0, 0], p[0, 1], p[1, 0] = p00, p01, p01
+            self.t0[i] = u_i
+            x = 0.0
+
+        th = self.theta[i]
+        p = self.P[i]
+        e = y - (th[0] + th[1] * x)
+        if self.rounds[i] >= cfg["min_rounds"] and abs(e) > cfg["outlier_ticks"]:
+            self.outliers[i] += 1
+            return
+
+        # K = P h / (h^T P h + R), h = [1, x]
+        ph0 = p[0, 0] + p[0, 1] * x
+        ph1 = p[1, 0] + p[1, 1] * x
+        s = ph0 + ph1 * x + cfg["meas_var"]
+        k0, k1 = ph0 / s, ph1 / s
+        th[0] += k0 * e
+        th[1] += k1 * e
+        lam = cfg["forgetting"]
+        p00 = (p[0, 0] - k0 * ph0) / lam
+        p01 = (p[0, 1] - k0 * ph1) / lam
+        p11 = (p[1, 1] - k1 * ph1) / lam
+        p[0, 0], p[0, 1], p[1, 0], p[1, 1] = p00, p01, p01, p11
+
+        self.rounds[i] += 1
+        self.rms[i] = np.sqrt(0.9 * self.rms[i] ** 2 + 0.1 * e * e)
+        self.updated[i] = ts_recv
+
+    # ---- korrekció ----
+
+    def synced_mask(self, now: Optional[float] = None) -> np.ndarray:
+        if now is None:
+            now = time.time()
+        cfg = self._cfg
+        ok = (self.rounds >= cfg.get("min_rounds", 5)) & (now - self.updated <= cfg.get("stale_sec", 30.0))
+        if 0 <= self.master < len(ok):
+            ok[self.master] = True
+        return ok
+
+    def corrections(self, rows, ts_raw: np.ndarray, now: Optional[float] = None
+                    ) -> Optional[np.ndarray]:
+        """
+        A ts_raw (az anchor_index sorokhoz, now a fogadás ideje) master
+        időalapra hozásához levonandó tick értékek; None, ha egyik anchornak
+        sincs érvényes modellje. Az eredmény az unwrapped offsetet is
+        tartalmazza, a különbségeket a hívó veszi modulo 2^40 (range_differences).
+        """
+        if now is None:
+            now = time.time()
+        with self._lock:
+            if self.master < 0 or not len(self.ids):
+                return None
+            rows = np.asarray(rows, dtype=np.intp)
+            ok = self.synced_mask(now)[rows]
+            ok &= rows != self.master
+            if not ok.any():
+                return None
+            # a blink ts_raw-ja az anchor unwrapped tartományában (_unwrap,
+            # az állapot módosítása nélkül); a modell nélküli sorok 0-t kapnak
+            r = rows[ok]
+            last = self.tick[r]
+            d = np.remainder(ts_raw[ok] - last, TS_WRAP)
+            expected = (now - self.tick_recv[r]) / self._cfg["scale"]
+            u = last + d + np.rint((expected - d) / TS_WRAP).astype(np.int64) * TS_WRAP
+            x = (u - self.t0[r]).astype(np.float64) * self._cfg["scale"]
+            th = self.theta[r]
+            corr = np.zeros(len(rows))
+            corr[ok] = th[:, 0] + th[:, 1] * x
+            return corr
+
+    def as_dict(self, now: Optional[float] = None) -> Dict[str, Any]:
+        if now is None:
+            now = time.time()
+        with self._lock:
+            cfg = self._cfg
+            synced = self.synced_mask(now) if len(self.ids) else np.zeros(0, dtype=bool)
+            m_per_tick = 1.0 / cfg["ticks_per_m"] if cfg else 0.0
+            anchors = []
+            for i, aid in enumerate(self.ids):
+                anchors.append({
+                    "id": aid,
+                    "master": i == self.master,
+                    "synced": bool(synced[i]),
+                    "offset_ticks": float(self.theta[i, 0]),
+                    "skew_ppm": float(self.theta[i, 1] * cfg.get("scale", 1.0) * 1e6),
+                    "offset_sigma_m": float(np.sqrt(max(self.P[i, 0, 0], 0.0)) * m_per_tick),
+                    "residual_rms_m": float(self.rms[i] * m_per_tick),
+                    "rounds": int(self.rounds[i]),
+                    "outliers": int(self.outliers[i]),
+                    "age_sec": (float(now - self.updated[i])
+                                if np.isfinite(self.updated[i]) else None),
+                })
+            return {
+                "master": self.ids[self.master] if 0 <= self.master < len(self.ids) else None,
+                "observations": self.observations,
+                "pending_rounds": len(self._pending),
+                "unpaired_dropped": self.unpaired_dropped,
+                "anchors": anchors,
+            }
+
+
+_cache_lock = threading.Lock()
+_cache: Dict[int, ClockTable] = {}
+
+
+def get_clock_table(cfg_mgr) -> ClockTable:
+    """A ConfigManager-hez tartozó (folyamatonként egy) élő ClockTable."""
+    key = id(cfg_mgr)
+    table = _cache.get(key)
+    if table is None:
+        with _cache_lock:
+            table = _cache.setdefault(key, ClockTable())
+    return table
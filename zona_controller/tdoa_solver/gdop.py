@@ -0,0 +1,433 @@
+# zona_controller/tdoa_solver/gdop.py
+
+import hashlib
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..uwb_parser import canonical_hex_id
+from .geometry import AnchorGeometry, get_anchor_geometry
+
+SubsetKey = Tuple[int, ...]
+
+
+def gdop_from_sums(sxx, sxy, syy, sx, sy, n) -> np.ndarray:
+    """
+    Vízszintes TDoA GDOP az anchor irányvektorok összegeiből.
+
+    Egyforma szórású érkezési időknél a TDoA Fisher információ a
+    (referenciától független) centrált szórásmátrix:
+        G = Σ (u_i - ū)(u_i - ū)^T = Σ u_i u_i^T - (Σ u_i)(Σ u_i)^T / n
+    GDOP = sqrt(trace(G^-1)); a 2x2 inverz zárt alakban.
+    """
+    a = sxx - sx * sx / n
+    b = sxy - sx * sy / n
+    d = syy - sy * sy / n
+    det = a * d - b * b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        g = np.sqrt((a + d) / det)
+    g[~(det > 1e-12)] = np.inf
+    return g
+
+
+def _unit_terms(anchors: np.ndarray, x: np.ndarray, y: np.ndarray, z: float):
+    """Anchoronkénti u_x, u_y irányvektor komponensek a (x, y, z) pontokban."""
+    dx = x[..., None] - anchors[:, 0]
+    dy = y[..., None] - anchors[:, 1]
+    dz = z - anchors[:, 2]
+    inv = 1.0 / np.maximum(np.sqrt(dx * dx + dy * dy + dz * dz), 1e-9)
+    return dx * inv, dy * inv
+
+
+def subset_gdop(u: np.ndarray) -> float:
+    """GDOP (m, 2) irányvektorokból (egy cella / pont, tetszőleges részhalmaz)."""
+    m = u.shape[0]
+    if m < 3:
+        return float("inf")
+    sx, sy = u.sum(axis=0).tolist()
+    (gxx, gxy), (_gyx, gyy) = (u.T @ u).tolist()
+    a = gxx - sx * sx / m
+    b = gxy - sx * sy / m
+    d = gyy - sy * sy / m
+    det = a * d - b * b
+    if not det > 1e-12:
+        return float("inf")
+    return math.sqrt((a + d) / det)
+
+
+def point_gdop(anchors: np.ndarray, x: float, y: float, z: float) -> float:
+    """Egy pont GDOP-ja tetszőleges anchor részhalmazra (a rácson kívüli eset)."""
+    if anchors.shape[0] < 3:
+        return float("inf")
+    ux, uy = _unit_terms(anchors, np.array(x), np.array(y), z)
+    return subset_gdop(np.column_stack((ux, uy)))
+
+
+def polygon_mask(xs: np.ndarray, ys: np.ndarray, vertices: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """(ny, nx) maszk: a cella középpont a zóna polygonon belül van (even-odd szabály)."""
+    X, Y = np.meshgrid(xs, ys)
+    if len(vertices) < 3:
+        return np.ones(X.shape, dtype=bool)
+    px = np.array([float(v.get("x", 0.0)) for v in vertices])
+    py = np.array([float(v.get("y", 0.0)) for v in vertices])
+    inside = np.zeros(X.shape, dtype=bool)
+    j = len(px) - 1
+    for i in range(len(px)):
+        xi, yi, xj, yj = px[i], py[i], px[j], py[j]
+        if yi != yj:
+            crosses = (yi > Y) != (yj > Y)
+            x_at = (xj - xi) * (Y - yi) / (yj - yi) + xi
+            inside ^= crosses & (X < x_at)
+        j = i
+    return inside
+
+
+class GdopGrid:
+    """
+    Előre számolt GDOP raszter a tdoa.map területére.
+
+    - layers: a teljes engedélyezett halmaz float32 (ny, nx) rétege; a
+      leave-one-out rétegek (leave_one_out mellett) a layer_for() első
+      kérésekor számolódnak és megmaradnak
+    - dirs:   (ny, nx, n, 2) float16 – a teljes halmaz anchorjainak vízszintes
+      irányvektor komponensei cellánként (columns: AnchorGeometry index →
+      oszlop, -1: nincs a halmazban)
+
+    Egy fix geometriai minősége így a teljes halmazra egy rács olvasás, bármely
+    más részhalmazra (pl. a robust lépés után megmaradt anchorok) egy cella
+    gather és egy zárt alakú 2x2 (subset_gdop); pontonkénti számolás csak a
+    rácson kívüli fixnél van. Építéskor anchoronként haladunk és az összegeket
+    halmozzuk, így nincs (ny, nx, n) méretű float64 átmeneti tömb.
+    """
+
+    __slots__ = ("generation", "ids", "keys", "anchors", "x0", "y0", "resolution", "nx", "ny",
+                 "z", "mask", "layers", "dirs", "columns", "full_key", "leave_one_out",
+                 "max_gdop", "source", "build_ms")
+
+    def __init__(self, geometry: AnchorGeometry, map_cfg: Dict[str, Any], gdop_cfg: Dict[str, Any],
+                 arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None):
+        origin = map_cfg.get("origin") or {}
+        width = max(float(map_cfg.get("width_m") or 10.0), 1e-3)
+        height = max(float(map_cfg.get("height_m") or 10.0), 1e-3)
+        res = max(float(gdop_cfg.get("resolution_m", 0.25)), 1e-3)
+        max_cells = max(1, int(gdop_cfg.get("max_cells", 250_000)))
+        # túl nagy térképnél a felbontást durvítjuk, nem a területet vágjuk
+        res = max(res, float(np.sqrt(width * height / max_cells)))
+
+        self.generation = geometry.generation
+        self.ids = geometry.ids
+        self.keys = tuple(canonical_hex_id(aid) for aid in geometry.ids)
+        self.anchors = geometry.positions
+        self.x0 = float(origin.get("x", 0.0))
+        self.y0 = float(origin.get("y", 0.0))
+        self.resolution = res
+        self.nx = max(1, int(np.ceil(width / res)))
+        self.ny = max(1, int(np.ceil(height / res)))
+        self.z = float(gdop_cfg.get("z_m", 0.0))
+        self.max_gdop = float(gdop_cfg.get("max_gdop", 0.0))
+        self.leave_one_out = bool(gdop_cfg.get("leave_one_out", True))
+        self.mask = polygon_mask(self.xs, self.ys, (map_cfg.get("shape") or {}).get("vertices") or [])
+        self.full_key: SubsetKey = tuple(int(i) for i in np.flatnonzero(geometry.enabled))
+        self.columns = np.full(len(self.ids), -1, dtype=np.intp)
+        self.columns[list(self.full_key)] = np.arange(len(self.full_key))
+        self.source = "disk" if arrays is not None else "computed"
+        t0 = time.perf_counter()
+        full, self.dirs = arrays if arrays is not None else self._compute()
+        self.layers: Dict[SubsetKey, np.ndarray] = {self.full_key: full} if full is not None else {}
+        for arr in (full, self.dirs):
+            if arr is not None:
+                arr.setflags(write=False)
+        self.build_ms = (time.perf_counter() - t0) * 1000.0
+
+    @property
+    def xs(self) -> np.ndarray:
+        return self.x0 + (np.arange(self.nx) + 0.5) * self.resolution
+
+    @property
+    def ys(self) -> np.ndarray:
+        return self.y0 + (np.arange(self.ny) + 0.5) * self.resolution
+
+    def _compute(self) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        full = self.full_key
+        n = len(full)
+        dirs = np.zeros((self.ny, self.nx, n, 2), dtype=np.float16)
+        if n < 3:
+            return None, dirs
+        X, Y = np.meshgrid(self.xs, self.ys)
+        sxx, sxy, syy, sx, sy = (np.zeros(X.shape) for _ in range(5))
+        for k, (ax, ay, az) in enumerate(self.anchors[list(full)]):
+            ux = X - ax
+            uy = Y - ay
+            inv = 1.0 / np.maximum(np.sqrt(ux * ux + uy * uy + (self.z - az) ** 2), 1e-9)
+            ux *= inv
+            uy *= inv
+            sxx += ux * ux
+            sxy += ux * uy
+            syy += uy * uy
+            sx += ux
+            sy += uy
+            dirs[:, :, k, 0] = ux
+            dirs[:, :, k, 1] = uy
+        return gdop_from_sums(sxx, sxy, syy, sx, sy, n).astype(np.float32), dirs
+
+    def cell(self, x: float, y: float) -> Optional[Tuple[int, int]]:
+        i = int((x - self.x0) // self.resolution)
+        j = int((y - self.y0) // self.resolution)
+        if 0 <= i < self.nx and 0 <= j < self.ny:
+            return j, i
+        return None
+
+    def covers(self, anchor_index: Sequence[int], anchor_ids: Sequence[str]) -> bool:
+        """
+        Az anchor_index (AnchorGeometry indexek) ennek a rácsnak a geometriájában
+        is ugyanazokat az anchorokat jelöli-e (anchor_ids). Anchor lista
+        változás után, a háttér újraépítés alatt a régi rács indexei mást
+        jelenthetnek – ilyenkor a rácsot nem szabad használni.
+        """
+        keys = self.keys
+        n = len(keys)
+        for i, aid in zip(anchor_index, anchor_ids):
+            if not 0 <= i < n:
+                return False
+            if keys[i] != aid and keys[i] != canonical_hex_id(aid):
+                return False
+        return True
+
+    def lookup(self, x: float, y: float, anchor_index: Sequence[int]) -> Optional[float]:
+        """A (x, y) fix GDOP-ja az anchor_index részhalmazzal; None, ha egy index ismeretlen."""
+        index = np.asarray(anchor_index, dtype=np.intp)
+        if not index.size or index.min() < 0 or index.max() >= len(self.ids):
+            return None
+        cell = self.cell(x, y)
+        if cell is not None:
+            if len(anchor_index) == len(self.full_key):
+                layer = self.layers.get(tuple(sorted(anchor_index)))
+                if layer is not None:
+                    return float(layer[cell])
+            cols = self.columns[index]
+            if cols.min() >= 0:
+                return subset_gdop(self.dirs[cell][cols].astype(np.float64))
+        return point_gdop(self.anchors[index], x, y, self.z)
+
+    def layer_for(self, exclude: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        A teljes halmaz rétege, vagy exclude megadásakor (leave_one_out) az
+        adott anchor nélküli réteg – első kéréskor a dirs-ből számolva.
+        """
+        full = self.full_key
+        if exclude is None or exclude not in full:
+            return self.layers.get(full) if exclude is None else None
+        key = tuple(i for i in full if i != exclude)
+        layer = self.layers.get(key)
+        if layer is not None or not self.leave_one_out or len(key) < 3:
+            return layer
+        sums = [np.zeros((self.ny, self.nx)) for _ in range(5)]
+        for k in self.columns[list(key)]:
+            ux = self.dirs[:, :, k, 0].astype(np.float64)
+            uy = self.dirs[:, :, k, 1].astype(np.float64)
+            for acc, term in zip(sums, (ux * ux, ux * uy, uy * uy, ux, uy)):
+                acc += term
+        layer = gdop_from_sums(*sums, len(key)).astype(np.float32)
+        layer.setflags(write=False)
+        self.layers[key] = layer
+        return layer
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "nx": self.nx,
+            "ny": self.ny,
+            "resolution_m": self.resolution,
+            "anchors": len(self.full_key),
+            "layers": len(self.layers),
+            "bytes": int(self.dirs.nbytes + sum(a.nbytes for a in self.layers.values())),
+            "max_gdop": self.max_gdop,
+            "source": self.source,
+            "build_ms": self.build_ms,
+        }
+
+
+def _content_key(geometry: AnchorGeometry, map_cfg: Dict[str, Any], gdop_cfg: Dict[str, Any]) -> str:
+    """
+    A rács tartalmát meghatározó bemenetek hash-e: anchor azonosítók és
+    pozíciók, engedélyezett maszk, térkép és rács paraméterek (a max_gdop
+    és a cache_dir nem része – azok nem változtatják a rácsot).
+    """
+    h = hashlib.sha1()
+    h.update(repr(geometry.ids).encode("utf-8"))
+    h.update(np.ascontiguousarray(geometry.positions).tobytes())
+    h.update(np.ascontiguousarray(geometry.enabled).tobytes())
+    shape = (map_cfg.get("shape") or {}).get("vertices") or []
+    h.update(repr((
+        map_cfg.get("width_m"), map_cfg.get("height_m"), map_cfg.get("origin"),
+        [(v.get("x"), v.get("y")) for v in shape],
+        gdop_cfg.get("resolution_m"), gdop_cfg.get("max_cells"), gdop_cfg.get("z_m"),
+        gdop_cfg.get("leave_one_out"),
+    )).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _cache_file(content_key: str, gdop_cfg: Dict[str, Any]) -> Optional[Path]:
+    cache_dir = gdop_cfg.get("cache_dir") or ""
+    if not cache_dir:
+        return None
+    return Path(cache_dir) / f"gdop_{content_key}.npz"
+
+
+def _load_arrays(path: Path, n_full: int) -> Optional[Tuple[Optional[np.ndarray], np.ndarray]]:
+    try:
+        with np.load(path) as data:
+            dirs = np.array(data["dirs"], dtype=np.float16)
+            full = np.array(data["full"], dtype=np.float32) if "full" in data.files else None
+    except (OSError, KeyError, ValueError):
+        return None
+    if dirs.ndim != 4 or dirs.shape[2:] != (n_full, 2):
+        return None
+    return full, dirs
+
+
+def _save_arrays(path: Path, grid: GdopGrid):
+    arrays = {"dirs": grid.dirs}
+    full = grid.layers.get(grid.full_key)
+    if full is not None:
+        arrays["full"] = full
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez_compressed(tmp, **arrays)
+        tmp.replace(path)
+    except OSError as e:
+        print(f"[TDOA] GDOP cache write failed ({path}): {e}")
+
+
+def build_gdop_grid(geometry: AnchorGeometry, map_cfg: Dict[str, Any],
+                    gdop_cfg: Dict[str, Any]) -> GdopGrid:
+    """GDOP rács építése; cache_dir mellett előbb a lemezről próbáljuk betölteni."""
+    path = _cache_file(_content_key(geometry, map_cfg, gdop_cfg), gdop_cfg)
+    if path is not None and path.exists():
+        arrays = _load_arrays(path, geometry.enabled_count)
+        if arrays is not None:
+            grid = GdopGrid(geometry, map_cfg, gdop_cfg, arrays)
+            if grid.dirs.shape[:2] == (grid.ny, grid.nx):
+                return grid
+    grid = GdopGrid(geometry, map_cfg, gdop_cfg)
+    if path is not None:
+        _save_arrays(path, grid)
+    return grid
+
+
+class GdopGridCache:
+    """
+    Egy ConfigManager élő GDOP rácsa.
+
+    A kulcs a rács bemeneteinek tartalom hash-e (_content_key), nem a config
+    generáció: más config rész módosítása nem épít újra. Változáskor a rács
+    háttér szálon épül, addig a régi marad kiszolgálva (az első építés
+    alatt grid None). A solve útvonal csak a grid attribútumot olvassa
+    (lock nélkül); a generation mezőt a hívó (gdop_grid_for) kapuként
+    használja, hogy a paramétereket csak config váltáskor olvassa újra.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.grid: Optional[GdopGrid] = None
+        self.key: Optional[str] = None
+        self.max_gdop = 0.0
+        self.generation: Optional[Tuple[int, int]] = None
+        self.enabled = True
+        self.builds = 0
+        self.failures = 0
+        self._wanted: Optional[Tuple[str, Tuple[Any, ...]]] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def update(self, geometry: AnchorGeometry, map_cfg: Dict[str, Any], gdop_cfg: Dict[str, Any]):
+        """A kívánt rács beállítása; eltérő tartalomnál háttér újraépítés indul."""
+        key = _content_key(geometry, map_cfg, gdop_cfg)
+        with self._lock:
+            self.max_gdop = float(gdop_cfg.get("max_gdop", 0.0))
+            grid = self.grid
+            if grid is not None:
+                grid.max_gdop = self.max_gdop
+            if key == self.key and self._wanted is None:
+                return
+            if self._wanted is not None and self._wanted[0] == key:
+                return
+            self._wanted = (key, (geometry, map_cfg, dict(gdop_cfg)))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="gdop-build", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                wanted = self._wanted
+                if wanted is None or wanted[0] == self.key:
+                    self._wanted = None
+                    self._thread = None
+                    return
+            key, args = wanted
+            try:
+                grid = build_gdop_grid(*args)
+            except Exception as e:
+                print(f"[TDOA] GDOP grid build failed: {e}")
+                grid = None
+            with self._lock:
+                if grid is not None:
+                    grid.max_gdop = self.max_gdop
+                    self.grid = grid
+                    self.builds += 1
+                else:
+                    self.failures += 1
+                # hiba esetén a régi rács marad; a kulcsot átvesszük, hogy
+                # ugyanarra a bemenetre ne próbálkozzunk újra
+                self.key = key
+                if self._wanted is not None and self._wanted[0] == key:
+                    self._wanted = None
+
+    @property
+    def building(self) -> bool:
+        return self._thread is not None
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[GdopGrid]:
+        """Folyamatban lévő építés bevárása (diagnosztika / API), majd a rács."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.grid
+
+    def stats(self) -> Dict[str, Any]:
+        grid = self.grid
+        stats = grid.stats() if grid is not None else {}
+        stats.update({"building": self.building, "builds": self.builds, "failures": self.failures})
+        return stats
+
+
+_cache_lock = threading.Lock()
+_cache: Dict[int, GdopGridCache] = {}
+
+
+def get_gdop_cache(cfg_mgr) -> GdopGridCache:
+    """A ConfigManager-hez tartozó (folyamatonként egy) GdopGridCache."""
+    key = id(cfg_mgr)
+    cache = _cache.get(key)
+    if cache is None:
+        with _cache_lock:
+            cache = _cache.setdefault(key, GdopGridCache())
+    return cache
+
+
+def get_gdop_grid(cfg_mgr, gdop_cfg: Dict[str, Any], wait: bool = False) -> Optional[GdopGrid]:
+    """
+    A config aktuális anchor geometriájához, térképéhez és a gdop
+    paraméterekhez tartozó GdopGrid. Változáskor az újraépítés a háttérben
+    fut, addig az előző rácsot adja (wait=True: bevárja az építést).
+    Nem a solve útvonalra való: a tdoa.map szekciót minden hívás olvassa.
+    """
+    cache = get_gdop_cache(cfg_mgr)
+    _generation, map_cfg = cfg_mgr.get_section_with_generation("tdoa.map", {})
+    cache.update(get_anchor_geometry(cfg_mgr), map_cfg or {}, gdop_cfg)
+    return cache.wait() if wait else cache.grid
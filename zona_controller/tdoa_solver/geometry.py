@@ -0,0 +1,129 @@
+# zona_controller/tdoa_solver/geometry.py
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..uwb_parser import canonical_hex_id
+
+AnchorKey = Union[str, int]
+
+
+class AnchorGeometry:
+    """
+    A tdoa.anchors lista változatlan, előre számolt alakja.
+
+    - ids:       konfigurált anchor azonosítók (sorrend = tömb index)
+    - index:     azonosító → index; a hex azonosítók a normalizált
+                 "0x%08X" alakkal (canonical_hex_id), a "0x" előtagúak
+                 egészként is szerepelnek
+    - positions: (N, 3) float64 pozíciók
+    - baselines: (N, N) páronkénti anchor távolságok
+    - enabled:   (N,) maszk (enabled = false anchorok nem kerülnek a solverbe)
+
+    A tömbök írásvédettek; a példányt a config generációja szerint
+    cache-eljük (get_anchor_geometry), így csak az anchors rész
+    változásakor épül újra.
+    """
+
+    __slots__ = ("generation", "ids", "index", "positions", "baselines", "enabled",
+                 "names")
+
+    def __init__(self, generation: int, anchors_cfg: Sequence[Dict[str, Any]]):
+        ids: List[str] = []
+        names: List[Optional[str]] = []
+        rows: List[Tuple[float, float, float]] = []
+        enabled: List[bool] = []
+        for a in anchors_cfg:
+            aid = str(a.get("id") or "").strip()
+            pos = a.get("position") or {}
+            if not aid or not {"x", "y", "z"} <= set(pos.keys()):
+                continue
+            ids.append(aid)
+            names.append(a.get("name"))
+            rows.append((float(pos["x"]), float(pos["y"]), float(pos["z"])))
+            enabled.append(bool(a.get("enabled", True)))
+
+        index: Dict[AnchorKey, int] = {}
+        for i, aid in enumerate(ids):
+            index[aid] = i
+            key = canonical_hex_id(aid)
+            index.setdefault(key, i)
+            # egész alias csak a "0x" előtagú azonosítóknak: a "A1"-szerű
+            # nevekből lett 161 egy valódi TAG azonosítóval ütközne (sync
+            # beacon felismerés: uwb.tag_id in index)
+            if key.startswith("0x"):
+                index.setdefault(int(key, 16), i)
+
+        positions = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        diff = positions[:, None, :] - positions[None, :, :]
+        baselines = np.sqrt(np.einsum("ijk,ijk->ij", diff, diff))
+        enabled_mask = np.array(enabled, dtype=bool)
+        for arr in (positions, baselines, enabled_mask):
+            arr.setflags(write=False)
+
+        self.generation = generation
+        self.ids: Tuple[str, ...] = tuple(ids)
+        self.names: Tuple[Optional[str], ...] = tuple(names)
+        self.index = index
+        self.positions = positions
+        self.baselines = baselines
+        self.enabled = enabled_mask
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def enabled_count(self) -> int:
+        return int(self.enabled.sum())
+
+    def index_of(self, anchor: AnchorKey) -> Optional[int]:
+        """
+        Az anchor indexe (engedélyezettségtől függetlenül), vagy None; a
+        nem normalizált alakú hex azonosítót ("0x0400abcd") is megtalálja.
+        """
+        i = self.index.get(anchor)
+        if i is None and isinstance(anchor, str):
+            i = self.index.get(canonical_hex_id(anchor))
+        return i
+
+    def lookup(self, anchor: AnchorKey) -> Optional[int]:
+        """Az anchor indexe, ha konfigurált és engedélyezett; különben None."""
+        i = self.index_of(anchor)
+        if i is None or not self.enabled[i]:
+            return None
+        return i
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "ids": list(self.ids),
+            "names": list(self.names),
+            "positions": self.positions.tolist(),
+            "enabled": self.enabled.tolist(),
+            "baselines_m": self.baselines.tolist(),
+        }
+
+
+_cache_lock = threading.Lock()
+_cache: Dict[int, AnchorGeometry] = {}
+
+
+def get_anchor_geometry(cfg_mgr) -> AnchorGeometry:
+    """
+    A ConfigManager aktuális generációjához tartozó AnchorGeometry.
+    Csak generáció váltáskor olvassuk a tdoa.anchors részt (nem a teljes fát).
+    """
+    generation = cfg_mgr.generation
+    key = id(cfg_mgr)
+    geom = _cache.get(key)
+    if geom is not None and geom.generation == generation:
+        return geom
+    with _cache_lock:
+        geom = _cache.get(key)
+        if geom is None or geom.generation != generation:
+            generation, anchors_cfg = cfg_mgr.get_section_with_generation("tdoa.anchors", [])
+            geom = AnchorGeometry(generation, anchors_cfg or [])
+            _cache[key] = geom
+        return geom
@@ -0,0 +1,196 @@
+# zona_controller/tdoa_solver/robust.py
+
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .solver import SolverOutput, solve_tdoa_position
+
+
+class RobustOutcome(NamedTuple):
+    """A robusztus lépés eredménye az eredeti anchor tömbök indexeivel."""
+    keep: np.ndarray         # (N,) bool – a megtartott anchorok
+    ref: int                 # új referencia (eredeti index)
+    range_diff: np.ndarray   # (N,) az új referenciához viszonyítva
+    out: SolverOutput        # a megtartott anchorokra (anchors[keep] sorrend)
+    rejected: List[int]      # eldobott anchorok (eredeti index, eldobás sorrendben)
+    subsets: int             # kiértékelt részhalmazok száma
+    elapsed_us: float
+    rms_before_m: float
+    budget_exhausted: bool
+
+
+def _score(cost: float, rows: int, dims: int) -> float:
+    """Szabadságfokkal normált RMS: a kevesebb anchoros részhalmaz ne nyerjen ingyen."""
+    dof = rows - dims
+    return float(np.sqrt(cost / dof)) if dof > 0 else float("inf")
+
+
+def _linearize(anchors: np.ndarray, range_diff: np.ndarray, ref: int, p: np.ndarray,
+               rows: np.ndarray, dims: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Maradékok és Jacobi a p pontban a rows (nem referencia) sorokra."""
+    diff = p - anchors[rows]
+    dist = np.maximum(np.sqrt(np.einsum("ij,ij->i", diff, diff)), 1e-9)
+    diff_ref = p - anchors[ref]
+    dist_ref = max(float(np.sqrt(diff_ref @ diff_ref)), 1e-9)
+    r = dist - dist_ref - range_diff[rows]
+    J = (diff / dist[:, None] - diff_ref / dist_ref)[:, :dims]
+    return r, J
+
+
+def leave_one_out_scores(J: np.ndarray, r: np.ndarray, dims: int
+                         ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Minden sor elhagyásának becsült hatása egyetlen faktorizációból.
+
+    A teljes normálmátrix inverzét (A = J^T J) egyszer számoljuk; az i. sor
+    elhagyása Sherman-Morrison rang-1 frissítés:
+        (A - j j^T)^-1 = A^-1 + (A^-1 j)(j^T A^-1) / (1 - h),  h = j^T A^-1 j
+    Ebből a részhalmaz Gauss-Newton lépése és linearizált maradéka minden
+    sorra egyszerre (M x M mátrixművelet) adódik, újra-linearizálás nélkül.
+
+    Visszatér: (pontszám (M,), lépés (M, dims)); az el nem hagyható
+    (teljes leverage-ű) soroknál a pontszám végtelen.
+    """
+    M = r.shape[0]
+    A = J.T @ J + 1e-12 * np.eye(dims)
+    Ainv = np.linalg.inv(A)
+    g = J.T @ r
+    W = Ainv @ J.T                                   # (d, M): A^-1 j_i
+    h = np.einsum("ij,ji->i", J, W)                  # leverage
+    G = g[:, None] - J.T * r                         # (d, M): g_i = g - j_i r_i
+    V = Ainv @ G
+    s = np.einsum("ji,ji->i", J.T, V)
+    denom = 1.0 - h
+    ok = denom > 1e-9
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = -(V + W * (s / np.where(ok, denom, 1.0)))   # (d, M)
+    R = r[:, None] + J @ delta                       # (M, M): előrejelzett maradékok
+    cost = np.einsum("ij,ij->j", R, R) - np.diagonal(R) ** 2
+    dof = M - 1 - dims
+    scores = np.sqrt(np.maximum(cost, 0.0) / dof) if dof > 0 else np.full(M, np.inf)
+    scores[~ok] = np.inf
+    return scores, delta.T
+
+
+def robust_subset_solve(
+    anchors: np.ndarray,
+    range_diff: np.ndarray,
+    ref: int,
+    out: SolverOutput,
+    solver_cfg: Dict[str, Any],
+) -> Optional[RobustOutcome]:
+    """
+    Korlátos költségű NLOS / outlier anchor kiszűrés.
+
+    Akkor fut, ha a teljes halmaz megoldása nem konvergált, vagy az RMS
+    maradéka nagyobb, mint solver.robust_trigger_rms_m. Mohó leave-one-out
+    körök: egy körben az összes (sor elhagyás + a referencia cseréje)
+    részhalmaz becsült maradéka egy faktorizációból jön
+    (leave_one_out_scores), és csak a legjobb jelöltre fut valódi, melegen
+    indított iteratív megoldás. Legfeljebb anchor_outlier_reject_pct * N
+    anchort dobunk el, és legalább max(min_good_anchors, dims + 2) marad.
+
+    A költségkeret (robust_max_subsets, robust_max_us) a kiértékelt
+    részhalmazokra és a teljes eltelt időre vonatkozik.
+    None, ha nem kellett / nem sikerült javítani.
+    """
+    if not solver_cfg.get("robust_enabled", True):
+        return None
+    trigger = float(solver_cfg.get("robust_trigger_rms_m", 0.3))
+    if out.converged and out.rms_residual_m <= trigger:
+        return None
+
+    t0 = time.perf_counter()
+    n = anchors.shape[0]
+    dims = out.dims
+    min_keep = max(int(solver_cfg.get("min_good_anchors", 3)), dims + 2)
+    max_reject = int(float(solver_cfg.get("anchor_outlier_reject_pct", 0.2)) * n + 1e-9)
+    max_reject = min(max_reject, n - min_keep)
+    if max_reject <= 0:
+        return None
+    max_subsets = int(solver_cfg.get("robust_max_subsets", 32))
+    max_sec = float(solver_cfg.get("robust_max_us", 2000.0)) * 1e-6
+    max_iterations = int(solver_cfg.get("max_iterations", 20))
+    stop_threshold = float(solver_cfg.get("stop_threshold", 1e-4))
+    use_lm = bool(solver_cfg.get("use_lm_solver", True))
+
+    keep = np.ones(n, dtype=bool)
+    cur_ref, cur_rd, cur_out = ref, np.asarray(range_diff, dtype=np.float64), out
+    best_score = _score(float(out.residuals @ out.residuals), n - 1, dims)
+    rejected: List[int] = []
+    subsets = 0
+    exhausted = False
+
+    while len(rejected) < max_reject:
+        if subsets >= max_subsets or time.perf_counter() - t0 >= max_sec:
+            exhausted = True
+            break
+        idx = np.flatnonzero(keep)
+        rows = idx[idx != cur_ref]
+        r, J = _linearize(anchors, cur_rd, cur_ref, cur_out.position, rows, dims)
+
+        # jelöltek: sor elhagyások (a legnagyobb maradékúak elöl, ha a keret
+        # nem enged mindent) + a referencia anchor elhagyása
+        budget = max_subsets - subsets
+        scores, steps = leave_one_out_scores(J, r, dims)
+        order = np.argsort(-np.abs(r))[:max(1, budget - 1)]
+        subsets += len(order)
+        cand = [(float(scores[i]), int(rows[i]), steps[i]) for i in order]
+
+        if budget > len(order):
+            # referencia csere: a legkonzisztensebb (legkisebb |r|) sor lesz
+            # az új referencia, a különbségek átírhatók lineárisan
+            k = int(np.argmin(np.abs(r)))
+            others = np.arange(len(rows)) != k
+            Jk = J[others] - J[k]
+            rk = r[others] - r[k]
+            try:
+                step = np.linalg.solve(Jk.T @ Jk + 1e-12 * np.eye(dims), -(Jk.T @ rk))
+                res = rk + Jk @ step
+                cand.append((_score(float(res @ res), len(rk), dims), int(cur_ref), step))
+            except np.linalg.LinAlgError:
+                pass
+            subsets += 1
+
+        score, drop, step = min(cand, key=lambda c: c[0])
+        if not score < best_score:
+            break
+
+        new_keep = keep.copy()
+        new_keep[drop] = False
+        new_ref = cur_ref
+        new_rd = cur_rd
+        if drop == cur_ref:
+            kept = np.flatnonzero(new_keep)
+            new_ref = int(kept[np.argmin(cur_rd[kept])])   # "closest" a maradékból
+            new_rd = cur_rd - cur_rd[new_ref]
+        x0 = cur_out.position.copy()
+        x0[:dims] += step
+        sub_idx = np.flatnonzero(new_keep)
+        sub_ref = int(np.flatnonzero(sub_idx == new_ref)[0])
+        sub_out = solve_tdoa_position(anchors[sub_idx], new_rd[sub_idx], sub_ref, x0,
+                                      max_iterations, stop_threshold, use_lm, dims)
+        sub_score = _score(float(sub_out.residuals @ sub_out.residuals), len(sub_idx) - 1, dims)
+        if not (sub_out.converged and sub_score < best_score):
+            break
+
+        keep, cur_ref, cur_rd, cur_out, best_score = new_keep, new_ref, new_rd, sub_out, sub_score
+        rejected.append(drop)
+        if cur_out.rms_residual_m <= trigger:
+            break
+
+    if not rejected:
+        return None
+    return RobustOutcome(
+        keep=keep,
+        ref=cur_ref,
+        range_diff=cur_rd,
+        out=cur_out,
+        rejected=rejected,
+        subsets=subsets,
+        elapsed_us=(time.perf_counter() - t0) * 1e6,
+        rms_before_m=out.rms_residual_m,
+        budget_exhausted=exhausted,
+    )
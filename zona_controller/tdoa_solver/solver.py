@@ -0,0 +1,247 @@
+# zona_controller/tdoa_solver/solver.py
+
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# a DW1000 / DW3000 időbélyeg 40 bites számláló (15.65 ps tickkel ~17.2 s-onként
+# átfordul); két időbélyeg különbsége modulo 2^40 a (-2^39, 2^39] tartományba kerül
+TS_WRAP = 1 << 40
+TS_HALF_WRAP = 1 << 39
+
+
+def wrap_ticks(dt: np.ndarray) -> np.ndarray:
+    """Tick különbség(ek) (int64) modulo 2^40, a (-2^39, 2^39] tartományba."""
+    dt = np.remainder(dt, TS_WRAP)
+    return np.where(dt > TS_HALF_WRAP, dt - TS_WRAP, dt)
+
+
+def tick_differences(ts_raw: np.ndarray, ref: int,
+                     corrections: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    (Óra korrigált) érkezési idő különbségek tickben a ref sorhoz, modulo
+    2^40. A korrekció (ClockTable.corrections, unwrapped offsettel) egész
+    részét a wrap előtt, a tört részét utána vonjuk le, így a különbség
+    egészként pontos marad.
+    """
+    dt = ts_raw - ts_raw[ref]
+    if corrections is None:
+        return wrap_ticks(dt).astype(np.float64)
+    corr = corrections - corrections[ref]
+    whole = np.rint(corr)
+    return wrap_ticks(dt - whole.astype(np.int64)).astype(np.float64) - (corr - whole)
+
+
+class SolverOutput(NamedTuple):
+    """Egy iteratív TDoA megoldás eredménye (anchor tömbök sorrendjében)."""
+    position: np.ndarray     # (3,)
+    residuals: np.ndarray    # (N,) méterben, a referencia anchornál 0
+    iterations: int
+    converged: bool
+    rms_residual_m: float
+    dims: int                # 2: z rögzített, 3: teljes 3D megoldás
+
+
+def select_reference(anchor_ids: Sequence[str], ts_raw: np.ndarray, mode: str) -> int:
+    """
+    Referencia anchor index a solver.reference_anchor szerint:
+        "closest" – a legkorábban érkező mérés (a TAG-hez legközelebbi anchor)
+        "first"   – az első anchor a listában
+        <anchor id> – az adott anchor, ha hallotta a blinket (különben "closest")
+    """
+    if mode == "first":
+        return 0
+    if mode and mode != "closest":
+        try:
+            return list(anchor_ids).index(mode)
+        except ValueError:
+            pass
+    return int(np.argmin(ts_raw))
+
+
+def range_differences(ts_raw: np.ndarray, ref: int, ts_unit_scale: float,
+                      c_m_per_s: float, corrections: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Érkezési idő különbségek → távolság különbségek (méter) a referenciához.
+    Az int64 kivonás (és a 40 bites átfordulás kezelése, tick_differences) a
+    skálázás előtt történik, így a nagy nyers időbélyegeknél sem veszítünk
+    pontosságot, és a számláló átfordulásakor sem ugrik a különbség ~2^40
+    ticket. corrections: anchoronként
+    levonandó óra korrekció (tick, ClockTable.corrections).
+    """
+    return tick_differences(ts_raw, ref, corrections) * (ts_unit_scale * c_m_per_s)
+
+
+def solve_dims(anchors: np.ndarray) -> int:
+    """
+    3D megoldás csak akkor, ha van elég anchor és azok magassága érdemben
+    eltér; közel egy síkban lévő anchoroknál a z nem figyelhető meg.
+    """
+    if anchors.shape[0] >= 5 and float(np.ptp(anchors[:, 2])) >= 1.0:
+        return 3
+    return 2
+
+
+def closed_form_position(
+    anchors: np.ndarray,
+    range_diff_m: np.ndarray,
+    ref: int,
+    z_fixed: Optional[float] = None,
+) -> Optional[np.ndarray]:
+    """
+    Zárt alakú, linearizált TDoA becslés (Chan / Fang-féle legkisebb négyzetek).
+
+    A referencia anchort origónak véve b_i = a_i - a_ref, r_i = d_i - d_ref és
+    |p|^2 = d_ref^2, ebből anchoronként egy lineáris egyenlet adódik:
+        2 b_i·p + 2 r_i d_ref = |b_i|^2 - r_i^2
+    az ismeretlenek [p, d_ref]. z_fixed megadásakor a z ismert (2D mód), a
+    hozzá tartozó tag a jobb oldalra kerül.
+
+    Ismeretlenenként legalább egy egyenlet kell (2D: 4, 3D: 5 anchor);
+    kevesebb anchornál, vagy elfajuló geometriánál None.
+    """
+    anchors = np.asarray(anchors, dtype=np.float64)
+    n = anchors.shape[0]
+    mask = np.arange(n) != ref
+    a_ref = anchors[ref]
+    b = anchors[mask] - a_ref
+    r = np.asarray(range_diff_m, dtype=np.float64)[mask]
+
+    rhs = np.einsum("ij,ij->i", b, b) - r * r
+    if z_fixed is None:
+        cols = 3
+        A = np.column_stack((2.0 * b, 2.0 * r))
+    else:
+        cols = 2
+        pz = z_fixed - a_ref[2]
+        A = np.column_stack((2.0 * b[:, :2], 2.0 * r))
+        rhs = rhs - 2.0 * b[:, 2] * pz
+    if A.shape[0] < cols + 1:
+        return None
+
+    sol, _res, rank, _sv = np.linalg.lstsq(A, rhs, rcond=None)
+    if rank < cols + 1 or not np.all(np.isfinite(sol)):
+        return None
+
+    p = np.empty(3, dtype=np.float64)
+    p[:cols] = sol[:cols]
+    p[2] = sol[2] if z_fixed is None else pz
+    return p + a_ref
+
+
+def solve_tdoa_closed_form(
+    anchors: np.ndarray,
+    range_diff_m: np.ndarray,
+    ref: int,
+    z_fixed: float,
+    dims: Optional[int] = None,
+) -> Optional[SolverOutput]:
+    """
+    "fast" solver mód: csak a zárt alakú becslés, iteráció nélkül.
+    A maradékok ugyanúgy számolódnak, mint az iteratív solvernél.
+    """
+    anchors = np.asarray(anchors, dtype=np.float64)
+    if dims is None:
+        dims = solve_dims(anchors)
+    p = closed_form_position(anchors, range_diff_m, ref, None if dims == 3 else z_fixed)
+    if p is None:
+        return None
+    dist = np.linalg.norm(p - anchors, axis=1)
+    residuals = dist - dist[ref] - np.asarray(range_diff_m, dtype=np.float64)
+    residuals[ref] = 0.0
+    n_eq = max(1, anchors.shape[0] - 1)
+    rms = float(np.sqrt(float(residuals @ residuals) / n_eq))
+    return SolverOutput(p, residuals, 0, True, rms, dims)
+
+
+def solve_tdoa_position(
+    anchors: np.ndarray,
+    range_diff_m: np.ndarray,
+    ref: int,
+    x0: np.ndarray,
+    max_iterations: int = 20,
+    stop_threshold: float = 1e-4,
+    use_lm: bool = True,
+    dims: Optional[int] = None,
+) -> SolverOutput:
+    """
+    Iteratív TDoA multilateráció (Gauss-Newton vagy Levenberg-Marquardt).
+
+    anchors:      (N, 3) anchor pozíciók
+    range_diff_m: (N,) d_i - d_ref méterben (a referencia sorban 0)
+    x0:           (3,) kezdőpont; 2D módban a z végig ez marad
+
+    A maradék r_i = |p - a_i| - |p - a_ref| - range_diff_m[i], a Jacobi mátrix
+    és a normálegyenletek egy lépésben, vektorizáltan állnak elő. A megállási
+    feltétel a lépés normája (stop_threshold).
+    """
+    anchors = np.asarray(anchors, dtype=np.float64)
+    n = anchors.shape[0]
+    if dims is None:
+        dims = solve_dims(anchors)
+
+    mask = np.arange(n) != ref
+    others = anchors[mask]
+    dd = np.asarray(range_diff_m, dtype=np.float64)[mask]
+    a_ref = anchors[ref]
+
+    def evaluate(p: np.ndarray):
+        diff = p - others
+        dist = np.maximum(np.sqrt(np.einsum("ij,ij->i", diff, diff)), 1e-9)
+        diff_ref = p - a_ref
+        dist_ref = max(float(np.sqrt(diff_ref @ diff_ref)), 1e-9)
+        r = dist - dist_ref - dd
+        return r, diff, dist, diff_ref, dist_ref
+
+    p = np.array(x0, dtype=np.float64)
+    r, diff, dist, diff_ref, dist_ref = evaluate(p)
+    cost = float(r @ r)
+    lam = 1e-3
+    converged = False
+    iterations = 0
+
+    for iterations in range(1, max_iterations + 1):
+        J = (diff / dist[:, None] - diff_ref / dist_ref)[:, :dims]
+        JTJ = J.T @ J
+        g = J.T @ r
+
+        if use_lm:
+            # a csillapítás addig nő, amíg a lépés nem csökkenti a költséget
+            diag = np.diag(np.diag(JTJ)) + 1e-12 * np.eye(dims)
+            accepted = False
+            while lam < 1e10:
+                try:
+                    delta = np.linalg.solve(JTJ + lam * diag, -g)
+                except np.linalg.LinAlgError:
+                    lam *= 10.0
+                    continue
+                p_new = p.copy()
+                p_new[:dims] += delta
+                ev = evaluate(p_new)
+                new_cost = float(ev[0] @ ev[0])
+                if new_cost <= cost:
+                    p = p_new
+                    r, diff, dist, diff_ref, dist_ref = ev
+                    cost = new_cost
+                    lam = max(lam / 10.0, 1e-12)
+                    accepted = True
+                    break
+                lam *= 10.0
+            if not accepted:
+                # nincs javító lépés: lokális minimumban vagyunk
+                converged = True
+                break
+        else:
+            delta = np.linalg.lstsq(J, -r, rcond=None)[0]
+            p[:dims] += delta
+            r, diff, dist, diff_ref, dist_ref = evaluate(p)
+            cost = float(r @ r)
+
+        if float(np.sqrt(delta @ delta)) < stop_threshold:
+            converged = True
+            break
+
+    residuals = np.zeros(n, dtype=np.float64)
+    residuals[mask] = r
+    rms = float(np.sqrt(cost / max(1, r.shape[0])))
+    return SolverOutput(p, residuals, iterations, converged, rms, dims)
@@ -33,4 +33,4 @@ class AnchorMeasurementSnapshot:
     tag_id: str
     ts_recv: float
     ts_raw: Optional[int]
-    uwb: Dict[str, Any]
+    uwb: Any  # UWBRecord
@@ -1,21 +1,22 @@
-import socket
 import threading
 import time
+from typing import Any, Dict, List
 
 from .config import ConfigManager
 from .crypto import CryptoEngine
 from .state import State
 from .tdoa import TDoAProcessor
 from .forward import PositionForwarder
+from .pipeline import PacketPipeline
+from .decrypt_pool import DecryptPool
 from .runtime_params import TDoARuntimeParams
-
-
-def _extract_zone_id_hex(decoded: str) -> str | None:
-    # pl.: "... zone_id=0x5A31"
-    for tok in decoded.split():
-        if tok.startswith("zone_id="):
-            return tok.split("=", 1)[1].strip()
-    return None
+from .ingest import (
+    Datagram,
+    IngestQueue,
+    IngestWorkerPool,
+    MultiSocketReceiver,
+    open_udp_socket,
+)
 
 
 class UDPServer(threading.Thread):
@@ -30,8 +31,42 @@ class UDPServer(threading.Thread):
         host = net.get("udp_host", "0.0.0.0")
         port = int(net.get("udp_port", 100))
 
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.bind((host, port))
+        # ingest mód: "single" = egy socket, egy szál (eredeti viselkedés)
+        #             "multi"  = N db SO_REUSEPORT socket, batch-elt ürítés
+        self.ingest_mode = str(net.get("udp_ingest_mode", "single")).lower()
+        rcvbuf_bytes = int(net.get("udp_rcvbuf_bytes", 0))
+
+        # opcionális korlátos sor a fogadás és a feldolgozás között
+        # (network.ingest_queue_size = 0 → inline feldolgozás, mint eddig)
+        queue_size = int(net.get("ingest_queue_size", 0))
+        self.queue = None
+        self.workers = None
+        if queue_size > 0:
+            self.queue = IngestQueue(
+                queue_size,
+                policy=str(net.get("ingest_drop_policy", "drop_oldest")).lower(),
+            )
+            self.workers = IngestWorkerPool(
+                self.queue,
+                self.handle_datagram,
+                workers=int(net.get("ingest_workers", 1)),
+                batch_size=int(net.get("udp_batch_size", 64)),
+            )
+
+        self.receiver = None
+        self.sock = None
+        if self.ingest_mode == "multi":
+            self.receiver = MultiSocketReceiver(
+                host,
+                port,
+                self.handle_batch,
+                socket_count=int(net.get("udp_socket_count", 4)),
+                rcvbuf_bytes=rcvbuf_bytes,
+                batch_size=int(net.get("udp_batch_size", 64)),
+            )
+        else:
+            self.sock = open_udp_socket(host, port, rcvbuf_bytes)
+        self._rx_packets = 0
 
         aes_key_hex = cfg.get("crypto", {}).get("aes_key_hex", "")
         if not aes_key_hex:
@@ -43,27 +78,68 @@ class UDPServer(threading.Thread):
         self.processor = processor
         self.params = params
         self.forwarder = PositionForwarder(cfg)
+        self.pipeline = PacketPipeline(state, processor, params, self.crypto)
+
+        # opcionális processz-alapú dekódolás (crypto.decrypt_workers > 0)
+        crypto_cfg = cfg.get("crypto", {})
+        decrypt_workers = int(crypto_cfg.get("decrypt_workers", 0))
+        self.decrypt_pool = None
+        if decrypt_workers > 0:
+            self.decrypt_pool = DecryptPool(
+                aes_key,
+                cfg,
+                self.pipeline.handle_decoded,
+                workers=decrypt_workers,
+                slots_per_worker=int(crypto_cfg.get("decrypt_slots_per_worker", 1024)),
+            )
+        # kiszámolt pozíciók továbbítása a sink felé
+        self.processor.on_position = self.forwarder.forward
+
+        self.state.register_stats_provider("ingest", self.stats)
+        if self.workers is not None:
+            self.state.register_stats_provider("ingest_queue", self.workers.stats)
+        if self.decrypt_pool is not None:
+            self.state.register_stats_provider("decrypt_pool", self.decrypt_pool.stats)
 
     def run(self):
+        if self.decrypt_pool is not None:
+            self.decrypt_pool.start()
+        if self.workers is not None:
+            self.workers.start()
+
+        if self.receiver is not None:
+            print(f"[UDP] Listening on {len(self.receiver.workers)} SO_REUSEPORT sockets")
+            self.receiver.start()
+            return
+
         print("[UDP] Listening on socket")
         while True:
             data, addr = self.sock.recvfrom(4096)
-            ts = time.time()
-
-            decoded, mode = self.crypto.try_decrypt_variants(data)
+            self._rx_packets += 1
+            if self.queue is not None:
+                self.queue.put(data, addr, time.time())
+            else:
+                self.handle_datagram(data, addr, time.time())
 
-            # ELŐSZŰRÉS zóna alapján: ami itt nem megy át, az sehová nem kerül
-            if decoded:
-                zone_cfg = self.params.get_zone_params()
-                expected_hex = zone_cfg.get("expected_zone_id_hex")
-                if expected_hex:
-                    zone_hex = _extract_zone_id_hex(decoded)
-                    # ha nincs zone_id, vagy nem egyezik → eldobjuk a csomagot
-                    if zone_hex != expected_hex:
-                        continue
+    def handle_batch(self, batch: List[Datagram]):
+        if self.queue is not None:
+            self.queue.put_batch(batch)
+            return
+        for data, addr, ts in batch:
+            self.handle_datagram(data, addr, ts)
 
-            # CSAK az engedélyezett csomagok frissítik az állapotot
-            self.state.update_last_message(addr, data, decoded, mode)
+    def handle_datagram(self, data: bytes, addr, ts: float):
+        if self.decrypt_pool is not None:
+            if not self.pipeline.is_duplicate(data, addr, ts):
+                self.decrypt_pool.submit(data, addr, ts)
+            return
+        self.pipeline.handle(data, addr, ts)
 
-            if decoded:
-                self.processor.update_from_message(decoded, ts)
+    def stats(self) -> Dict[str, Any]:
+        if self.receiver is not None:
+            return self.receiver.stats()
+        return {
+            "mode": "single",
+            "sockets": 1,
+            "packets": self._rx_packets,
+        }
@@ -1,6 +1,7 @@
 # zona_controller/uwb_parser.py
 
-from typing import Optional, Dict, Any
+import struct
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 
 def parse_uwb_header(line: str) -> Optional[Dict[str, Any]]:
@@ -63,3 +64,280 @@ def parse_uwb_header(line: str) -> Optional[Dict[str, Any]]:
                 pass
 
     return fields
+
+
+class UWBRecord(NamedTuple):
+    """
+    Egy UWB mérési sor kompakt (tuple alapú) reprezentációja.
+    A hiányzó / hibás mezők értéke None.
+    """
+    ver: Optional[int]
+    sync: Optional[int]
+    tag_seq: Optional[int]
+    batt_percent: Optional[int]
+    anchor_id: Optional[int]
+    anchor_hex: Optional[str]
+    tag_id: Optional[int]
+    tag_hex: Optional[str]
+    ts_raw: Optional[int]
+    zone_id: Optional[int]
+    zone_id_hex: Optional[str]
+
+
+_UWB_PREFIX = "UWB:"
+_UWB_PREFIX_LEN = len(_UWB_PREFIX)
+
+
+def _opt_int(value: Optional[str], base: int = 10) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(value, base)
+    except ValueError:
+        return None
+
+
+# a hex string alakok cache-elve (az anchor / tag halmaz véges)
+_HEX32: Dict[int, str] = {}
+_HEX16: Dict[int, str] = {}
+
+
+def _hex32(value: int) -> str:
+    s = _HEX32.get(value)
+    if s is None:
+        s = f"0x{value:08X}"
+        if len(_HEX32) < 65536:
+            _HEX32[value] = s
+    return s
+
+
+def _hex16(value: int) -> str:
+    s = _HEX16.get(value)
+    if s is None:
+        s = f"0x{value:04X}"
+        _HEX16[value] = s
+    return s
+
+
+def _canonical_hex32(text: Optional[str], value: Optional[int]) -> Optional[str]:
+    # "0x" előtagú 32 bites azonosító → "0x%08X" (a bináris kerettel azonos
+    # alak); a többi azonosító változatlan
+    if value is None or not 0 <= value <= 0xFFFFFFFF or text[:2] not in ("0x", "0X"):
+        return text
+    return _HEX32.get(value) or _hex32(value)
+
+
+# a konfigurált zóna szám alakja (a konfig csak néhány különböző értéket ad)
+_EXPECTED_ZONE: Dict[str, int] = {}
+
+
+def _expected_zone(expected_zone_hex: Optional[str]) -> Optional[int]:
+    # tdoa.runtime.expected_zone_id_hex → int; nincs megadva: None (nincs
+    # szűrés), hibás érték: -1, amire egyetlen (u16) zone_id sem illeszkedik
+    if not expected_zone_hex:
+        return None
+    zone = _EXPECTED_ZONE.get(expected_zone_hex)
+    if zone is None:
+        zone = _opt_int(str(expected_zone_hex).strip(), 16)
+        if zone is None:
+            zone = -1
+        if len(_EXPECTED_ZONE) < 64:
+            _EXPECTED_ZONE[expected_zone_hex] = zone
+    return zone
+
+
+def canonical_hex_id(text: str) -> str:
+    """
+    Anchor / TAG azonosító egységes alakja: a "0x" előtagú hex azonosítók
+    "0x%08X" alakra (kis- / nagybetű és vezető nullák mindegy), a többi
+    változatlan. A parse_uwb_record() és a bináris keret is ezt az alakot
+    adja, a konfigurált azonosítókat ugyanígy normalizáljuk.
+    """
+    text = text.strip()
+    return _canonical_hex32(text, _opt_int(text, 16))
+
+
+def parse_uwb_record(line: str) -> Optional[UWBRecord]:
+    """
+    Egymenetes parser: a parse_uwb_header()-rel azonos formátumot olvas,
+    de dict helyett UWBRecord-ot ad vissza, és minden mezőt csak egyszer
+    konvertál. Nem UWB sorra None. Az anchor / tag hex alakja egységes
+    (canonical_hex_id), így a szöveges és a bináris forrás azonos kulcsot ad.
+    """
+    line = line.strip()
+    if not line.startswith(_UWB_PREFIX):
+        return None
+
+    # 1) tokenizálás egyetlen menetben (csak stringek)
+    raw: Dict[str, str] = {}
+    for tok in line[_UWB_PREFIX_LEN:].split():
+        key, sep, value = tok.partition("=")
+        if sep:
+            raw[key] = value
+    get = raw.get
+
+    # 2) konverzió mezőnként pontosan egyszer
+    anchor_hex = get("anchor")
+    tag_hex = get("tag")
+    zone_hex = get("zone_id")
+    batt = get("batt")
+
+    # gyors út: minden mező megvan és jól formált
+    try:
+        anchor = int(anchor_hex, 16)
+        tag = int(tag_hex, 16)
+        return UWBRecord(
+            int(raw["ver"]),
+            int(raw["sync"]),
+            int(raw["tag_seq"]),
+            int(batt[:-1]) if batt.endswith("%") else None,
+            anchor,
+            _canonical_hex32(anchor_hex, anchor),
+            tag,
+            _canonical_hex32(tag_hex, tag),
+            int(raw["ts"]),
+            int(zone_hex, 16),
+            zone_hex,
+        )
+    except (KeyError, AttributeError, TypeError, ValueError):
+        pass
+
+    # lassú út: hiányzó / hibás mezők → None
+    anchor = _opt_int(anchor_hex, 16)
+    tag = _opt_int(tag_hex, 16)
+    return UWBRecord(
+        _opt_int(get("ver")),
+        _opt_int(get("sync")),
+        _opt_int(get("tag_seq")),
+        _opt_int(batt[:-1]) if batt is not None and batt.endswith("%") else None,
+        anchor,
+        _canonical_hex32(anchor_hex, anchor),
+        tag,
+        _canonical_hex32(tag_hex, tag),
+        _opt_int(get("ts")),
+        _opt_int(zone_hex, 16),
+        zone_hex,
+    )
+
+
+def parse_uwb_lines(decoded: str,
+                    expected_zone_hex: Optional[str] = None) -> Tuple[bool, List[UWBRecord]]:
+    """
+    Egy dekódolt csomag összes sorának feldolgozása egy menetben, zóna
+    szűréssel együtt.
+
+    Visszatérés: (zone_ok, records)
+      - zone_ok: False, ha expected_zone_hex meg van adva, és a csomag
+        első zone_id mezője hiányzik vagy nem egyezik → a csomagot el kell dobni
+      - records: a zónába tartozó UWB mérések
+
+    A zónákat számként hasonlítjuk (mint a parse_uwb_frame()), így a
+    "0x5a31" és a "0x5A31" alak ugyanazt a zónát jelenti.
+    """
+    expected_zone = _expected_zone(expected_zone_hex)
+    records: List[UWBRecord] = []
+    first_zone: Optional[int] = None
+    zone_seen = False
+
+    for line in decoded.splitlines():
+        rec = parse_uwb_record(line)
+        if rec is None:
+            # nem UWB sor (pl. HB) – a zone_id ettől még lehet benne
+            if not zone_seen and expected_zone is not None and "zone_id=" in line:
+                for tok in line.split():
+                    if tok.startswith("zone_id="):
+                        first_zone = _opt_int(tok[len("zone_id="):], 16)
+                        zone_seen = True
+                        break
+            continue
+
+        if rec.zone_id_hex is not None and not zone_seen:
+            first_zone = rec.zone_id
+            zone_seen = True
+
+        if expected_zone is not None and rec.zone_id != expected_zone:
+            continue
+        records.append(rec)
+
+    if expected_zone is not None and first_zone != expected_zone:
+        return False, records
+    return True, records
+
+
+# ---- bináris keret ----
+#
+# Fejléc (3 byte):   magic=0xB5 | version u8 | count u8
+# Mérés (20 byte):   sync u16 | tag_seq u16 | batt u8 | anchor u32 | tag u32 |
+#                    ts alsó 32 bit u32 | ts felső 8 bit u8 | zone_id u16
+# Little-endian, count darab mérés követi a fejlécet.
+# A magic byte nem nyomtatható, így egy bináris keret soha nem néz ki szöveges sornak.
+# A keret nem tartalmaz ellenőrzőösszeget: csak hitelesített (GCM) dekódolásból
+# fogadjuk el, lásd CryptoEngine.
+
+BINARY_MAGIC = 0xB5
+BINARY_VERSIONS = (1,)
+BINARY_HEADER = struct.Struct("<BBB")
+BINARY_RECORD = struct.Struct("<HHBIIIBH")
+
+def is_binary_frame(pt: bytes) -> bool:
+    if len(pt) < BINARY_HEADER.size or pt[0] != BINARY_MAGIC or pt[1] not in BINARY_VERSIONS:
+        return False
+    count = pt[2]
+    return count > 0 and len(pt) == BINARY_HEADER.size + count * BINARY_RECORD.size
+
+
+def parse_uwb_frame(payload: bytes,
+                    expected_zone_hex: Optional[str] = None) -> Tuple[bool, List[UWBRecord]]:
+    """
+    Bináris keret dekódolása ugyanolyan UWBRecord-okra, mint a szöveges sorok.
+    A visszatérési érték jelentése megegyezik a parse_uwb_lines()-éval.
+    A mérések a memoryview-ból, másolás nélkül kerülnek kicsomagolásra.
+    """
+    if not is_binary_frame(payload):
+        return False, []
+
+    expected_zone = _expected_zone(expected_zone_hex)
+    mv = memoryview(payload)
+    version = payload[1]
+
+    # UWBRecord-ok közvetlen tuple.__new__ hívással (a NamedTuple __new__ lassabb)
+    new = tuple.__new__
+    h32 = _HEX32.get
+    h16 = _HEX16.get
+    records: List[UWBRecord] = [
+        new(UWBRecord, (
+            version, sync, tag_seq, batt,
+            anchor, h32(anchor) or _hex32(anchor),
+            tag, h32(tag) or _hex32(tag),
+            (ts_hi << 32) | ts_lo,
+            zone, h16(zone) or _hex16(zone),
+        ))
+        for sync, tag_seq, batt, anchor, tag, ts_lo, ts_hi, zone
+        in BINARY_RECORD.iter_unpack(mv[BINARY_HEADER.size:])
+    ]
+
+    if expected_zone is not None:
+        if records[0].zone_id != expected_zone:
+            return False, [r for r in records if r.zone_id == expected_zone]
+        if any(r.zone_id != expected_zone for r in records):
+            records = [r for r in records if r.zone_id == expected_zone]
+    return True, records
+
+
+def encode_uwb_frame(records: List[UWBRecord], version: int = 1) -> bytes:
+    """Bináris keret összeállítása (teszteléshez / szimulátorhoz)."""
+    parts = [BINARY_HEADER.pack(BINARY_MAGIC, version, len(records))]
+    for r in records:
+        ts = r.ts_raw or 0
+        parts.append(BINARY_RECORD.pack(
+            r.sync or 0, r.tag_seq or 0, r.batt_percent or 0,
+            r.anchor_id or 0, r.tag_id or 0,
+            ts & 0xFFFFFFFF, (ts >> 32) & 0xFF,
+            r.zone_id or 0,
+        ))
+    return b"".join(parts)
+
+
+def describe_uwb_frame(payload: bytes) -> str:
+    """Rövid, nyomtatható összefoglaló a bináris keretről (last_msg / dashboard)."""
+    return f"UWBBIN: ver={payload[1]} count={payload[2]}"